@@ -1,17 +1,47 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from llm.main import ask_llm_stream
+from llm.chain import answer_cache, query_expansion_cache
 from load_env import load_env
-from vector.load import get_loading_status, is_loading
+from vector.load import (
+    VECTOR_INGESTION,
+    aget_vector_store,
+    embedding_model,
+    get_loading_status,
+    get_startup_seconds,
+    is_loading,
+    is_ready,
+    start_ingestion,
+)
 
 load_env()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+async def open_vector_store(started):
+    """Open the store off the event loop, then start ingestion if this process owns that role"""
+    try:
+        await aget_vector_store()
+        logger.info(f"Ready {time.perf_counter() - started:.2f}s after startup")
+        if VECTOR_INGESTION:
+            start_ingestion()
+    except Exception as e:
+        logger.error(f"Error opening vector store: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts connections straight away; /ready reports when the index can serve
+    task = asyncio.create_task(open_vector_store(time.perf_counter()))
+    yield
+    task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +64,13 @@ async def ask_llm(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the vector store is open and servable, 503 before that"""
+    if not is_ready():
+        raise HTTPException(status_code=503, detail="Vector store is not open yet")
+    return {"ready": True, "startup_seconds": get_startup_seconds(), "ingestion": VECTOR_INGESTION}
+
 @app.get("/loading-status")
 async def get_vector_loading_status():
     """Get the current status of document loading into the vector store"""
@@ -43,3 +80,16 @@ async def get_vector_loading_status():
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    """Get hit/miss counters and sizes for the query caches"""
+    try:
+        return {
+            "query_embeddings": embedding_model.cache.stats(),
+            "semantic_answers": answer_cache.stats(),
+            "query_expansions": query_expansion_cache.stats(),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
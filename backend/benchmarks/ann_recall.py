@@ -0,0 +1,127 @@
+"""
+Recall@k vs. latency report for the approximate index types in vector/index_factory.py.
+
+Exact inner-product search over the same vectors is the ground truth. Vectors
+come from the persisted faiss_store when one exists, otherwise from a synthetic
+unit-norm corpus. Queries are stored vectors with a little noise added, which
+mimics a question phrased close to a chunk.
+
+Quantized encodings (fp16, SQ8, binary codes) are reported both as a plain
+scan and with the exact re-ranking the vector store applies on top of them.
+
+Usage (from backend/):
+    python -m benchmarks.ann_recall --k 5 --queries 200
+    python -m benchmarks.ann_recall --synthetic 20000 --dimension 3072
+"""
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from vector.full_vectors import FullPrecisionVectors, exact_rerank
+from vector.index_factory import apply_search_params, build_index, reconstruct_all
+
+def load_vectors(store_path, synthetic, dimension, seed):
+    index_path = os.path.join(store_path, "index.faiss")
+    if not synthetic and os.path.exists(index_path):
+        vectors = reconstruct_all(apply_search_params(faiss.read_index(index_path)))
+        print(f"Loaded {len(vectors)} vectors of dimension {vectors.shape[1]} from {index_path}")
+        return vectors
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((synthetic or 20000, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    print(f"Generated {len(vectors)} synthetic vectors of dimension {dimension}")
+    return vectors
+
+def make_queries(vectors, n_queries, noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + noise * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+def timed_search(index, queries, k):
+    """Search one query at a time, as the request path does, and return (ids, ms per query)"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids[i:i + 1] = index.search(queries[i:i + 1], k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def timed_rerank_search(index, full_vectors, queries, k, factor):
+    """Search factor * k candidates in the compressed index and re-rank them exactly"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, candidates = index.search(queries[i:i + 1], k * factor)
+        _, ids[i:i + 1] = exact_rerank(queries[i:i + 1], candidates, full_vectors, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ANN index recall and latency against exact search")
+    parser.add_argument("--store", default="faiss_store")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the store")
+    parser.add_argument("--dimension", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.store, args.synthetic, args.dimension, args.seed)
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+
+    exact = build_index("flat", vectors.shape[1])
+    exact.add(vectors)
+    truth, exact_ms = timed_search(exact, queries, args.k)
+
+    print(f"\n{'index':<10} {'param':<14} {'recall@' + str(args.k):>9} {'ms/query':>9} {'build s':>8}")
+    print(f"{'flat':<10} {'exact':<14} {1.0:>9.3f} {exact_ms:>9.3f} {0.0:>8.1f}")
+
+    sweeps = {
+        "hnsw": [("efSearch", ef) for ef in (16, 32, 64, 128, 256)],
+        "ivf_flat": [("nprobe", nprobe) for nprobe in (1, 4, 16, 64)],
+        "ivf_pq": [("nprobe", nprobe) for nprobe in (1, 4, 16, 64)],
+    }
+    for index_type, settings in sweeps.items():
+        start = time.perf_counter()
+        try:
+            index = build_index(index_type, vectors.shape[1], vectors)
+        except ValueError as e:
+            print(f"{index_type:<10} skipped: {e}")
+            continue
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+
+        for name, value in settings:
+            if name == "efSearch":
+                apply_search_params(index, ef_search=value)
+            else:
+                apply_search_params(index, nprobe=value)
+            found, ms = timed_search(index, queries, args.k)
+            print(f"{index_type:<10} {f'{name}={value}':<14} {recall_at_k(found, truth):>9.3f} {ms:>9.3f} {build_seconds:>8.1f}")
+
+    # Full-precision rows stay on disk in the store; here they are simply in memory
+    full_vectors = FullPrecisionVectors.from_array(vectors)
+    print(f"\n{'encoding':<10} {'rerank':<14} {'recall@' + str(args.k):>9} {'ms/query':>9} {'index MB':>8}")
+    print(f"{'float32':<10} {'-':<14} {1.0:>9.3f} {exact_ms:>9.3f} {faiss.serialize_index(exact).nbytes / 1e6:>8.1f}")
+    for quantization in ("fp16", "sq8", "binary"):
+        index = build_index("flat", vectors.shape[1], vectors, quantization)
+        index.add(vectors)
+        megabytes = faiss.serialize_index(index).nbytes / 1e6
+
+        found, ms = timed_search(index, queries, args.k)
+        print(f"{quantization:<10} {'none':<14} {recall_at_k(found, truth):>9.3f} {ms:>9.3f} {megabytes:>8.1f}")
+        for factor in args.rerank_factors:
+            found, ms = timed_rerank_search(index, full_vectors, queries, args.k, factor)
+            print(f"{quantization:<10} {f'{factor}x k':<14} {recall_at_k(found, truth):>9.3f} {ms:>9.3f} {megabytes:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Time to open a persisted store, pickled vs. compact/memory-mapped, as the corpus grows.
+
+For each corpus size a synthetic store (random unit vectors, ~1 KB chunks) is
+written in both formats to a scratch directory and reopened in a fresh
+subprocess, which reports wall time and the growth in resident memory (read
+from /proc, so Linux only). The pickled format pays for every chunk on open;
+the compact format should stay roughly flat apart from the id tables and the
+index itself (flat codes are still read into memory by faiss 1.9, IVF lists
+are mapped).
+
+Usage (from backend/):
+    python -m benchmarks.cold_start --sizes 1000 10000 50000 --dimension 1024
+    python -m benchmarks.cold_start --index-type ivf_flat
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from vector.docstore import CompactDocstore
+from vector.index_factory import build_index
+
+OPEN_SCRIPT = """
+import json, os, pickle, sys, time
+import faiss
+from vector.docstore import CompactDocstore
+from vector.index_factory import read_index
+
+def rss_mb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+start_rss = rss_mb()
+started = time.perf_counter()
+if sys.argv[1] == "pickle":
+    index = faiss.read_index(sys.argv[2] + "/index.faiss")
+    with open(sys.argv[2] + "/index.pkl", "rb") as f:
+        docstore, mapping = pickle.load(f)
+else:
+    index = read_index(sys.argv[2] + "/index.faiss")
+    docstore, mapping = CompactDocstore.open(sys.argv[2])
+elapsed = time.perf_counter() - started
+docstore.search(mapping[len(mapping) // 2])
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_mb() - start_rss}))
+"""
+def write_stores(directory, n_chunks, dimension, index_type, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_chunks, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    index = build_index(index_type, dimension, vectors)
+    index.add(vectors)
+
+    documents = {
+        f"doc-{i}": Document(page_content=f"chunk {i} " + "lorem ipsum " * 85, metadata={"title": f"Document {i // 20}", "type": "pdf"})
+        for i in range(n_chunks)
+    }
+    mapping = {i: f"doc-{i}" for i in range(n_chunks)}
+
+    for layout in ("pickle", "compact"):
+        path = os.path.join(directory, layout)
+        os.makedirs(path)
+        faiss.write_index(index, os.path.join(path, "index.faiss"))
+        if layout == "pickle":
+            with open(os.path.join(path, "index.pkl"), "wb") as f:
+                pickle.dump((InMemoryDocstore(documents), mapping), f)
+        else:
+            CompactDocstore(documents).write(path, mapping)
+
+def open_in_subprocess(layout, path):
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", OPEN_SCRIPT, layout, path],
+        cwd=backend, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare store open time for the pickled and compact formats")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'format':<8} {'open s':>8} {'RSS +MB':>8}")
+    for n_chunks in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_stores(directory, n_chunks, args.dimension, args.index_type, args.seed)
+            for layout in ("pickle", "compact"):
+                result = open_in_subprocess(layout, os.path.join(directory, layout))
+                print(f"{n_chunks:>8} {layout:<8} {result['seconds']:>8.3f} {result['rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Concurrency benchmark for the /ask-llm endpoint.
+
+Fires the same set of NEFAC questions at a running backend with an increasing
+number of concurrent clients and reports throughput and latency at each level.
+With a non-blocking request path, throughput should keep rising with
+concurrency until OpenAI rate limits or CPU become the bottleneck.
+
+Usage (from backend/, with the server running):
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 --levels 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "How do I file a public records request in Massachusetts?",
+    "What can I do if an agency ignores my FOI request?",
+    "What are the exemptions to the Massachusetts public records law?",
+    "How does the Rhode Island Access to Public Records Act work?",
+    "What is a show cause hearing?",
+    "Can I record a public meeting?",
+    "How long does an agency have to respond to a federal FOIA request?",
+    "What are the open meeting law requirements for executive sessions?",
+]
+
+async def ask(client, url, question):
+    """Stream one answer and return (time to first event, total time) in seconds"""
+    start = time.perf_counter()
+    first_event = None
+    async with client.stream("GET", f"{url}/ask-llm", params={"query": question}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and first_event is None:
+                first_event = time.perf_counter() - start
+    return first_event or 0.0, time.perf_counter() - start
+
+async def run_level(url, concurrency, total_requests):
+    """Run total_requests questions with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(total_requests)]
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def bounded(question):
+            async with semaphore:
+                return await ask(client, url, question)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(q) for q in questions), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    timings = [r for r in results if not isinstance(r, Exception)]
+    errors = len(results) - len(timings)
+    return elapsed, timings, errors
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure /ask-llm throughput at increasing concurrency")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-client", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'req':>5} {'err':>4} {'q/s':>7} {'ttfb p50':>9} {'p50':>7} {'p95':>7}")
+    for concurrency in args.levels:
+        total_requests = concurrency * args.requests_per_client
+        elapsed, timings, errors = await run_level(args.url, concurrency, total_requests)
+        first_event = [t[0] for t in timings]
+        totals = [t[1] for t in timings]
+        throughput = len(timings) / elapsed if elapsed else 0.0
+        print(
+            f"{concurrency:>8} {total_requests:>5} {errors:>4} {throughput:>7.2f} "
+            f"{statistics.median(first_event) if first_event else 0.0:>8.2f}s "
+            f"{percentile(totals, 50):>6.2f}s {percentile(totals, 95):>6.2f}s"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Build time, size and query latency of the BM25 index in vector/lexical.py.
+
+Texts come from the persisted faiss_store's docstore when one exists,
+otherwise from a synthetic corpus whose vocabulary follows a Zipf
+distribution (minus the head, which tokenize() drops as stopwords in real
+text), with citation-like terms ("M.G.L. c. 66 § 10") mixed in.
+Queries are single-threaded, as on the request path, and reported as
+p50/p99 milliseconds for both the merged index and one split into segments
+by incremental appends.
+
+Usage (from backend/):
+    python -m benchmarks.lexical --queries 1000
+    python -m benchmarks.lexical --synthetic 200000 --batch 500
+"""
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+from vector.lexical import LexicalIndex, merge_segments
+
+CITATIONS = ["M.G.L. c. 66 § 10", "G.L. c. 30A § 20", "FOIA exemption 5", "open meeting law", "public records request"]
+
+def load_texts(store_path, synthetic, seed):
+    docstore_path = os.path.join(store_path, "index.pkl")
+    if not synthetic and os.path.exists(docstore_path):
+        with open(docstore_path, "rb") as f:
+            docstore, _ = pickle.load(f)
+        texts = [doc.page_content for doc in docstore._dict.values()]
+        print(f"Loaded {len(texts)} chunk texts from {docstore_path}")
+        return texts
+    rng = np.random.default_rng(seed)
+    n = synthetic or 50000
+    vocabulary = [f"term{i}" for i in range(50000)]
+    words = (rng.zipf(1.3, size=(n, 120)) + 100) % len(vocabulary)
+    texts = []
+    for row in words:
+        text = " ".join(vocabulary[w] for w in row)
+        if rng.random() < 0.05:
+            text += " " + CITATIONS[rng.integers(len(CITATIONS))]
+        texts.append(text)
+    print(f"Generated {len(texts)} synthetic chunk texts")
+    return texts
+
+def make_queries(texts, n_queries, seed):
+    """Queries of a few words taken from random chunks, half of them carrying a citation"""
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for i in range(n_queries):
+        words = texts[rng.integers(len(texts))].split()
+        start = rng.integers(max(1, len(words) - 4))
+        query = " ".join(words[start:start + 4])
+        if i % 2:
+            query += " " + CITATIONS[i % len(CITATIONS)]
+        queries.append(query)
+    return queries
+
+def timed_queries(index, queries, k):
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        index.search([query], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def index_megabytes(index):
+    segment = merge_segments(index.segments)
+    return (segment.offsets.nbytes + segment.postings.nbytes + segment.frequencies.nbytes + index.lengths.nbytes) / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure BM25 index build time and query latency")
+    parser.add_argument("--store", default="faiss_store")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic texts instead of the store")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per append when building incrementally")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = load_texts(args.store, args.synthetic, args.seed)
+    queries = make_queries(texts, args.queries, args.seed)
+
+    start = time.perf_counter()
+    merged = LexicalIndex.from_texts(texts)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    incremental = LexicalIndex()
+    for i in range(0, len(texts), args.batch):
+        incremental = incremental.appended(texts[i:i + args.batch])
+    incremental_seconds = time.perf_counter() - start
+
+    print(f"\n{'index':<14} {'segments':>8} {'build s':>8} {'MB':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, index, seconds in (("one batch", merged, build_seconds), (f"{args.batch}/append", incremental, incremental_seconds)):
+        p50, p99 = timed_queries(index, queries, args.k)
+        print(f"{name:<14} {len(index.segments):>8} {seconds:>8.2f} {index_megabytes(index):>7.1f} {p50:>8.3f} {p99:>8.3f}")
+
+if __name__ == "__main__":
+    main()
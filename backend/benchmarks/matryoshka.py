@@ -0,0 +1,72 @@
+"""
+Memory, latency and recall@k of truncated (Matryoshka) embeddings.
+
+Each candidate dimension keeps the first N components of every stored vector,
+re-normalized, exactly as cache/embeddings.truncate_embeddings does at serving
+time. Ground truth is exact search over the full-size vectors, so the recall
+column is how many of the full-dimension top-k each truncation still finds.
+
+Synthetic random vectors carry no Matryoshka structure (their prefixes are not
+more informative than their tails), so this only means something on a real
+store built at full size (EMBEDDING_DIMENSIONS=3072).
+
+Usage (from backend/):
+    python -m benchmarks.matryoshka --k 5 --queries 200
+    python -m benchmarks.matryoshka --dimensions 256 512 1024 --index-type hnsw
+"""
+import argparse
+import os
+import sys
+
+import faiss
+import numpy as np
+
+from benchmarks.ann_recall import make_queries, recall_at_k, timed_search
+from cache.embeddings import truncate_embeddings
+from vector.index_factory import apply_search_params, build_index, reconstruct_all
+
+def index_memory_bytes(index):
+    """Size of the serialized index, which is what faiss_store/index.faiss costs on disk and in RAM"""
+    return faiss.serialize_index(index).nbytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare truncated embedding dimensions against full-size exact search")
+    parser.add_argument("--store", default="faiss_store")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 1024, 1536, 3072])
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index_path = os.path.join(args.store, "index.faiss")
+    if not os.path.exists(index_path):
+        sys.exit(f"No index at {index_path}; build the store first")
+    vectors = reconstruct_all(apply_search_params(faiss.read_index(index_path)))
+    full_dimension = vectors.shape[1]
+    print(f"Loaded {len(vectors)} vectors of dimension {full_dimension} from {index_path}")
+
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    exact = build_index("flat", full_dimension)
+    exact.add(vectors)
+    truth, _ = timed_search(exact, queries, args.k)
+
+    print(f"\n{'dims':>6} {'index MB':>9} {'ms/query':>9} {'recall@' + str(args.k):>9}")
+    for dimensions in sorted(args.dimensions):
+        if dimensions > full_dimension:
+            print(f"{dimensions:>6} skipped: store only has {full_dimension} dimensions")
+            continue
+        truncated = truncate_embeddings(vectors, dimensions)
+        try:
+            index = build_index(args.index_type, dimensions, truncated)
+        except ValueError as e:
+            print(f"{dimensions:>6} skipped: {e}")
+            continue
+        index.add(truncated)
+        found, ms = timed_search(index, truncate_embeddings(queries, dimensions), args.k)
+        megabytes = index_memory_bytes(index) / 1e6
+        print(f"{dimensions:>6} {megabytes:>9.1f} {ms:>9.3f} {recall_at_k(found, truth):>9.3f}")
+
+if __name__ == "__main__":
+    main()
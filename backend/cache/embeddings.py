@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from cache.store import TieredCache
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+EMBEDDING_MODEL_NAME = "text-embedding-3-large"
+
+# text-embedding-3-large returns 3072 floats; Matryoshka training means a prefix
+# of the vector, re-normalized, is itself a usable embedding (e.g. 256/512/1024)
+FULL_EMBEDDING_DIMENSIONS = 3072
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(FULL_EMBEDDING_DIMENSIONS)))
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "100000"))
+
+# Document vectors are never expired: they are only valid for the exact text they were computed from
+DOCUMENT_EMBEDDING_CACHE_SIZE = int(os.getenv("DOCUMENT_EMBEDDING_CACHE_SIZE", "256"))
+
+def truncate_embeddings(vectors, dimensions):
+    """Keep the first `dimensions` components of each vector and re-normalize to unit length"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        return truncate_embeddings(vectors[None, :], dimensions)[0]
+    truncated = np.ascontiguousarray(vectors[:, :dimensions])
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return truncated / norms
+
+def normalize_query(text):
+    """Collapse whitespace and unicode variants so trivially different spellings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves vectors from TieredCaches before calling the API.
+
+    Query embeddings are keyed by the model name plus the normalized query text
+    and expire after a TTL. Document embeddings are content-addressed: keyed by
+    the model name plus a hash of the exact chunk text, and kept indefinitely,
+    so re-chunking or rebuilding the store only embeds text that actually changed.
+
+    Both caches hold full-size vectors; every vector handed out is truncated to
+    `dimensions` and re-normalized, so changing the dimension never needs the API.
+    """
+
+    def __init__(self, embeddings, model_name, cache, document_cache=None, dimensions=FULL_EMBEDDING_DIMENSIONS):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.document_cache = document_cache
+        self.dimensions = dimensions
+
+    def _output(self, vectors):
+        if self.dimensions >= FULL_EMBEDDING_DIMENSIONS:
+            return vectors
+        return truncate_embeddings(vectors, self.dimensions).tolist()
+
+    def _query_key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _document_key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, cache, keys, texts):
+        """Return (vectors with None for misses, {key: text} for the distinct misses)"""
+        found = cache.get_many(keys)
+        vectors = [np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None for key in keys]
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+        return vectors, missing
+
+    def _store(self, cache, keys, vectors, missing, computed):
+        by_key = dict(zip(missing.keys(), computed))
+        cache.set_many({key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in by_key.items()})
+        return [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+
+    def embed_queries(self, texts):
+        """Embed several queries, calling the API once for all cache misses"""
+        keys = [self._query_key(text) for text in texts]
+        vectors, missing = self._lookup(self.cache, keys, texts)
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            vectors = self._store(self.cache, keys, vectors, missing, computed)
+        return self._output(vectors)
+
+    async def aembed_queries(self, texts):
+        # Cache lookups may hit SQLite, so they stay off the event loop
+        keys = [self._query_key(text) for text in texts]
+        vectors, missing = await asyncio.to_thread(self._lookup, self.cache, keys, texts)
+        if missing:
+            computed = await self.embeddings.aembed_documents(list(missing.values()))
+            vectors = await asyncio.to_thread(self._store, self.cache, keys, vectors, missing, computed)
+        return self._output(vectors)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_queries([text]))[0]
+
+    def embed_documents_counted(self, texts):
+        """
+        Embed document chunks, reusing any vector already computed for the same text.
+
+        Returns:
+            tuple: (vectors, number of vectors reused from the cache, number computed by the API)
+        """
+        if self.document_cache is None:
+            return self._output(self.embeddings.embed_documents(texts)), 0, len(texts)
+
+        keys = [self._document_key(text) for text in texts]
+        vectors, missing = self._lookup(self.document_cache, keys, texts)
+        if not missing:
+            return self._output(vectors), len(texts), 0
+        computed = self.embeddings.embed_documents(list(missing.values()))
+        vectors = self._store(self.document_cache, keys, vectors, missing, computed)
+        return self._output(vectors), len(texts) - len(missing), len(missing)
+
+    def cached_document_vectors(self, texts):
+        """
+        Full-size cached vectors for document texts, without ever calling the API.
+
+        Returns:
+            list: One np.ndarray per text, or None where the text was never embedded
+        """
+        if self.document_cache is None:
+            return [None] * len(texts)
+        keys = [self._document_key(text) for text in texts]
+        found = self.document_cache.get_many(keys)
+        return [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in keys]
+
+    def embed_documents(self, texts):
+        return self.embed_documents_counted(texts)[0]
+
+    async def aembed_documents(self, texts):
+        if self.document_cache is None:
+            return self._output(await self.embeddings.aembed_documents(texts))
+
+        keys = [self._document_key(text) for text in texts]
+        vectors, missing = await asyncio.to_thread(self._lookup, self.document_cache, keys, texts)
+        if missing:
+            computed = await self.embeddings.aembed_documents(list(missing.values()))
+            vectors = await asyncio.to_thread(self._store, self.document_cache, keys, vectors, missing, computed)
+        return self._output(vectors)
+
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model():
+    """Get the process-wide cached embedding model shared by retrieval and ingestion"""
+    global _embedding_model
+
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            cache = TieredCache(
+                "query_embeddings",
+                max_memory_entries=EMBEDDING_CACHE_SIZE,
+                ttl_seconds=EMBEDDING_CACHE_TTL,
+                max_disk_entries=EMBEDDING_CACHE_DISK_ENTRIES,
+            )
+            document_cache = TieredCache(
+                "document_embeddings",
+                max_memory_entries=DOCUMENT_EMBEDDING_CACHE_SIZE,
+            )
+            _embedding_model = CachedEmbeddings(
+                OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME),
+                EMBEDDING_MODEL_NAME,
+                cache,
+                document_cache,
+                dimensions=EMBEDDING_DIMENSIONS,
+            )
+        return _embedding_model
@@ -0,0 +1,56 @@
+"""
+Show what is in a cache database.
+
+Usage (from backend/):
+    python -m cache.inspect                                  # every namespace in the fetch cache
+    python -m cache.inspect --db cache.sqlite3               # the request-path caches
+    python -m cache.inspect yt_metadata --limit 20           # most recently used entries
+    python -m cache.inspect yt_metadata --show VIDEO_ID      # one entry's value
+    python -m cache.inspect cleaned_text --clear             # drop a namespace
+"""
+import argparse
+import sys
+import time
+from cache.store import TieredCache, summarize_namespaces
+from document.fetch_cache import FETCH_CACHE_DB
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a cache database")
+    parser.add_argument("namespace", nargs="?", help="List the entries of this namespace")
+    parser.add_argument("--db", default=FETCH_CACHE_DB, help=f"Cache database (default: {FETCH_CACHE_DB})")
+    parser.add_argument("--limit", type=int, default=50, help="Entries to list")
+    parser.add_argument("--show", metavar="KEY", help="Print the value stored under KEY")
+    parser.add_argument("--clear", action="store_true", help="Delete every entry in the namespace")
+    args = parser.parse_args()
+
+    if args.namespace is None:
+        print(f"{'namespace':<24} {'entries':>8} {'size':>10}  {'oldest':<19}  {'last used':<19}")
+        for namespace, count, size, created, accessed in summarize_namespaces(args.db):
+            print(f"{namespace:<24} {count:>8} {format_bytes(size or 0):>10}  {format_time(created):<19}  {format_time(accessed):<19}")
+        return
+
+    cache = TieredCache(args.namespace, path=args.db)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.namespace}")
+    elif args.show is not None:
+        value = cache.get(args.show)
+        if value is None:
+            sys.exit(f"{args.show} is not cached in {args.namespace}")
+        print(value.decode("utf-8", errors="replace"))
+    else:
+        print(f"{'key':<64} {'size':>10}  {'created':<19}  {'last used':<19}")
+        for key, size, created, accessed in cache.entries(args.limit):
+            print(f"{key:<64} {format_bytes(size):>10}  {format_time(created):<19}  {format_time(accessed):<19}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from cachetools import LRUCache, TTLCache
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# One SQLite file shared by every worker process on the machine
+CACHE_DB_PATH = os.getenv("NEFAC_CACHE_DB", "cache.sqlite3")
+# Expired and over-cap entries are dropped at most this often, or sooner once this many writes pile up
+CACHE_EVICT_INTERVAL_SECONDS = float(os.getenv("CACHE_EVICT_INTERVAL_SECONDS", "60"))
+CACHE_EVICT_WRITES = int(os.getenv("CACHE_EVICT_WRITES", "512"))
+# Access times of disk hits are written back in batches of this size (or on the next eviction)
+CACHE_TOUCH_BATCH = int(os.getenv("CACHE_TOUCH_BATCH", "256"))
+
+class TieredCache:
+    """
+    Two-level byte cache: an in-process LRU (with optional TTL) in front of a
+    SQLite table shared by all gunicorn workers.
+
+    Entries are grouped by namespace so unrelated caches can share one database
+    file. Values are opaque bytes; callers handle serialization.
+
+    Disk access is blocking, so async callers run it through asyncio.to_thread.
+    Access times of disk hits are buffered and written in batches, and eviction
+    runs every CACHE_EVICT_INTERVAL_SECONDS or CACHE_EVICT_WRITES writes rather
+    than on every write, so the disk caps may be overshot briefly.
+    """
+
+    def __init__(self, namespace, max_memory_entries=1024, ttl_seconds=None, max_disk_entries=None, path=CACHE_DB_PATH, max_disk_bytes=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.path = path
+        if ttl_seconds:
+            self.memory = TTLCache(maxsize=max_memory_entries, ttl=ttl_seconds)
+        else:
+            self.memory = LRUCache(maxsize=max_memory_entries)
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._conn = None
+        self._conn_pid = None
+        self._touched = {}
+        self._writes_since_evict = 0
+        self._last_evict = 0.0
+
+    def _connection(self):
+        """Open the SQLite connection lazily, once per process (connections must not cross a fork)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            # Eviction walks entries by last access (LRU caps) and by creation (TTL)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (namespace, accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_created ON cache_entries (namespace, created)")
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and created < now - self.ttl_seconds
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Look up several keys, memory first and then one SQLite query for the rest.
+
+        Returns:
+            dict: key -> value for every key that was found
+        """
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                value = self.memory.get(key)
+                if value is not None:
+                    found[key] = value
+                    self.counters["memory_hits"] += 1
+                else:
+                    missing.append(key)
+
+            if not missing:
+                return found
+
+            try:
+                now = time.time()
+                conn = self._connection()
+                placeholders = ",".join("?" * len(missing))
+                rows = conn.execute(
+                    f"SELECT key, value, created FROM cache_entries WHERE namespace = ? AND key IN ({placeholders})",
+                    [self.namespace, *missing],
+                ).fetchall()
+
+                fresh = []
+                for key, value, created in rows:
+                    if self._expired(created, now):
+                        continue
+                    value = bytes(value)
+                    found[key] = value
+                    self.memory[key] = value
+                    fresh.append(key)
+
+                for key in fresh:
+                    self._touched[key] = now
+                if len(self._touched) >= CACHE_TOUCH_BATCH:
+                    self._flush_touched(conn)
+                    conn.commit()
+                self.counters["disk_hits"] += len(fresh)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache read failed for namespace {self.namespace}: {e}")
+
+            self.counters["misses"] += sum(1 for key in missing if key not in found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several key -> bytes entries in memory and on disk"""
+        if not items:
+            return
+        with self.lock:
+            for key, value in items.items():
+                self.memory[key] = value
+            self.counters["writes"] += len(items)
+
+            try:
+                now = time.time()
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    [(self.namespace, key, sqlite3.Binary(value), now, now) for key, value in items.items()],
+                )
+                for key in items:
+                    self._touched.pop(key, None)
+                self._writes_since_evict += len(items)
+                if self._writes_since_evict >= CACHE_EVICT_WRITES or now - self._last_evict >= CACHE_EVICT_INTERVAL_SECONDS:
+                    self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache write failed for namespace {self.namespace}: {e}")
+
+    def _flush_touched(self, conn):
+        """Write buffered access times of disk hits; the caller commits"""
+        if self._touched:
+            conn.executemany(
+                "UPDATE cache_entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(accessed, self.namespace, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, conn, now):
+        """Drop expired entries and, past max_disk_entries or max_disk_bytes, the least recently used ones"""
+        self._flush_touched(conn)
+        self._writes_since_evict = 0
+        self._last_evict = now
+        if self.ttl_seconds is not None:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created < ?",
+                (self.namespace, now - self.ttl_seconds),
+            )
+        if self.max_disk_entries is not None:
+            count = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+            if count > self.max_disk_entries:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed LIMIT ?)",
+                    (self.namespace, self.namespace, count - self.max_disk_entries),
+                )
+        if self.max_disk_bytes is not None:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER (ORDER BY accessed DESC, key) AS running "
+                "FROM cache_entries WHERE namespace = ?) WHERE running > ?)",
+                (self.namespace, self.namespace, self.max_disk_bytes),
+            )
+
+    def entries(self, limit=None):
+        """
+        List what is stored on disk, most recently used first.
+
+        Returns:
+            list: (key, size in bytes, created, accessed) tuples
+        """
+        with self.lock:
+            conn = self._connection()
+            self._flush_touched(conn)
+            conn.commit()
+            return conn.execute(
+                "SELECT key, LENGTH(value), created, accessed FROM cache_entries "
+                "WHERE namespace = ? ORDER BY accessed DESC LIMIT ?",
+                (self.namespace, -1 if limit is None else limit),
+            ).fetchall()
+
+    def clear(self):
+        """Drop every entry in this namespace, in memory and on disk"""
+        with self.lock:
+            self.memory.clear()
+            self._touched.clear()
+            conn = self._connection()
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            conn.commit()
+
+    def stats(self):
+        """Hit/miss counters plus current memory and disk entry counts"""
+        with self.lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self.memory)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            try:
+                stats["disk_entries"] = self._connection().execute(
+                    "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+                ).fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning(f"Cache stats failed for namespace {self.namespace}: {e}")
+                stats["disk_entries"] = None
+        return stats
+
+def summarize_namespaces(path=CACHE_DB_PATH):
+    """
+    Entry count, total size and age range of every namespace in a cache database.
+
+    Returns:
+        list: (namespace, entries, total bytes, oldest created, newest accessed) tuples
+    """
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute(
+            "SELECT namespace, COUNT(*), SUM(LENGTH(value)), MIN(created), MAX(accessed) "
+            "FROM cache_entries GROUP BY namespace ORDER BY namespace"
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
@@ -0,0 +1,40 @@
+import hashlib
+
+def hash_pages(pages):
+    """sha256 of a document's page (or clip) texts, in order"""
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update(page.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def set_content_hash(pages):
+    """Stamp every page with the document's content hash so later runs can compare it without rehashing"""
+    content_hash = hash_pages(pages)
+    for page in pages:
+        page.metadata["content_hash"] = content_hash
+    return content_hash
+
+def content_hash_of(pages):
+    """The hash stamped by the loader, or computed for documents loaded before hashes were recorded"""
+    if pages and pages[0].metadata.get("content_hash"):
+        return pages[0].metadata["content_hash"]
+    return hash_pages(pages)
+
+def chunk_id(title, content_hash, ordinal, text):
+    """Deterministic 63-bit id of a document's ordinal-th chunk; the same chunk of the same document version always gets the same id"""
+    digest = hashlib.sha256(f"{title}\0{content_hash}\0{ordinal}\0{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & (2 ** 63 - 1)
+
+def set_chunk_ids(chunks):
+    """Stamp metadata["chunk_id"] and the chunk's position in its document, metadata["chunk_index"], on one document's chunks"""
+    for ordinal, chunk in enumerate(chunks):
+        chunk.metadata["chunk_index"] = ordinal
+        chunk.metadata["chunk_id"] = chunk_id(
+            chunk.metadata.get("title", ""), chunk.metadata.get("content_hash", ""), ordinal, chunk.page_content
+        )
+    return chunks
+
+def docstore_id(chunk):
+    """The chunk's id as stored in the FAISS index-to-docstore mapping"""
+    return format(chunk.metadata["chunk_id"], "016x")
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+import os
+from langchain_core.documents import Document
+from cache.store import TieredCache
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Ingestion results get their own database so they can be sized, copied or wiped
+# independently of the request-path caches
+FETCH_CACHE_DB = os.getenv("NEFAC_FETCH_CACHE_DB", "fetch_cache.sqlite3")
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", "0")) or None
+
+YT_TRANSCRIPT_CACHE_MB = float(os.getenv("YT_TRANSCRIPT_CACHE_MB", "500"))
+YT_METADATA_CACHE_MB = float(os.getenv("YT_METADATA_CACHE_MB", "50"))
+CLEANED_TEXT_CACHE_MB = float(os.getenv("CLEANED_TEXT_CACHE_MB", "500"))
+
+NAMESPACES = ("yt_transcripts", "yt_metadata", "cleaned_text")
+
+transcript_cache = TieredCache(
+    "yt_transcripts",
+    max_memory_entries=16,
+    ttl_seconds=FETCH_CACHE_TTL,
+    max_disk_bytes=int(YT_TRANSCRIPT_CACHE_MB * 1e6),
+    path=FETCH_CACHE_DB,
+)
+metadata_cache = TieredCache(
+    "yt_metadata",
+    max_memory_entries=256,
+    ttl_seconds=FETCH_CACHE_TTL,
+    max_disk_bytes=int(YT_METADATA_CACHE_MB * 1e6),
+    path=FETCH_CACHE_DB,
+)
+cleaned_text_cache = TieredCache(
+    "cleaned_text",
+    max_memory_entries=1024,
+    max_disk_bytes=int(CLEANED_TEXT_CACHE_MB * 1e6),
+    path=FETCH_CACHE_DB,
+)
+
+def _load_json(value):
+    return None if value is None else json.loads(value.decode("utf-8"))
+
+def _dump_json(value):
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+def get_cached_metadata(video_id):
+    """The get_youtube_metadata dict fetched for a video before, or None"""
+    return _load_json(metadata_cache.get(video_id))
+
+def cache_metadata(video_id, metadata):
+    metadata_cache.set(video_id, _dump_json(metadata))
+
+def get_cached_transcript(video_id):
+    """
+    The raw transcript fetched for a video before, or None.
+
+    Returns:
+        dict: {"clips": [Document, ...]} for transcripts the LangChain loader already
+        split into clips, or {"entries": [{"text", "start", "duration"}, ...]} for
+        raw transcript entries, each with the "message" logged when it was fetched
+    """
+    cached = _load_json(transcript_cache.get(video_id))
+    if cached is not None and "clips" in cached:
+        cached["clips"] = [Document(page_content=clip["page_content"], metadata=clip["metadata"]) for clip in cached["clips"]]
+    return cached
+
+def cache_transcript_clips(video_id, clips, message):
+    transcript_cache.set(video_id, _dump_json({
+        "clips": [{"page_content": clip.page_content, "metadata": clip.metadata} for clip in clips],
+        "message": message,
+    }))
+
+def cache_transcript_entries(video_id, entries, message):
+    transcript_cache.set(video_id, _dump_json({"entries": entries, "message": message}))
+
+def cleaned_text_key(prompt_version, text):
+    return hashlib.sha256(f"{prompt_version}\0{text}".encode("utf-8")).hexdigest()
@@ -1,8 +1,13 @@
 import glob
 import os
 import shutil
-from document.pdf_loader import pdfLoader
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from document.pdf_loader import pdfLoader, pdf_title
+from document.rate_limit import RateLimitedError, backoff_delay, is_rate_limit_error, rate_limiter
+from document.youtube_fetch import transcript_stats
 from document.youtube_loader import youtubeLoader
+from load_env import load_env
 import pickle
 import logging
 
@@ -10,11 +15,118 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+load_env()
+
+# Videos fetched at once; per-host request rates are capped separately in document.rate_limit
+YT_INGEST_WORKERS = int(os.getenv("YT_INGEST_WORKERS", "4"))
+# Attempts per URL when the loader raises (e.g. YouTube answered 429)
+YT_MAX_ATTEMPTS = int(os.getenv("YT_MAX_ATTEMPTS", "3"))
+
 # Define folder paths as placeholders
 WAITING_ROOM_PATH = "docs/waiting_room"
 FINISHED_PATH = "docs/finished_tagging"
 COPY_DESTINATION_PATH = "../frontend/public/docs"  # New destination path for copying
 
+def process_youtube_url(url, title_to_chunks, url_to_title, provider=youtubeLoader, limiter=rate_limiter, max_attempts=YT_MAX_ATTEMPTS):
+    """
+    Run the provider for one URL, retrying with jittered exponential backoff when it raises.
+    
+    Rate-limit errors also push back the host's next request slot, so every
+    worker slows down rather than each one hitting the limit in turn.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return provider(url, title_to_chunks, url_to_title)
+        except Exception as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            if isinstance(e, RateLimitedError) or is_rate_limit_error(e):
+                limiter.penalize(url, delay)
+            logger.warning(f"Error processing {url} (attempt {attempt + 1}/{max_attempts}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+def load_youtube_urls(urls, title_to_chunks, url_to_title, finished_urls_file, provider=youtubeLoader, workers=YT_INGEST_WORKERS, limiter=rate_limiter):
+    """
+    Process YouTube URLs on a pool of worker threads.
+    
+    Workers only fetch and build documents (the provider stores them in
+    title_to_chunks/url_to_title); this thread alone appends successes to the
+    finished file, one flushed line per URL as it completes, so the file is
+    never interleaved and survives a crash mid-run.
+    
+    Args:
+        urls (list): URLs in waiting-room order; duplicates are processed once
+        title_to_chunks (dict): Shared title -> chunks mapping filled in by the provider
+        url_to_title (dict): Shared url -> title mapping filled in by the provider
+        finished_urls_file (str): File that successfully processed URLs are appended to
+        provider (callable): provider(url, title_to_chunks, url_to_title) -> set of new titles;
+            youtubeLoader by default, or a local fake that needs no network
+        workers (int): Number of URLs processed concurrently
+        limiter (HostRateLimiter): Per-host request pacing shared by the workers
+    
+    Returns:
+        tuple: (set of new document titles, failed URLs in their original order)
+    """
+    new_docs = set()
+    failed = set()
+    
+    valid_urls = []
+    for url in dict.fromkeys(urls):
+        # Skip empty lines or lines that don't look like URLs
+        if not url or not url.startswith('http'):
+            logger.warning(f"Skipping invalid URL: {url}")
+            continue
+        valid_urls.append(url)
+    
+    total_videos = len(valid_urls)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, open(finished_urls_file, "a") as finished:
+        futures = {
+            pool.submit(process_youtube_url, url, title_to_chunks, url_to_title, provider, limiter): url
+            for url in valid_urls
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            try:
+                new_docs.update(future.result())
+                finished.write(url + "\n")
+                finished.flush()
+                logger.info(f"Successfully processed video {done}/{total_videos}: {url}")
+            except Exception as e:
+                logger.error(f"Error processing YouTube URL {url} (video {done}/{total_videos}): {e}")
+                failed.add(url)
+    
+    return new_docs, [url for url in valid_urls if url in failed]
+
+def withdraw_documents(entries, title_to_chunks, url_to_title):
+    """
+    Forget withdrawn documents so the next ingestion purges them from the vector store.
+    
+    Args:
+        entries (list): Document titles, PDF file names or YouTube URLs
+    
+    Returns:
+        set: Titles that were removed
+    """
+    removed = set()
+    for entry in entries:
+        if entry in url_to_title:
+            title = url_to_title.pop(entry)
+        elif entry.lower().endswith(".pdf"):
+            title = pdf_title(entry)
+        else:
+            title = entry
+        if title in title_to_chunks:
+            del title_to_chunks[title]
+            removed.add(title)
+            logger.info(f"Withdrew document: {title}")
+        else:
+            logger.warning(f"Nothing to withdraw for {entry}")
+    # Drop any other URL still pointing at a withdrawn title so it can be added again later
+    for url in [url for url, title in url_to_title.items() if title in removed]:
+        del url_to_title[url]
+    return removed
+
 def load_all_documents():
     all_documents = set()
     new_docs = set()
@@ -32,7 +144,14 @@ def load_all_documents():
     else:
         url_to_title = {}
 
-    # Process PDFs
+    # Withdraw documents listed in waiting_room/remove.txt (titles, PDF file names or YouTube URLs)
+    remove_file = os.path.join(WAITING_ROOM_PATH, "remove.txt")
+    if os.path.exists(remove_file):
+        with open(remove_file, "r") as remove_read:
+            entries = [line.strip() for line in remove_read if line.strip()]
+        withdraw_documents(entries, title_to_chunks, url_to_title)
+
+    # Process PDFs (new files, or revised versions of known titles)
     pdf_files = glob.glob(os.path.join(WAITING_ROOM_PATH, "*.pdf"))
     for pdf_file in pdf_files:
         new_doc = pdfLoader(pdf_file, title_to_chunks)
@@ -54,43 +173,36 @@ def load_all_documents():
     # Log total number of YouTube videos to process
     total_videos = len(urls)
     if total_videos > 0:
-        logger.info(f"Starting to process {total_videos} YouTube videos")
+        logger.info(f"Starting to process {total_videos} YouTube videos with {YT_INGEST_WORKERS} workers")
 
-    # Process URLs and collect failed ones
-    failed_urls = []
-    for idx, url in enumerate(urls, 1):
-        # Skip empty lines or lines that don't look like URLs
-        if not url or not url.startswith('http'):
-            logger.warning(f"Skipping invalid URL: {url}")
-            continue
-            
-        logger.info(f"Processing YouTube video {idx}/{total_videos}: {url}")
-        
-        with open(finished_urls_file, "a") as finished:
-            try:
-                new_vid = youtubeLoader(url, title_to_chunks, url_to_title)
-                all_documents.update(new_vid)
-                new_docs.update(new_vid)
-                finished.write(url + "\n")
-                logger.info(f"Successfully processed video {idx}/{total_videos}")
-            except Exception as e:
-                logger.error(f"Error processing YouTube URL {url} (video {idx}/{total_videos}): {e}")
-                failed_urls.append(url)
-                continue
+    # Process URLs concurrently and collect failed ones
+    new_vids, failed_urls = load_youtube_urls(urls, title_to_chunks, url_to_title, finished_urls_file)
+    all_documents.update(new_vids)
+    new_docs.update(new_vids)
 
     # Log completion status
     if total_videos > 0:
         successful_videos = total_videos - len(failed_urls)
         logger.info(f"YouTube video processing complete: {successful_videos}/{total_videos} successful, {len(failed_urls)} failed")
+        for method, stats in transcript_stats.snapshot().items():
+            if stats["attempts"]:
+                logger.info(
+                    f"Transcript method {method}: {stats['successes']}/{stats['attempts']} succeeded, "
+                    f"{stats['mean_seconds']:.1f}s mean latency"
+                )
 
-    # Rewrite failed URLs to waiting_room/yt_urls.txt
-    with open(yt_urls_file, "w") as waiting_write:
+    # Rewrite failed URLs to waiting_room/yt_urls.txt (swapped in whole so a crash keeps the old list)
+    with open(f"{yt_urls_file}.tmp", "w") as waiting_write:
         for url in failed_urls:
             waiting_write.write(url + "\n")
+    os.replace(f"{yt_urls_file}.tmp", yt_urls_file)
     
     # Save title_to_chunks to make it available for sequential loading
     with open('title_to_chunks.pkl', 'wb') as t2c:
         pickle.dump(title_to_chunks, t2c)
     logger.info("Saved title_to_chunks.pkl for sequential loading")
+    # Only now that the withdrawals are saved; the vector store catches up on the next ingestion
+    if os.path.exists(remove_file):
+        os.remove(remove_file)
             
     return all_documents, url_to_title, title_to_chunks, new_docs
\ No newline at end of file
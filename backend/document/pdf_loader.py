@@ -1,15 +1,20 @@
 import glob
 from langchain_community.document_loaders import PyPDFLoader
+from document.content_hash import set_content_hash
 import os
 
+def pdf_title(pdf_path):
+    return os.path.basename(pdf_path)[:-4].strip().replace('_', ' ').replace('  ', ' ')
+
 def pdfLoader(pdf_path, title_to_chunks):
-    doc_title = os.path.basename(pdf_path)[:-4].strip().replace('_', ' ').replace('  ', ' ')
-    if doc_title in title_to_chunks:
-        return set()
+    # A PDF in the waiting room is new or a revised version of a known title; either
+    # way it replaces what title_to_chunks holds, and ingestion compares content hashes
+    doc_title = pdf_title(pdf_path)
     loader = PyPDFLoader(pdf_path)
     pages = loader.load_and_split()
     for page in pages:
         page.metadata['title'] = doc_title
         page.metadata['type'] = 'pdf'
-        title_to_chunks[doc_title] = pages
-    return {doc_title}
\ No newline at end of file
+    set_content_hash(pages)
+    title_to_chunks[doc_title] = pages
+    return {doc_title}
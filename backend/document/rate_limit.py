@@ -0,0 +1,76 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Requests per second allowed to each host across all ingestion workers
+YT_REQUESTS_PER_SECOND = float(os.getenv("YT_REQUESTS_PER_SECOND", "2"))
+YT_BACKOFF_BASE_SECONDS = float(os.getenv("YT_BACKOFF_BASE_SECONDS", "2"))
+YT_BACKOFF_MAX_SECONDS = float(os.getenv("YT_BACKOFF_MAX_SECONDS", "60"))
+
+# Hosts that are really the same service share one budget
+HOST_ALIASES = {
+    "youtu.be": "youtube.com",
+    "www.youtube.com": "youtube.com",
+    "m.youtube.com": "youtube.com",
+}
+
+class RateLimitedError(Exception):
+    """A host refused a request because we are sending too many; worth retrying after a backoff"""
+
+def is_rate_limit_error(error):
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+def backoff_delay(attempt, base=YT_BACKOFF_BASE_SECONDS, cap=YT_BACKOFF_MAX_SECONDS):
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def host_of(url):
+    host = urlparse(url).hostname or url
+    return HOST_ALIASES.get(host, host)
+
+class HostRateLimiter:
+    """
+    Spaces out requests to each host so that all worker threads together stay
+    under `requests_per_second` per host.
+
+    Each host has a "next free slot" time; acquire() reserves the next slot and
+    sleeps until it arrives. penalize() pushes a host's next slot back, so one
+    429 slows every worker down instead of each discovering it separately.
+    """
+
+    def __init__(self, requests_per_second=YT_REQUESTS_PER_SECOND):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        """Block until a request to the url's host is allowed"""
+        host = host_of(url)
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def penalize(self, url, seconds):
+        """Hold off every request to the url's host for at least `seconds`"""
+        host = host_of(url)
+        with self.lock:
+            resume = time.monotonic() + seconds
+            if resume > self.next_slot.get(host, 0):
+                self.next_slot[host] = resume
+        logger.warning(f"Backing off {host} for {seconds:.1f}s")
+
+# Shared by every fetch in the process, whichever worker thread makes it
+rate_limiter = HostRateLimiter()
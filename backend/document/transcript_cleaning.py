@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+from document.fetch_cache import cleaned_text_cache, cleaned_text_key
+from load_env import load_env
+from tokens import count_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Several clips are cleaned per request, up to this many transcript tokens
+CLEAN_BATCH_MAX_TOKENS = int(os.getenv("CLEAN_BATCH_MAX_TOKENS", "1500"))
+CLEAN_BATCH_MAX_CLIPS = int(os.getenv("CLEAN_BATCH_MAX_CLIPS", "12"))
+# Cleaning requests in flight at once across every video being ingested
+CLEAN_CONCURRENCY = int(os.getenv("CLEAN_CONCURRENCY", "4"))
+
+llm = ChatOpenAI(
+    model="gpt-3.5-turbo",  # Updated to use latest gpt-3.5-turbo
+    temperature=0.1,
+    max_tokens=1024,
+    api_key=os.getenv("OPENAI_API_KEY") 
+)
+
+# Cleaned text is about as long as the raw text, plus the clip markers
+batch_llm = ChatOpenAI(
+    model="gpt-3.5-turbo",
+    temperature=0.1,
+    max_tokens=min(4096, int(CLEAN_BATCH_MAX_TOKENS * 1.5) + 256),
+    api_key=os.getenv("OPENAI_API_KEY")
+)
+
+_clean_semaphore = threading.BoundedSemaphore(CLEAN_CONCURRENCY)
+
+CLEAN_INSTRUCTIONS = """
+        You are a professional transcript editor specializing in cleaning auto-generated YouTube transcripts for NEFAC (New England First Amendment Coalition). Your task is to:
+        1. Correct grammar, punctuation, and spelling errors.
+        2. Remove filler words (e.g., "um," "uh," "like") and redundant phrases.
+        3. Remove YouTube-specific artifacts (e.g., "[Music]," "[Applause]").
+        4. Standardize proper names to their most likely correct form.
+        5. Ensure the text is clear, concise, and preserves the original meaning.
+        6. Return only the cleaned text, without additional explanations.
+        7. Fix all spellings of NEFAC (e.g. kneefact -> NEFAC)
+
+        Examples:
+        Raw: "Um, so like, we're gonna talk about, uh, AI today and stuff."
+        Cleaned: We're going to talk about AI today.
+
+        Raw: "The, the thing is is that, uh, machine learning is, like, super cool."
+        Cleaned: The thing is that machine learning is very cool.
+
+        Raw: "Okay, let's see.. data science is, um, important. For for example, it helps with, uh, predictions."
+        Cleaned: Data science is important. For example, it helps with predictions.
+
+        Raw: "Next, uh, [Music] we discuss open meetings with John Maran or Marian."
+        Cleaned: Next, we discuss open meetings with John Marian.
+
+        Raw: "kneefact has been working on a new project."
+        Cleaned: NEFAC has been working on a new project.
+
+"""
+
+CLEAN_PROMPT = PromptTemplate.from_template(CLEAN_INSTRUCTIONS + """        Now, clean the following transcript text:
+        Raw: "{input_text}"
+        Cleaned:
+        """)
+
+CLEAN_BATCH_PROMPT = PromptTemplate.from_template(CLEAN_INSTRUCTIONS + """        Now, clean each of the following transcript segments separately. Each segment
+        starts with a marker line such as <<<CLIP 1>>>. Repeat every marker line exactly,
+        followed by the cleaned text of that segment. Do not merge, split, drop or
+        reorder segments.
+
+{segments}
+        """)
+
+# Part of every cleaned-text cache key, so editing either prompt or switching
+# models makes earlier cleaned text a miss instead of being reused
+CLEAN_PROMPT_VERSION = hashlib.sha256(
+    "\0".join([llm.model_name, CLEAN_PROMPT.template, CLEAN_BATCH_PROMPT.template]).encode("utf-8")
+).hexdigest()[:16]
+
+CLIP_MARKER = re.compile(r"^\s*<<<CLIP (\d+)>>>\s*$", re.MULTILINE)
+
+def clean_text(text):
+    """
+    Clean an auto-generated YouTube transcript using an LLM.
+    
+    Args:
+        text (str): Raw transcript text.
+    
+    Returns:
+        str: Cleaned transcript text.
+    """
+    prompt = CLEAN_PROMPT.format(input_text=text)
+
+    try:
+        with _clean_semaphore:
+            cleaned_text = llm.invoke(prompt).content.strip()
+        return cleaned_text
+    except Exception as e:
+        logger.error(f"Error cleaning text: {str(e)}")
+        return text  # Return original text as fallback
+
+def pack_clips(token_counts, max_tokens=CLEAN_BATCH_MAX_TOKENS, max_clips=CLEAN_BATCH_MAX_CLIPS):
+    """
+    Group consecutive clips into batches that fit the token budget.
+    
+    Args:
+        token_counts (list): Token count of each clip, in order
+    
+    Returns:
+        list: Lists of clip positions; a clip larger than the budget gets a batch of its own
+    """
+    batches = []
+    current = []
+    used = 0
+    for position, tokens in enumerate(token_counts):
+        if current and (used + tokens > max_tokens or len(current) >= max_clips):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append(position)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def split_cleaned_batch(output, count):
+    """
+    Split a batched response back into per-clip texts.
+    
+    Returns:
+        list: Cleaned text per clip, or None for a clip whose marker is missing,
+        repeated or followed by nothing
+    """
+    cleaned = [None] * count
+    seen = set()
+    repeated = set()
+    markers = list(CLIP_MARKER.finditer(output))
+    for i, marker in enumerate(markers):
+        number = int(marker.group(1))
+        if not 1 <= number <= count:
+            continue
+        if number in seen:
+            repeated.add(number)
+        seen.add(number)
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(output)
+        cleaned[number - 1] = output[marker.end():end].strip() or None
+    for number in repeated:
+        cleaned[number - 1] = None
+    return cleaned
+
+def clean_batch(texts):
+    """
+    Clean several clips with one request.
+    
+    Returns:
+        tuple: (cleaned texts, number of clips that fell back to their original text)
+    """
+    if len(texts) == 1:
+        cleaned = clean_text(texts[0])
+        return [cleaned], int(cleaned == texts[0])
+
+    segments = "\n\n".join(f"<<<CLIP {number}>>>\n{text}" for number, text in enumerate(texts, 1))
+    try:
+        with _clean_semaphore:
+            output = batch_llm.invoke(CLEAN_BATCH_PROMPT.format(segments=segments)).content
+    except Exception as e:
+        logger.error(f"Error cleaning batch of {len(texts)} clips: {str(e)}")
+        return list(texts), len(texts)
+
+    cleaned = split_cleaned_batch(output, len(texts))
+    fallbacks = sum(1 for text in cleaned if text is None)
+    return [text if text is not None else original for text, original in zip(cleaned, texts)], fallbacks
+
+def clean_clips(texts, title=""):
+    """
+    Clean a video's transcript clips, packing several clips into each request.
+    
+    Clips cleaned before with the current prompts are taken from the cleaned
+    text cache. The rest are batched and run concurrently; the number of
+    requests in flight across all videos is capped by CLEAN_CONCURRENCY. Any
+    clip that cannot be matched back to the response keeps its original text
+    and is not cached, so the next ingestion tries it again.
+    
+    Args:
+        texts (list): Raw clip texts, in order
+        title (str): Video title, for the throughput log line
+    
+    Returns:
+        tuple: (cleaned texts in the same order, stats dict)
+    """
+    started = time.perf_counter()
+    keys = [cleaned_text_key(CLEAN_PROMPT_VERSION, text) for text in texts]
+    cached = cleaned_text_cache.get_many(set(keys))
+    cleaned = [cached[key].decode("utf-8") if key in cached else text for key, text in zip(keys, texts)]
+    pending = [position for position, key in enumerate(keys) if key not in cached]
+
+    token_counts = [count_tokens(texts[position]) for position in pending]
+    batches = [[pending[i] for i in batch] for batch in pack_clips(token_counts)]
+
+    fallbacks = 0
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(CLEAN_CONCURRENCY, len(batches))) as pool:
+            results = pool.map(lambda batch: clean_batch([texts[i] for i in batch]), batches)
+            for batch, (batch_cleaned, batch_fallbacks) in zip(batches, results):
+                for position, text in zip(batch, batch_cleaned):
+                    cleaned[position] = text
+                fallbacks += batch_fallbacks
+
+    # A clip that came back unchanged is indistinguishable from a failed one; only
+    # keep results that actually differ from the raw text
+    cleaned_text_cache.set_many({
+        keys[position]: cleaned[position].encode("utf-8")
+        for position in pending
+        if cleaned[position] != texts[position]
+    })
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "clips": len(texts),
+        "cached": len(texts) - len(pending),
+        "requests": len(batches),
+        "fallbacks": fallbacks,
+        "seconds": elapsed,
+        "clips_per_second": len(texts) / elapsed if elapsed > 0 else 0.0,
+        "tokens_per_clip": sum(token_counts) / len(pending) if pending else 0.0,
+    }
+    logger.info(
+        f"Cleaned {stats['clips']} clips of {title} in {stats['requests']} requests "
+        f"({stats['cached']} from cache): "
+        f"{stats['clips_per_second']:.2f} clips/s, {stats['tokens_per_clip']:.0f} tokens/clip, "
+        f"{stats['fallbacks']} kept their original text"
+    )
+    return cleaned, stats
@@ -0,0 +1,439 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import requests
+import yt_dlp
+from langchain_community.document_loaders import YoutubeLoader
+from langchain_community.document_loaders.youtube import TranscriptFormat
+from youtube_transcript_api import YouTubeTranscriptApi
+from document.fetch_cache import cache_transcript_clips, cache_transcript_entries
+from document.rate_limit import is_rate_limit_error, rate_limiter
+from load_env import load_env
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Subtitle languages in order of preference, for both the transcript API and yt-dlp tracks
+LANGUAGE_PREFERENCES = ['en', 'en-US', 'en-GB', 'en-orig']
+
+# Subtitle tracks listed in the info dict to try before giving up on yt-dlp
+YT_SUBTITLE_TRACK_ATTEMPTS = int(os.getenv("YT_SUBTITLE_TRACK_ATTEMPTS", "2"))
+# Latency assumed for a transcript method that has not been tried yet
+YT_METHOD_PRIOR_SECONDS = float(os.getenv("YT_METHOD_PRIOR_SECONDS", "5"))
+
+def extract_video_id(url):
+    """Extract video ID from YouTube URL"""
+    try:
+        parsed_url = urlparse(url)
+        if parsed_url.hostname in ['youtu.be']:
+            return parsed_url.path[1:]
+        elif parsed_url.hostname in ['www.youtube.com', 'youtube.com']:
+            if parsed_url.path == '/watch':
+                return parse_qs(parsed_url.query)['v'][0]
+            elif parsed_url.path.startswith('/embed/'):
+                return parsed_url.path.split('/')[2]
+            elif parsed_url.path.startswith('/v/'):
+                return parsed_url.path.split('/')[2]
+        return None
+    except Exception:
+        return None
+
+class YouTubeVideo:
+    """
+    One video's yt-dlp info dict, extracted at most once and shared by the
+    availability check, the metadata and the yt-dlp subtitle method.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.video_id = extract_video_id(url)
+        self.error = None
+        self._info = None
+        self._extracted = False
+
+    @property
+    def extracted(self):
+        return self._extracted
+
+    def info(self):
+        """The yt-dlp info dict, or None if extraction failed (the reason is in self.error)"""
+        if not self._extracted:
+            self._extracted = True
+            ydl_opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'skip_download': True,
+            }
+            try:
+                rate_limiter.acquire(self.url)
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    self._info = ydl.extract_info(self.url, download=False)
+            except Exception as e:
+                self.error = str(e)
+        return self._info
+
+    def availability(self):
+        """
+        Check if the video exists and is accessible.
+
+        Returns:
+            tuple: (available, message)
+        """
+        if not self.video_id:
+            return False, "Invalid YouTube URL"
+
+        info = self.info()
+        if info is None:
+            if "Private video" in self.error:
+                return False, "Private video"
+            elif "Video unavailable" in self.error:
+                return False, "Video unavailable"
+            elif "deleted" in self.error.lower():
+                return False, "Video deleted"
+            return False, f"Access error: {self.error}"
+        if info.get('availability') in ['private', 'premium_only', 'subscriber_only']:
+            return False, f"Video is {info.get('availability', 'restricted')}"
+        return True, "Available"
+
+    def metadata(self):
+        """Comprehensive video metadata, or {'title': 'Title not found'} if it could not be fetched"""
+        info = self.info()
+        if info is None:
+            logger.error(f"Error fetching metadata for {self.url}: {self.error}")
+            return {'title': 'Title not found'}
+        return {
+            'title': info.get('title', 'Title not found'),
+            'description': info.get('description', ''),
+            'duration': info.get('duration', 0),
+            'view_count': info.get('view_count', 0),
+            'upload_date': info.get('upload_date', ''),
+            'uploader': info.get('uploader', ''),
+            'channel': info.get('channel', ''),
+            'channel_id': info.get('channel_id', ''),
+            'tags': info.get('tags', []),
+            'categories': info.get('categories', []),
+            'language': info.get('language', ''),
+            'subtitles_available': bool(info.get('automatic_captions', {})),
+            'like_count': info.get('like_count', 0),
+            'age_limit': info.get('age_limit', 0)
+        }
+
+def check_video_availability(url):
+    """Check if YouTube video exists and is accessible"""
+    return YouTubeVideo(url).availability()
+
+def get_youtube_metadata(url):
+    """Get comprehensive YouTube video metadata using yt-dlp"""
+    return YouTubeVideo(url).metadata()
+
+def get_youtube_title(url):
+    """Get YouTube video title (wrapper for backwards compatibility)"""
+    metadata = get_youtube_metadata(url)
+    return metadata.get('title', 'Title not found')
+
+def transcript_entries(transcript_data):
+    """Plain {"text", "start", "duration"} dicts from any transcript result (list of dicts or a FetchedTranscript)"""
+    if hasattr(transcript_data, "to_raw_data"):
+        transcript_data = transcript_data.to_raw_data()
+    return [
+        {
+            "text": entry["text"] if isinstance(entry, dict) else entry.text,
+            "start": entry["start"] if isinstance(entry, dict) else entry.start,
+            "duration": entry.get("duration", 0) if isinstance(entry, dict) else entry.duration,
+        }
+        for entry in transcript_data
+    ]
+
+def get_transcript_direct(url, max_retries=3):
+    """Try to get transcript using YouTube Transcript API directly with enhanced retry mechanism"""
+    video_id = extract_video_id(url)
+    if not video_id:
+        return None, "Invalid video ID"
+
+    for attempt in range(max_retries):
+        try:
+            # Add small delay between attempts to avoid rate limiting
+            if attempt > 0:
+                delay = random.uniform(1, 3) * attempt
+                logger.info(f"Retrying transcript fetch after {delay:.1f}s delay (attempt {attempt + 1}/{max_retries})")
+                time.sleep(delay)
+
+            # Get available transcripts
+            rate_limiter.acquire(url)
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+
+            # Try preferred languages first
+            for lang in LANGUAGE_PREFERENCES:
+                try:
+                    transcript = transcript_list.find_transcript([lang])
+                    transcript_data = transcript.fetch()
+                    return transcript_data, f"Transcript found in {lang}"
+                except Exception as e:
+                    if "no element found" not in str(e).lower():
+                        continue  # Try next language
+                    else:
+                        raise e  # Propagate XML parsing errors for retry
+
+            # If no preferred language found, try manual transcripts first
+            try:
+                for transcript in transcript_list:
+                    if not transcript.is_generated:  # Manual transcripts
+                        transcript_data = transcript.fetch()
+                        return transcript_data, f"Manual transcript found in {transcript.language}"
+            except Exception as e:
+                if "no element found" not in str(e).lower():
+                    pass  # Continue to auto-generated
+                else:
+                    raise e  # Propagate XML parsing errors for retry
+
+            # Finally try any auto-generated transcript
+            try:
+                for transcript in transcript_list:
+                    if transcript.is_generated:  # Auto-generated transcripts
+                        transcript_data = transcript.fetch()
+                        return transcript_data, f"Auto-generated transcript found in {transcript.language}"
+            except Exception as e:
+                if "no element found" not in str(e).lower():
+                    pass
+                else:
+                    raise e  # Propagate XML parsing errors for retry
+
+            return None, "No transcripts available"
+
+        except Exception as e:
+            error_msg = str(e).lower()
+            if "disabled" in error_msg:
+                return None, "Transcripts disabled"
+            elif "unavailable" in error_msg:
+                return None, "Video unavailable"
+            elif "private" in error_msg:
+                return None, "Video is private"
+            elif "no element found" in error_msg and attempt < max_retries - 1:
+                logger.warning(f"XML parsing error (attempt {attempt + 1}/{max_retries}): {str(e)}")
+                continue  # Retry for XML parsing errors
+            elif attempt == max_retries - 1:
+                return None, f"Transcript error after {max_retries} attempts: {str(e)}"
+
+    return None, f"Failed after {max_retries} attempts"
+
+def subtitle_tracks(info):
+    """
+    The json3 subtitle tracks an info dict lists, best first: manual then automatic
+    captions in a preferred language, then manual then automatic captions in any
+    language (original-language automatic captions before machine translations).
+
+    Returns:
+        list: (language, kind, url) tuples
+    """
+    def json3_url(formats):
+        for subtitle_format in formats or []:
+            if subtitle_format.get('ext') == 'json3' and subtitle_format.get('url'):
+                return subtitle_format['url']
+        return None
+
+    manual = info.get('subtitles') or {}
+    automatic = info.get('automatic_captions') or {}
+    candidates = (
+        [(lang, 'manual', manual) for lang in LANGUAGE_PREFERENCES if lang in manual]
+        + [(lang, 'automatic', automatic) for lang in LANGUAGE_PREFERENCES if lang in automatic]
+        + [(lang, 'manual', manual) for lang in manual if lang not in LANGUAGE_PREFERENCES]
+        + [(lang, 'automatic', automatic) for lang in sorted(automatic, key=lambda lang: not lang.endswith('-orig')) if lang not in LANGUAGE_PREFERENCES]
+    )
+    tracks = []
+    for lang, kind, tracks_by_language in candidates:
+        url = json3_url(tracks_by_language[lang])
+        if url:
+            tracks.append((lang, kind, url))
+    return tracks
+
+def parse_json3(subtitle_data):
+    """Transcript entries from a json3 subtitle file"""
+    transcript_entries = []
+    for event in subtitle_data.get('events', []):
+        if 'segs' in event:
+            # Combine all segments in this event
+            text = ''.join(seg.get('utf8', '') for seg in event['segs'])
+            if text.strip():
+                transcript_entries.append({
+                    'text': text.strip(),
+                    'start': event.get('tStartMs', 0) / 1000.0,  # Convert to seconds
+                    'duration': event.get('dDurationMs', 0) / 1000.0
+                })
+    return transcript_entries
+
+def get_transcript_ytdlp(url, info=None):
+    """
+    Get transcript from the subtitle tracks listed in the video's yt-dlp info dict.
+
+    Only the best listed tracks are downloaded (one request each), instead of
+    running a yt-dlp download per language that might not exist.
+
+    Args:
+        url (str): Video URL
+        info (dict): The video's info dict, if already extracted
+    """
+    if info is None:
+        video = YouTubeVideo(url)
+        info = video.info()
+        if info is None:
+            return None, f"yt-dlp extraction failed: {video.error}"
+
+    tracks = subtitle_tracks(info)
+    if not tracks:
+        return None, "No subtitles found in any supported language"
+
+    error = None
+    for lang, kind, track_url in tracks[:YT_SUBTITLE_TRACK_ATTEMPTS]:
+        try:
+            rate_limiter.acquire(track_url)
+            response = requests.get(track_url, timeout=30)
+            response.raise_for_status()
+            transcript_entries = parse_json3(response.json())
+            if transcript_entries:
+                return transcript_entries, f"Transcript extracted via yt-dlp ({kind} {lang})"
+        except Exception as e:
+            error = e
+    if error is not None:
+        return None, f"yt-dlp extraction failed: {str(error)}"
+    return None, "No subtitles found in any supported language"
+
+def load_langchain_clips(url):
+    """Transcript clips from LangChain's YoutubeLoader, 60 seconds each"""
+    loader = YoutubeLoader.from_youtube_url(
+        url,
+        add_video_info=False,
+        transcript_format=TranscriptFormat.CHUNKS,
+        chunk_size_seconds=60,
+    )
+    rate_limiter.acquire(url)
+    return loader.load()
+
+class TranscriptMethodStats:
+    """
+    Success rate and latency of each transcript method, shared by every ingestion worker.
+
+    Methods are tried in increasing order of expected seconds per transcript
+    found, mean latency / success rate, which is the order that minimizes the
+    expected time until one succeeds. Both are smoothed with a prior (one
+    success in two attempts, YT_METHOD_PRIOR_SECONDS per attempt) so a method is
+    not written off after a single failure; ties keep the default order.
+    """
+
+    def __init__(self, methods, prior_seconds=YT_METHOD_PRIOR_SECONDS):
+        self.methods = list(methods)
+        self.prior_seconds = prior_seconds
+        self.lock = threading.Lock()
+        self.counters = {method: {"attempts": 0, "successes": 0, "seconds": 0.0} for method in self.methods}
+
+    def record(self, method, success, seconds):
+        with self.lock:
+            counters = self.counters[method]
+            counters["attempts"] += 1
+            counters["successes"] += int(success)
+            counters["seconds"] += seconds
+
+    def _expected_cost(self, counters):
+        success_rate = (counters["successes"] + 1) / (counters["attempts"] + 2)
+        mean_seconds = (counters["seconds"] + self.prior_seconds) / (counters["attempts"] + 1)
+        return mean_seconds / success_rate
+
+    def order(self):
+        """Method names, the one expected to find a transcript soonest first"""
+        with self.lock:
+            costs = {method: self._expected_cost(counters) for method, counters in self.counters.items()}
+        return sorted(self.methods, key=lambda method: (costs[method], self.methods.index(method)))
+
+    def snapshot(self):
+        """Per method: attempts, successes, success rate and mean latency in seconds"""
+        with self.lock:
+            return {
+                method: {
+                    "attempts": counters["attempts"],
+                    "successes": counters["successes"],
+                    "success_rate": counters["successes"] / counters["attempts"] if counters["attempts"] else None,
+                    "mean_seconds": counters["seconds"] / counters["attempts"] if counters["attempts"] else None,
+                }
+                for method, counters in self.counters.items()
+            }
+
+def _langchain_method(video):
+    clips = load_langchain_clips(video.url)
+    if not clips:
+        return None, "LangChain loader returned no clips"
+    return {"clips": clips, "message": "LangChain loader"}, "LangChain loader"
+
+def _direct_api_method(video):
+    transcript_data, message = get_transcript_direct(video.url)
+    if not transcript_data:
+        return None, message
+    return {"entries": transcript_entries(transcript_data), "message": message}, message
+
+def _ytdlp_method(video):
+    info = video.info()
+    if info is None:
+        return None, f"yt-dlp extraction failed: {video.error}"
+    transcript_data, message = get_transcript_ytdlp(video.url, info)
+    if not transcript_data:
+        return None, message
+    return {"entries": transcript_data, "message": message}, message
+
+# Default fallback order, used until there are stats to go on
+TRANSCRIPT_METHODS = {
+    "langchain": _langchain_method,
+    "direct_api": _direct_api_method,
+    "yt_dlp": _ytdlp_method,
+}
+
+transcript_stats = TranscriptMethodStats(TRANSCRIPT_METHODS)
+
+def fetch_transcript(video, title, stats=transcript_stats):
+    """
+    Fetch a video's transcript, trying each method in adaptive order, and cache the raw result.
+
+    Args:
+        video (YouTubeVideo): The video, with its info dict if already extracted
+        title (str): Video title, for log lines
+
+    Returns:
+        dict: {"clips": [Document, ...]} or {"entries": [...]}, plus the "message"
+        and "method" that produced it; None if no method found a transcript
+    """
+    for method in stats.order():
+        # An info dict listing no subtitle tracks means there is nothing for yt-dlp to download
+        if method == "yt_dlp" and video.extracted and video.info() is not None and not subtitle_tracks(video.info()):
+            logger.info(f"Skipping yt_dlp for {title}: no subtitle tracks listed")
+            continue
+
+        logger.info(f"Attempting {method} transcript method for: {title}")
+        started = time.perf_counter()
+        try:
+            transcript, message = TRANSCRIPT_METHODS[method](video)
+        except Exception as e:
+            transcript, message = None, str(e)
+        elapsed = time.perf_counter() - started
+
+        # Being throttled says nothing about how well the method works
+        if transcript is None and is_rate_limit_error(message):
+            logger.warning(f"{method} was rate limited for {title}: {message}")
+            continue
+        stats.record(method, transcript is not None, elapsed)
+
+        if transcript is None:
+            logger.warning(f"{method} transcript method failed for {title} after {elapsed:.1f}s: {message}")
+            continue
+
+        logger.info(f"Fetched transcript for {title} with {method} in {elapsed:.1f}s ({message})")
+        if video.video_id:
+            if "clips" in transcript:
+                cache_transcript_clips(video.video_id, transcript["clips"], message)
+            else:
+                cache_transcript_entries(video.video_id, transcript["entries"], message)
+        transcript["method"] = method
+        return transcript
+    return None
@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -9,8 +11,13 @@ from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 import os
 from langchain_community.vectorstores import FAISS
-from vector.load import vector_store
+from vector.load import aget_vector_store, get_vector_store
+from cache.embeddings import get_embedding_model, normalize_query
+from cache.store import TieredCache
+from llm.semantic_cache import SemanticAnswerCache, history_digest
+from llm.context_packer import pack_context
 from langchain_core.runnables import RunnablePassthrough
+import hashlib
 
 # Load environment variables
 load_dotenv()
@@ -20,31 +27,76 @@ if not os.getenv("OPENAI_API_KEY"):
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-large")
+embedding_model = get_embedding_model()
 
 store = {}
 
+answer_cache = SemanticAnswerCache()
+
+query_expansion_cache = TieredCache(
+    "query_expansions",
+    max_memory_entries=int(os.getenv("QUERY_EXPANSION_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("QUERY_EXPANSION_CACHE_TTL", str(24 * 3600))),
+    max_disk_entries=int(os.getenv("QUERY_EXPANSION_CACHE_DISK_ENTRIES", "50000")),
+)
+
+# Fuse BM25 keyword matches with the vector hits, so statute citations and names are found by exact term
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+# Maximal marginal relevance keeps this many chunks from the retrieved pool (0 keeps them all),
+# so neighbouring windows of the same video don't crowd out other sources in the prompt
+MMR_RESULTS = int(os.getenv("MMR_RESULTS", "8"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.6"))
+# Search with the raw question while query expansion is in flight; if its best match scores at
+# least SPECULATIVE_MIN_SCORE, expansion is abandoned once QUERY_EXPANSION_DEADLINE_SECONDS have passed
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+QUERY_EXPANSION_DEADLINE_SECONDS = float(os.getenv("QUERY_EXPANSION_DEADLINE_SECONDS", "1.5"))
+SPECULATIVE_MIN_SCORE = float(os.getenv("SPECULATIVE_MIN_SCORE", "0.5"))
+
+# Runs query expansion for the synchronous pipeline; an abandoned call finishes here and still fills the cache
+expansion_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUERY_EXPANSION_WORKERS", "8")), thread_name_prefix="query-expansion"
+)
+
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
     if session_id not in store:
         store[session_id] = ChatMessageHistory()
     return store[session_id]
 
+class PipelineContext:
+    """
+    Request-scoped state carried through every stage of the QA pipeline.
+
+    Each stage records what it produced (generated queries, retrieved chunks with
+    their scores, the source numbers cited by the answer), so later stages and the
+    SSE payload in middleware_qa read from it instead of recomputing anything.
+    """
+
+    def __init__(self, query: str, chat_history: list):
+        self.query = query
+        self.chat_history = chat_history
+        self.queries = []
+        self.chunks = []
+        self.scores = []
+        self.context_chunks = None
+        self.source_metadata = []
+        self.cited_source_ids = []
+        self.answer = None
+        self.sources = []
+        self.timings = {}
+
+    def chunk_for_source(self, source_id: int):
+        """Return the (packed) chunk behind a 1-based [Source N] number, or None if out of range."""
+        chunks = self.chunks if self.context_chunks is None else self.context_chunks
+        if 1 <= source_id <= len(chunks):
+            return chunks[source_id - 1]
+        return None
+
 # ============================================================================
 # NEW CLEAN IMPLEMENTATION
 # ============================================================================
 
-def generate_vector_queries(query: str, chat_history: list) -> list:
-    """
-    Generate 5 queries specifically formatted for the vector store based on user question and chat history.
-    
-    Args:
-        query (str): The user's input query
-        chat_history (list): List of previous messages in the conversation
-    
-    Returns:
-        list: List of 5 query strings optimized for vector search
-    """
-    
+def build_query_generation_chain():
+    """Build the prompt -> gpt-3.5 -> string chain that writes the 5 vector search queries"""
     query_generation_prompt = ChatPromptTemplate.from_messages([
         ("system", """You are an assistant for the New England First Amendment Coalition (NEFAC). 
         Your task is to generate exactly 5 search queries that will be used to search through a vector database 
@@ -83,7 +135,55 @@ def generate_vector_queries(query: str, chat_history: list) -> list:
         ("human", "Generate 5 vector search queries for: {question}")
     ])
     
-    chain = query_generation_prompt | ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3) | StrOutputParser()
+    return query_generation_prompt | ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3) | StrOutputParser()
+
+def parse_generated_queries(result: str, query: str) -> list:
+    """Parse the query generation output, falling back to the original query on a malformed reply"""
+    queries = json.loads(result)
+    
+    if not isinstance(queries, list) or len(queries) != 5:
+        logger.warning(f"Query generation returned invalid format: {result}")
+        # Fallback to simple variations of the original query
+        return [query] * 5
+        
+    logger.info(f"Generated vector queries: {queries}")
+    return queries
+
+def query_expansion_key(query: str, chat_history: list) -> str:
+    """Cache key for a generated query list: normalized question plus the history digest"""
+    return hashlib.sha256(f"{normalize_query(query)}\0{history_digest(chat_history)}".encode("utf-8")).hexdigest()
+
+def get_cached_vector_queries(query: str, chat_history: list):
+    """Return a previously generated query list for this question and history, or None"""
+    cached = query_expansion_cache.get(query_expansion_key(query, chat_history))
+    if cached is None:
+        return None
+    queries = json.loads(cached)
+    logger.info(f"Using cached vector queries: {queries}")
+    return queries
+
+def cache_vector_queries(query: str, chat_history: list, queries: list):
+    """Memoize a generated query list; the [query] * 5 fallback is never stored"""
+    if queries == [query] * 5:
+        return
+    query_expansion_cache.set(query_expansion_key(query, chat_history), json.dumps(queries).encode("utf-8"))
+
+def generate_vector_queries(query: str, chat_history: list) -> list:
+    """
+    Generate 5 queries specifically formatted for the vector store based on user question and chat history.
+    
+    Args:
+        query (str): The user's input query
+        chat_history (list): List of previous messages in the conversation
+    
+    Returns:
+        list: List of 5 query strings optimized for vector search
+    """
+    cached = get_cached_vector_queries(query, chat_history)
+    if cached is not None:
+        return cached
+    
+    chain = build_query_generation_chain()
     
     try:
         input_data = {
@@ -91,14 +191,8 @@ def generate_vector_queries(query: str, chat_history: list) -> list:
             "chat_history": chat_history
         }
         result = chain.invoke(input_data)
-        queries = json.loads(result)
-        
-        if not isinstance(queries, list) or len(queries) != 5:
-            logger.warning(f"Query generation returned invalid format: {result}")
-            # Fallback to simple variations of the original query
-            return [query] * 5
-            
-        logger.info(f"Generated vector queries: {queries}")
+        queries = parse_generated_queries(result, query)
+        cache_vector_queries(query, chat_history, queries)
         return queries
         
     except Exception as e:
@@ -106,40 +200,110 @@ def generate_vector_queries(query: str, chat_history: list) -> list:
         # Fallback to simple variations of the original query
         return [query] * 5
 
-def retrieve_chunks_from_queries(queries: list, k_per_query: int = 3) -> list:
+async def agenerate_vector_queries(query: str, chat_history: list) -> list:
+    """Async version of generate_vector_queries that awaits the model instead of blocking the event loop"""
+    cached = await asyncio.to_thread(get_cached_vector_queries, query, chat_history)
+    if cached is not None:
+        return cached
+    
+    chain = build_query_generation_chain()
+    
+    try:
+        input_data = {
+            "question": query,
+            "chat_history": chat_history
+        }
+        result = await chain.ainvoke(input_data)
+        queries = parse_generated_queries(result, query)
+        await asyncio.to_thread(cache_vector_queries, query, chat_history, queries)
+        return queries
+        
+    except Exception as e:
+        logger.error(f"Error generating vector queries: {e}")
+        # Fallback to simple variations of the original query
+        return [query] * 5
+
+def collect_unique_chunks(results: list, ctx: PipelineContext = None) -> list:
+    """
+    Flatten per-query search hits into one list of unique chunks, keeping first-seen order.
+    
+    Args:
+        results (list): One list of (index_id, Document, score) tuples per query
+        ctx (PipelineContext): Optional request context that receives the chunks and their scores
+    
+    Returns:
+        list: List of unique document chunks with metadata
+    """
+    all_chunks = []
+    all_scores = []
+    seen_chunk_ids = set()
+    
+    for hits in results:
+        for chunk_id, doc, score in hits:
+            # Index ids are unique per chunk, so multiple timestamps from the same video are kept
+            if chunk_id not in seen_chunk_ids:
+                seen_chunk_ids.add(chunk_id)
+                all_chunks.append(doc)
+                all_scores.append(score)
+                timestamp_info = doc.metadata.get('page', 'unknown')
+                logger.info(f"Retrieved chunk from: {doc.metadata.get('title', 'unknown')} at {timestamp_info} seconds")
+    
+    if ctx is not None:
+        ctx.chunks = all_chunks
+        ctx.scores = all_scores
+    
+    return all_chunks
+
+def lexical_queries(queries: list, ctx: PipelineContext = None) -> list:
+    """The user's own wording plus the generated queries, without repeats"""
+    raw = [ctx.query] if ctx is not None else []
+    return list(dict.fromkeys(raw + list(queries)))
+
+def retrieve_chunks_from_queries(queries: list, k_per_query: int = 3, ctx: PipelineContext = None) -> list:
     """
     Retrieve document chunks from the vector store for each query.
     
     Args:
         queries (list): List of query strings
         k_per_query (int): Number of documents to retrieve per query
+        ctx (PipelineContext): Optional request context that receives the chunks and their scores
     
     Returns:
         list: List of unique document chunks with metadata
     """
     try:
-        retriever = vector_store.as_retriever(
-            search_type="similarity", 
-            search_kwargs={"k": k_per_query}
+        # Embed every query in one request and run a single multi-query search
+        logger.info(f"Searching vector store with {len(queries)} queries: {queries}")
+        results = get_vector_store().retrieve(
+            queries,
+            lexical_queries(queries, ctx) if HYBRID_SEARCH else None,
+            k=k_per_query,
+            mmr_size=MMR_RESULTS,
+            mmr_lambda=MMR_LAMBDA,
         )
         
-        all_chunks = []
-        seen_chunk_ids = set()
+        all_chunks = collect_unique_chunks([results], ctx)
+        logger.info(f"Retrieved {len(all_chunks)} unique chunks from {len(queries)} queries")
+        return all_chunks
         
-        for query in queries:
-            logger.info(f"Searching vector store with query: {query}")
-            docs = retriever.invoke(query)
-            
-            for doc in docs:
-                # Create a unique identifier for this chunk (allows multiple timestamps from same video)
-                chunk_id = f"{doc.metadata.get('title', 'unknown')}:{doc.metadata.get('page', '0')}:{hash(doc.page_content[:100])}"
-                
-                if chunk_id not in seen_chunk_ids:
-                    seen_chunk_ids.add(chunk_id)
-                    all_chunks.append(doc)
-                    timestamp_info = doc.metadata.get('page', 'unknown')
-                    logger.info(f"Retrieved chunk from: {doc.metadata.get('title', 'unknown')} at {timestamp_info} seconds")
+    except Exception as e:
+        logger.error(f"Error retrieving chunks: {e}")
+        return []
+
+async def aretrieve_chunks_from_queries(queries: list, k_per_query: int = 3, ctx: PipelineContext = None) -> list:
+    """Async version of retrieve_chunks_from_queries; embeds with aembed_documents and searches in an executor"""
+    try:
+        logger.info(f"Searching vector store with {len(queries)} queries: {queries}")
+        vector_store = await aget_vector_store()
+        results = await vector_store.aretrieve(
+            queries,
+            lexical_queries(queries, ctx) if HYBRID_SEARCH else None,
+            k=k_per_query,
+            mmr_size=MMR_RESULTS,
+            mmr_lambda=MMR_LAMBDA,
+        )
         
+        all_chunks = collect_unique_chunks([results], ctx)
         logger.info(f"Retrieved {len(all_chunks)} unique chunks from {len(queries)} queries")
         return all_chunks
         
@@ -147,26 +311,198 @@ def retrieve_chunks_from_queries(queries: list, k_per_query: int = 3) -> list:
         logger.error(f"Error retrieving chunks: {e}")
         return []
 
-def generate_response_with_sources(query: str, chat_history: list, chunks: list) -> dict:
+def timed_vector_queries(query: str, chat_history: list, timings: dict) -> list:
+    """generate_vector_queries, recording its duration in timings["expansion"]"""
+    started = time.perf_counter()
+    try:
+        return generate_vector_queries(query, chat_history)
+    finally:
+        timings["expansion"] = time.perf_counter() - started
+
+async def atimed_vector_queries(query: str, chat_history: list, timings: dict) -> list:
+    """Async version of timed_vector_queries"""
+    started = time.perf_counter()
+    try:
+        return await agenerate_vector_queries(query, chat_history)
+    finally:
+        timings["expansion"] = time.perf_counter() - started
+
+def speculative_retrieve(query: str, k_per_query: int) -> tuple:
     """
-    Generate a response based on retrieved chunks and only include sources that were actually used.
+    Retrieve for the raw question alone, the same way the full query set is retrieved.
+    
+    Returns:
+        tuple: (hits, best cosine similarity of the question to any chunk)
+    """
+    return get_vector_store().retrieve(
+        [query],
+        lexical_queries([query]) if HYBRID_SEARCH else None,
+        k=k_per_query,
+        mmr_size=MMR_RESULTS,
+        mmr_lambda=MMR_LAMBDA,
+        best_similarity=True,
+    )
+
+async def aspeculative_retrieve(query: str, k_per_query: int) -> tuple:
+    """Async version of speculative_retrieve"""
+    vector_store = await aget_vector_store()
+    return await vector_store.aretrieve(
+        [query],
+        lexical_queries([query]) if HYBRID_SEARCH else None,
+        k=k_per_query,
+        mmr_size=MMR_RESULTS,
+        mmr_lambda=MMR_LAMBDA,
+        best_similarity=True,
+    )
+
+def expansion_wait(started: float, score: float):
+    """Seconds left to wait for query expansion: the rest of the deadline if the speculative results are strong, else no limit"""
+    if score < SPECULATIVE_MIN_SCORE:
+        return None
+    return max(0.0, started + QUERY_EXPANSION_DEADLINE_SECONDS - time.perf_counter())
+
+def use_speculative_hits(ctx: PipelineContext, hits: list, started: float) -> list:
+    """Answer from the raw question's own search when query expansion is abandoned or fails"""
+    ctx.queries = [ctx.query]
+    chunks = collect_unique_chunks([hits], ctx)
+    ctx.timings.update(path="speculative", retrieval=time.perf_counter() - started)
+    log_retrieval_timings(ctx)
+    return chunks
+
+def retrieve_abandoned_expansion(task: asyncio.Task):
+    """Done callback for an expansion task nobody awaits any more, so its failure is logged rather than never retrieved"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Abandoned query expansion failed: {task.exception()}")
+
+def log_retrieval_timings(ctx: PipelineContext):
+    timings = ctx.timings
+    if timings["path"] == "cached":
+        expansion = "cached"
+    else:
+        expansion = f"{timings['expansion']:.2f}s" if "expansion" in timings else "abandoned"
+    speculative = f"{timings['speculative']:.2f}s" if "speculative" in timings else "off"
+    logger.info(
+        f"Retrieval via {timings['path']} path in {timings['retrieval']:.2f}s "
+        f"(speculative {speculative}, expansion {expansion})"
+    )
+
+def retrieve_with_speculation(ctx: PipelineContext, k_per_query: int = 5) -> list:
+    """
+    Retrieve chunks for ctx.query, searching with the raw question while query expansion runs.
+    
+    A question whose expanded queries are already cached goes straight to the
+    merged search. Otherwise the expansion call goes to expansion_executor and
+    the raw question is embedded and searched on this thread in the meantime.
+    When the expanded queries arrive they are searched together with the
+    question, whose embedding is already cached. If the question's best match
+    (taken from its own search) scores at least
+    SPECULATIVE_MIN_SCORE, expansion is only waited for until
+    QUERY_EXPANSION_DEADLINE_SECONDS after the start, and the speculative
+    results are used if it misses that. Durations go to ctx.timings.
     
     Args:
-        query (str): The user's original query
-        chat_history (list): Conversation history
-        chunks (list): Retrieved document chunks
+        ctx (PipelineContext): Request context; receives queries, chunks, scores and timings
+        k_per_query (int): Number of documents to retrieve per query
     
     Returns:
-        dict: Response with answer and only relevant sources
+        list: List of unique document chunks with metadata
     """
+    started = time.perf_counter()
+    if not SPECULATIVE_RETRIEVAL:
+        ctx.queries = timed_vector_queries(ctx.query, ctx.chat_history, ctx.timings)
+        chunks = retrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+        ctx.timings.update(path="expanded", retrieval=time.perf_counter() - started)
+        log_retrieval_timings(ctx)
+        return chunks
     
-    if not chunks:
-        return {
-            "answer": "I'm sorry, but NEFAC doesn't have any information about that topic in our current database.",
-            "sources": []
-        }
+    cached = get_cached_vector_queries(ctx.query, ctx.chat_history)
+    if cached is not None:
+        ctx.queries = list(dict.fromkeys([ctx.query] + list(cached)))
+        chunks = retrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+        ctx.timings.update(path="cached", retrieval=time.perf_counter() - started)
+        log_retrieval_timings(ctx)
+        return chunks
+    
+    expansion = expansion_executor.submit(timed_vector_queries, ctx.query, ctx.chat_history, ctx.timings)
+    try:
+        hits, score = speculative_retrieve(ctx.query, k_per_query)
+    except Exception as e:
+        logger.error(f"Error in speculative retrieval: {e}")
+        hits, score = [], float("-inf")
+    ctx.timings["speculative"] = time.perf_counter() - started
     
-    # Format chunks into context with clear source identifiers
+    try:
+        expanded = expansion.result(timeout=expansion_wait(started, score))
+    except FutureTimeoutError:
+        logger.info(f"Query expansion missed the {QUERY_EXPANSION_DEADLINE_SECONDS}s deadline; using speculative results (best score {score:.3f})")
+        return use_speculative_hits(ctx, hits, started)
+    except Exception as e:
+        logger.error(f"Error in query expansion, using speculative results: {e}")
+        return use_speculative_hits(ctx, hits, started)
+    
+    ctx.queries = list(dict.fromkeys([ctx.query] + list(expanded)))
+    chunks = retrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+    ctx.timings.update(path="merged", retrieval=time.perf_counter() - started)
+    log_retrieval_timings(ctx)
+    return chunks
+
+async def aretrieve_with_speculation(ctx: PipelineContext, k_per_query: int = 5) -> list:
+    """Async version of retrieve_with_speculation; expansion runs as a task on the event loop"""
+    started = time.perf_counter()
+    if not SPECULATIVE_RETRIEVAL:
+        ctx.queries = await atimed_vector_queries(ctx.query, ctx.chat_history, ctx.timings)
+        chunks = await aretrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+        ctx.timings.update(path="expanded", retrieval=time.perf_counter() - started)
+        log_retrieval_timings(ctx)
+        return chunks
+    
+    cached = await asyncio.to_thread(get_cached_vector_queries, ctx.query, ctx.chat_history)
+    if cached is not None:
+        ctx.queries = list(dict.fromkeys([ctx.query] + list(cached)))
+        chunks = await aretrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+        ctx.timings.update(path="cached", retrieval=time.perf_counter() - started)
+        log_retrieval_timings(ctx)
+        return chunks
+    
+    expansion = asyncio.create_task(atimed_vector_queries(ctx.query, ctx.chat_history, ctx.timings))
+    try:
+        hits, score = await aspeculative_retrieve(ctx.query, k_per_query)
+    except Exception as e:
+        logger.error(f"Error in speculative retrieval: {e}")
+        hits, score = [], float("-inf")
+    ctx.timings["speculative"] = time.perf_counter() - started
+    
+    try:
+        # shield() keeps an abandoned expansion running so its result is still cached
+        expanded = await asyncio.wait_for(asyncio.shield(expansion), timeout=expansion_wait(started, score))
+    except asyncio.TimeoutError:
+        logger.info(f"Query expansion missed the {QUERY_EXPANSION_DEADLINE_SECONDS}s deadline; using speculative results (best score {score:.3f})")
+        expansion.add_done_callback(retrieve_abandoned_expansion)
+        return use_speculative_hits(ctx, hits, started)
+    except Exception as e:
+        logger.error(f"Error in query expansion, using speculative results: {e}")
+        return use_speculative_hits(ctx, hits, started)
+    
+    ctx.queries = list(dict.fromkeys([ctx.query] + list(expanded)))
+    chunks = await aretrieve_chunks_from_queries(ctx.queries, k_per_query=k_per_query, ctx=ctx)
+    ctx.timings.update(path="merged", retrieval=time.perf_counter() - started)
+    log_retrieval_timings(ctx)
+    return chunks
+
+NO_INFORMATION_ANSWER = "I'm sorry, but NEFAC doesn't have any information about that topic in our current database."
+
+SOURCES_USED_MARKER = "SOURCES_USED:"
+
+def build_response_context(chunks: list) -> tuple:
+    """
+    Format retrieved chunks into the numbered context block given to the answer model.
+    
+    Args:
+        chunks (list): Retrieved document chunks
+    
+    Returns:
+        tuple: (context string, list of per-source metadata dicts indexed by source_id - 1)
+    """
     context_parts = []
     chunk_metadata = []
     
@@ -176,9 +512,13 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
         source_url = metadata.get('source', '')
         doc_type = metadata.get('type', 'unknown')
         timestamp = metadata.get('page', None)
+        end_seconds = metadata.get('end_seconds') if metadata.get('merged_chunks') else None
         
-        # Format timestamp for display
-        timestamp_display = f" (at {timestamp} seconds)" if timestamp and doc_type == 'youtube' else ""
+        # Format timestamp for display; merged transcript windows show their time range
+        if end_seconds is not None and doc_type == 'youtube':
+            timestamp_display = f" (from {timestamp} to {end_seconds} seconds)"
+        else:
+            timestamp_display = f" (at {timestamp} seconds)" if timestamp and doc_type == 'youtube' else ""
         
         context_parts.append(f"[Source {i+1}] {title}{timestamp_display}\n{chunk.page_content}")
         
@@ -189,12 +529,31 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
             "type": doc_type,
             "link": f"{source_url}&t={timestamp}s" if doc_type == 'youtube' and timestamp else source_url,
             "timestamp_seconds": timestamp if doc_type == 'youtube' else None,
+            "end_seconds": end_seconds if doc_type == 'youtube' else None,
             "summary": metadata.get('summary', None)
         })
     
-    context = "\n\n".join(context_parts)
+    return "\n\n".join(context_parts), chunk_metadata
+
+def pack_response_context(chunks: list, ctx: PipelineContext = None) -> tuple:
+    """
+    Pack chunks into the token budget and number the resulting sources.
     
-    # Generate response with explicit source tracking
+    The packed sources are recorded on ctx, so [Source N] in the prompt, the
+    SSE context and the SOURCES_USED mapping all refer to the same list.
+    
+    Returns:
+        tuple: (context string, list of per-source metadata dicts indexed by source_id - 1)
+    """
+    packed = pack_context(chunks)
+    context, chunk_metadata = build_response_context(packed)
+    if ctx is not None:
+        ctx.context_chunks = packed
+        ctx.source_metadata = chunk_metadata
+    return context, chunk_metadata
+
+def build_response_chain(streaming: bool = False):
+    """Build the prompt -> gpt-3.5 -> string chain that answers from the numbered sources"""
     response_prompt = ChatPromptTemplate.from_messages([
         ("system", """You are an assistant for the New England First Amendment Coalition (NEFAC).
 
@@ -217,7 +576,142 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
         ("human", "{question}")
     ])
     
-    chain = response_prompt | ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2) | StrOutputParser()
+    return response_prompt | ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2, streaming=streaming) | StrOutputParser()
+
+def select_used_sources(answer: str, sources_used_text: str, chunk_metadata: list) -> tuple:
+    """
+    Map the model's SOURCES_USED list back to source metadata.
+    
+    Args:
+        answer (str): The parsed answer text
+        sources_used_text (str): Everything after the SOURCES_USED marker
+        chunk_metadata (list): Per-source metadata from build_response_context
+    
+    Returns:
+        tuple: (list of cited source metadata dicts, list of cited source numbers)
+    """
+    relevant_sources = []
+    source_numbers = []
+    
+    # Check if the answer indicates insufficient information
+    insufficient_info_phrases = [
+        "I'm sorry, but NEFAC doesn't have",
+        "That topic isn't related to NEFAC",
+        "don't have enough information",
+        "cannot answer",
+        "can't answer"
+    ]
+    
+    answer_indicates_insufficient = any(phrase in answer.lower() for phrase in insufficient_info_phrases)
+    
+    if not answer_indicates_insufficient and sources_used_text != "none":
+        try:
+            # Parse source numbers from the response
+            if sources_used_text.lower() != "none":
+                for part in sources_used_text.replace(',', ' ').split():
+                    try:
+                        num = int(part.strip())
+                        if 1 <= num <= len(chunk_metadata):
+                            source_numbers.append(num)
+                    except ValueError:
+                        continue
+                
+                # Include only the sources that were actually used
+                for source_num in source_numbers:
+                    relevant_sources.append(chunk_metadata[source_num - 1])
+                    
+        except Exception as e:
+            logger.warning(f"Error parsing sources used: {e}")
+            # If parsing fails and answer seems to have content, include no sources to be safe
+            relevant_sources = []
+            source_numbers = []
+    
+    return relevant_sources, source_numbers
+
+class SourcesUsedStreamParser:
+    """
+    Incrementally separates a streamed completion into answer text and the
+    trailing SOURCES_USED list.
+    
+    feed() only returns text that can no longer turn out to be part of the
+    marker, so the marker and the source numbers never reach the client.
+    """
+    
+    def __init__(self):
+        self.pending = ""
+        self.answer_parts = []
+        self.sources_used_text = None
+    
+    def feed(self, token: str) -> str:
+        """Consume one streamed token and return the text that is safe to emit"""
+        if self.sources_used_text is not None:
+            self.sources_used_text += token
+            return ""
+        
+        self.pending += token
+        marker_index = self.pending.find(SOURCES_USED_MARKER)
+        if marker_index != -1:
+            emit = self.pending[:marker_index].rstrip()
+            self.sources_used_text = self.pending[marker_index + len(SOURCES_USED_MARKER):]
+            self.pending = ""
+        else:
+            # Hold back any suffix that could still grow into the marker, plus trailing
+            # whitespace that would otherwise precede it
+            hold = 0
+            for size in range(min(len(self.pending), len(SOURCES_USED_MARKER) - 1), 0, -1):
+                if SOURCES_USED_MARKER.startswith(self.pending[-size:]):
+                    hold = size
+                    break
+            emit = self.pending[:len(self.pending) - hold]
+            stripped = emit.rstrip()
+            self.pending = emit[len(stripped):] + self.pending[len(self.pending) - hold:]
+            emit = stripped
+        
+        self.answer_parts.append(emit)
+        return emit
+    
+    def finish(self) -> str:
+        """Flush held-back text once the stream ends without a marker"""
+        emit = ""
+        if self.sources_used_text is None:
+            emit = self.pending
+            self.answer_parts.append(emit)
+        self.pending = ""
+        return emit
+    
+    @property
+    def answer(self) -> str:
+        return "".join(self.answer_parts).strip()
+    
+    @property
+    def sources_used(self) -> str:
+        return self.sources_used_text.strip() if self.sources_used_text is not None else "none"
+
+def generate_response_with_sources(query: str, chat_history: list, chunks: list, ctx: PipelineContext = None) -> dict:
+    """
+    Generate a response based on retrieved chunks and only include sources that were actually used.
+    
+    Args:
+        query (str): The user's original query
+        chat_history (list): Conversation history
+        chunks (list): Retrieved document chunks
+        ctx (PipelineContext): Optional request context that receives the cited source numbers
+    
+    Returns:
+        dict: Response with answer and only relevant sources
+    """
+    
+    if not chunks:
+        return {
+            "answer": NO_INFORMATION_ANSWER,
+            "sources": []
+        }
+    
+    # Pack chunks into the token budget and format them with clear source identifiers
+    context, chunk_metadata = pack_response_context(chunks, ctx)
+    
+    # Generate response with explicit source tracking
+    chain = build_response_chain()
     
     try:
         input_data = {
@@ -230,8 +724,8 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
         logger.info(f"Raw LLM response: '{full_response}'")
         
         # Parse the response to separate answer and used sources
-        if "SOURCES_USED:" in full_response:
-            parts = full_response.split("SOURCES_USED:")
+        if SOURCES_USED_MARKER in full_response:
+            parts = full_response.split(SOURCES_USED_MARKER)
             answer = parts[0].strip()
             sources_used_text = parts[1].strip() if len(parts) > 1 else "none"
         else:
@@ -242,47 +736,16 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
         # Validate that we have a non-empty answer
         if not answer or len(answer.strip()) == 0:
             logger.warning("Generated empty answer, providing fallback response")
-            answer = "I'm sorry, but NEFAC doesn't have any information about that topic in our current database."
+            answer = NO_INFORMATION_ANSWER
             sources_used_text = "none"
         
         logger.info(f"Parsed answer: '{answer}'")
         logger.info(f"Sources used text: '{sources_used_text}'")
         
         # Determine which sources to include
-        relevant_sources = []
-        
-        # Check if the answer indicates insufficient information
-        insufficient_info_phrases = [
-            "I'm sorry, but NEFAC doesn't have",
-            "That topic isn't related to NEFAC",
-            "don't have enough information",
-            "cannot answer",
-            "can't answer"
-        ]
-        
-        answer_indicates_insufficient = any(phrase in answer.lower() for phrase in insufficient_info_phrases)
-        
-        if not answer_indicates_insufficient and sources_used_text != "none":
-            try:
-                # Parse source numbers from the response
-                if sources_used_text.lower() != "none":
-                    source_numbers = []
-                    for part in sources_used_text.replace(',', ' ').split():
-                        try:
-                            num = int(part.strip())
-                            if 1 <= num <= len(chunk_metadata):
-                                source_numbers.append(num)
-                        except ValueError:
-                            continue
-                    
-                    # Include only the sources that were actually used
-                    for source_num in source_numbers:
-                        relevant_sources.append(chunk_metadata[source_num - 1])
-                        
-            except Exception as e:
-                logger.warning(f"Error parsing sources used: {e}")
-                # If parsing fails and answer seems to have content, include no sources to be safe
-                relevant_sources = []
+        relevant_sources, source_numbers = select_used_sources(answer, sources_used_text, chunk_metadata)
+        if ctx is not None:
+            ctx.cited_source_ids = source_numbers
         
         logger.info(f"Generated response with {len(relevant_sources)} relevant sources out of {len(chunks)} total chunks")
         
@@ -298,10 +761,70 @@ def generate_response_with_sources(query: str, chat_history: list, chunks: list)
             "sources": []
         }
 
-def query_nefac_database_new(query: str, chat_history: list, session_id: str = "abc123") -> dict:
+async def astream_response_with_sources(ctx: PipelineContext):
+    """
+    Stream the answer for the chunks already retrieved into ctx, token by token.
+    
+    Yields answer text as the model produces it, with the SOURCES_USED marker
+    stripped. Once the stream ends, ctx.answer, ctx.sources and
+    ctx.cited_source_ids are set exactly as generate_response_with_sources would.
+    
+    Args:
+        ctx (PipelineContext): Request context holding the query, history and retrieved chunks
+    
+    Yields:
+        str: Pieces of the answer text
+    """
+    if not ctx.chunks:
+        ctx.answer = NO_INFORMATION_ANSWER
+        ctx.sources = []
+        yield ctx.answer
+        return
+    
+    if ctx.context_chunks is None:
+        context, _ = pack_response_context(ctx.chunks, ctx)
+    else:
+        context, ctx.source_metadata = build_response_context(ctx.context_chunks)
+    chain = build_response_chain(streaming=True)
+    parser = SourcesUsedStreamParser()
+    
+    input_data = {
+        "question": ctx.query,
+        "chat_history": ctx.chat_history,
+        "context": context
+    }
+    
+    async for token in chain.astream(input_data):
+        text = parser.feed(token)
+        if text:
+            yield text
+    
+    tail = parser.finish()
+    if tail:
+        yield tail
+    
+    answer = parser.answer
+    sources_used_text = parser.sources_used
+    if parser.sources_used_text is None:
+        logger.warning(f"Streamed LLM response missing SOURCES_USED. Response was: '{answer}'")
+    
+    if not answer:
+        logger.warning("Generated empty answer, providing fallback response")
+        answer = NO_INFORMATION_ANSWER
+        sources_used_text = "none"
+        yield answer
+    
+    logger.info(f"Streamed answer: '{answer}'")
+    logger.info(f"Sources used text: '{sources_used_text}'")
+    
+    ctx.answer = answer
+    ctx.sources, ctx.cited_source_ids = select_used_sources(answer, sources_used_text, ctx.source_metadata)
+    logger.info(f"Streamed response with {len(ctx.sources)} relevant sources out of {len(ctx.chunks)} total chunks")
+
+def query_nefac_database_new(query: str, chat_history: list, session_id: str = "abc123", ctx: PipelineContext = None) -> dict:
     """
     Main function implementing the new clean approach:
-    1. Generate 5 vector store queries
+    1. Generate 5 vector store queries (while the question itself is already searched)
     2. Retrieve chunks from vector store
     3. Generate response based only on retrieved information
     4. Return response with source links
@@ -310,21 +833,24 @@ def query_nefac_database_new(query: str, chat_history: list, session_id: str = "
         query (str): The user's input query
         chat_history (list): List of previous messages in the conversation
         session_id (str): Session ID for chat history management
+        ctx (PipelineContext): Optional request context populated by every stage
     
     Returns:
         dict: Dictionary containing the answer and list of sources
     """
+    if ctx is None:
+        ctx = PipelineContext(query, chat_history)
+    
     try:
         logger.info(f"Processing query: {query}")
         
-        # Step 1: Generate 5 vector store queries
-        vector_queries = generate_vector_queries(query, chat_history)
-        
-        # Step 2: Retrieve chunks from vector store
-        chunks = retrieve_chunks_from_queries(vector_queries, k_per_query=5)
+        # Step 1 and 2: generate 5 vector store queries while the raw question is already being searched
+        chunks = retrieve_with_speculation(ctx, k_per_query=5)
         
         # Step 3: Generate response with sources
-        result = generate_response_with_sources(query, chat_history, chunks)
+        result = generate_response_with_sources(query, chat_history, chunks, ctx=ctx)
+        ctx.answer = result["answer"]
+        ctx.sources = result["sources"]
         
         logger.info(f"Successfully processed query with {len(result['sources'])} sources")
         return result
@@ -336,7 +862,41 @@ def query_nefac_database_new(query: str, chat_history: list, session_id: str = "
             "sources": []
         }
 
+def build_context_entries(ctx: PipelineContext, sources: list) -> list:
+    """
+    Build the SSE context payload for a list of source metadata dicts.
+    
+    Each source carries its 1-based source_id, so its chunk is looked up in the
+    packed sources directly instead of being searched for by title.
+    """
+    context_data = []
+    for source in sources:
+        chunk = ctx.chunk_for_source(source.get('source_id', 0))
+        context_data.append({
+            "title": source.get('title', 'Unknown'),
+            "link": source.get("link", ""),
+            "type": source.get("type", "unknown"),
+            "timestamp_seconds": source.get('timestamp_seconds'),
+            "summary": source.get("summary", ""),
+            "content": chunk.page_content if chunk is not None else ""
+        })
+    return context_data
+
+def format_sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
 async def middleware_qa(query: str, convoHistory: str = ""):
+    """
+    Answer a question as a progressive SSE stream.
+    
+    Event protocol (every event carries an increasing `order`):
+    1. `context`: every source given to the model, sent as soon as retrieval finishes
+    2. `message`: answer text, one event per streamed piece
+    3. `sources`: the chunks the answer actually cited; always the last event
+    
+    A semantic cache hit skips straight to a single `message` and the `sources` event.
+    """
+    order = 0
     try:
         chat_history = []
         if convoHistory:
@@ -347,73 +907,61 @@ async def middleware_qa(query: str, convoHistory: str = ""):
                 chat_history = []
         
         logger.info(f"Starting middleware_qa for query: {query}")
-        result = query_nefac_database_new(query, chat_history)
-        logger.info(f"Got result from query_nefac_database_new: {result}")
-        
-        # Build context data for sources
-        context_data = []
-        if result.get("sources"):
-            # Get the chunks again to build context data
-            vector_queries = generate_vector_queries(query, chat_history)
-            all_chunks = retrieve_chunks_from_queries(vector_queries, k_per_query=5)
-            chunk_map = {}
-            for chunk in all_chunks:
-                title = chunk.metadata.get('title', 'unknown')
-                timestamp = chunk.metadata.get('page', 0)
-                chunk_key = f"{title}:{timestamp}"
-                chunk_map[chunk_key] = {
-                    'content': chunk.page_content,
-                    'metadata': chunk.metadata
-                }
-            
-            for source in result.get("sources", []):
-                title = source.get('title', 'Unknown')
-                timestamp_seconds = source.get('timestamp_seconds')
-                
-                chunk_content = ""
-                chunk_key = f"{title}:{timestamp_seconds}"
-                if chunk_key in chunk_map:
-                    chunk_content = chunk_map[chunk_key]['content']
-                else:
-                    for key, chunk_data in chunk_map.items():
-                        if key.startswith(f"{title}:"):
-                            chunk_content = chunk_data['content']
-                            break
-                
-                context_data.append({
-                    "title": title,
-                    "link": source.get("link", ""),
-                    "type": source.get("type", "unknown"),
-                    "timestamp_seconds": timestamp_seconds,
-                    "summary": source.get("summary", ""),
-                    "content": chunk_content
-                })
-                
-                logger.info(f"Source added: {title} at {timestamp_seconds}s, link: {source.get('link', '')}")
-        
-        # Send context data if we have sources
-        if context_data:
+        ctx = PipelineContext(query, chat_history)
+        
+        # Serve near-duplicate questions straight from the semantic answer cache
+        question_vector = await embedding_model.aembed_query(query)
+        digest = history_digest(chat_history)
+        epoch = (await aget_vector_store()).epoch
+        # The cache searches and adds to a FAISS index under a lock, so it stays off the event loop
+        cached = await asyncio.to_thread(answer_cache.lookup, question_vector, digest, epoch)
+        if cached is not None:
+            order += 1
+            yield format_sse_event({"message": cached["answer"], "order": order})
+            order += 1
+            yield format_sse_event({"sources": cached["sources"], "order": order})
+            return
+        
+        # Step 1 and 2: generate queries and retrieve chunks without blocking the event loop,
+        # searching with the raw question while the queries are being generated
+        await aretrieve_with_speculation(ctx, k_per_query=5)
+        
+        # Send the retrieved context as soon as it is available
+        if ctx.chunks:
+            pack_response_context(ctx.chunks, ctx)
+            order += 1
             context_chunk = {
-                "context": context_data,
-                "order": 1
+                "context": build_context_entries(ctx, ctx.source_metadata),
+                "order": order
             }
-            logger.info(f"Yielding context chunk: {context_chunk}")
-            yield f"data: {json.dumps(context_chunk)}\n\n"
-        
-        # Always send the message
-        answer = result.get("answer", "No response available.")
-        message_chunk = {
-            "message": answer,
-            "order": 2
-        }
-        logger.info(f"Yielding message chunk: {message_chunk}")
-        yield f"data: {json.dumps(message_chunk)}\n\n"
+            logger.info(f"Yielding context chunk with {len(ctx.chunks)} retrieved chunks")
+            yield format_sse_event(context_chunk)
+        
+        # Step 3: stream the answer as the model produces it
+        async for text in astream_response_with_sources(ctx):
+            order += 1
+            yield format_sse_event({"message": text, "order": order})
+        
+        # Close with the sources the answer actually cited
+        sources = build_context_entries(ctx, ctx.sources)
+        for source in sources:
+            logger.info(f"Source added: {source['title']} at {source['timestamp_seconds']}s, link: {source['link']}")
+        order += 1
+        logger.info(f"Yielding sources chunk with {len(sources)} sources")
+        yield format_sse_event({"sources": sources, "order": order})
+        
+        # Only answers grounded in retrieved chunks are reused (a stream that raised
+        # never gets here); an empty retrieval or "no information" fallback is not
+        if ctx.chunks and ctx.answer != NO_INFORMATION_ANSWER:
+            await asyncio.to_thread(answer_cache.store, question_vector, digest, epoch, query, ctx.answer, sources)
         
     except Exception as e:
         logger.error(f"Error in middleware_qa: {e}")
+        order += 1
         error_chunk = {
             "message": "An error occurred while processing your query.",
-            "order": 1
+            "order": order
         }
         logger.info(f"Yielding error chunk: {error_chunk}")
-        yield f"data: {json.dumps(error_chunk)}\n\n"
\ No newline at end of file
+        yield format_sse_event(error_chunk)
+        yield format_sse_event({"sources": [], "order": order + 1})
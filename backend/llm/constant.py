@@ -0,0 +1,2 @@
+PROMPT_MODEL_NAME = "gpt-3.5-turbo"
+SUB_MODEL_NAME = "gpt-3.5-turbo"
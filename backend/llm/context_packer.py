@@ -0,0 +1,138 @@
+import logging
+import os
+from langchain_core.documents import Document
+from load_env import load_env
+from tokens import count_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# Tokens of source text the answer prompt may carry
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Windows of the same video at most this far apart are merged into one source.
+# Transcript windows are 60 seconds long and not every loader records where they end.
+CONTEXT_MERGE_GAP_SECONDS = float(os.getenv("CONTEXT_MERGE_GAP_SECONDS", "60"))
+CONTEXT_MODEL_NAME = "gpt-3.5-turbo"
+
+class PackedSource:
+    """One [Source N] entry: a chunk, or several windows of one video merged into a time range"""
+
+    def __init__(self, chunk, rank):
+        self.members = [chunk]
+        self.rank = rank
+        self.video = video_key(chunk)
+        self.start, self.end = window_of(chunk)
+
+    def touches(self, chunk):
+        start, end = window_of(chunk)
+        return start <= self.end + CONTEXT_MERGE_GAP_SECONDS and end >= self.start - CONTEXT_MERGE_GAP_SECONDS
+
+    def absorb(self, other):
+        # Members stay in relevance order, so members[0] is the source's best chunk
+        self.members = other.members + self.members if other.rank < self.rank else self.members + other.members
+        self.rank = min(self.rank, other.rank)
+        self.start, self.end = min(self.start, other.start), max(self.end, other.end)
+
+    def text(self):
+        # Chunks split from one clip share its start time, so their position in the document breaks ties
+        ordered = sorted(self.members, key=lambda chunk: (window_of(chunk)[0], chunk.metadata.get("chunk_index", 0)))
+        return join_windows([chunk.page_content for chunk in ordered])
+
+    def tokens(self):
+        return count_tokens(self.text(), CONTEXT_MODEL_NAME)
+
+    def document(self):
+        """The source as a single Document, its metadata taken from the most relevant member"""
+        if len(self.members) == 1:
+            return self.members[0]
+        metadata = dict(self.members[0].metadata)
+        metadata["page"] = metadata["start_seconds"] = self.start
+        metadata["end_seconds"] = self.end
+        metadata["merged_chunks"] = len(self.members)
+        return Document(page_content=self.text(), metadata=metadata)
+
+def video_key(chunk):
+    """(title, url) for YouTube windows with a start time, None for anything that is never merged"""
+    metadata = chunk.metadata
+    if metadata.get("type") != "youtube" or metadata.get("start_seconds") is None:
+        return None
+    return metadata.get("title"), metadata.get("source")
+
+def window_of(chunk):
+    start = chunk.metadata.get("start_seconds") or 0
+    end = chunk.metadata.get("end_seconds")
+    return start, end if end is not None else start
+
+def overlap_length(previous, text, longest=64, shortest=10):
+    """Length of the whole-word overlap the text splitter repeats at the start of `text`, or 0"""
+    for size in range(min(len(previous), len(text), longest), shortest - 1, -1):
+        at_word_end = size == len(text) or text[size].isspace()
+        at_word_start = size == len(previous) or previous[-size - 1].isspace()
+        if at_word_end and at_word_start and previous.endswith(text[:size]):
+            return size
+    return 0
+
+def join_windows(texts):
+    """Concatenate consecutive texts, dropping the overlap between neighbouring chunks"""
+    joined = texts[0] if texts else ""
+    for text in texts[1:]:
+        rest = text[overlap_length(joined, text):].strip()
+        if rest:
+            joined = f"{joined} {rest}"
+    return joined
+
+def truncate_to_tokens(text, budget):
+    """Cut text to roughly `budget` tokens, at a word boundary"""
+    tokens = count_tokens(text, CONTEXT_MODEL_NAME)
+    if tokens <= budget:
+        return text
+    cut = text[:max(1, len(text) * budget // tokens)]
+    return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+def pack_context(chunks, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Choose the sources for the answer prompt within a token budget.
+
+    Chunks are taken in relevance order. A YouTube window next to (or
+    overlapping) a window of the same video already taken is merged into that
+    source and costs only the tokens it adds; a chunk that would overflow the
+    budget is skipped in favour of smaller, less relevant ones. The most
+    relevant chunk is always kept, truncated if it alone exceeds the budget.
+
+    Args:
+        chunks (list): Retrieved chunks, most relevant first
+        budget (int): Token budget for source text
+
+    Returns:
+        list: One Document per source, ordered by its most relevant chunk, so
+        position i is [Source i + 1]
+    """
+    sources = []
+    used = 0
+    skipped = 0
+    for rank, chunk in enumerate(chunks):
+        candidate = PackedSource(chunk, rank)
+        merged = [source for source in sources if candidate.video is not None and source.video == candidate.video and source.touches(chunk)]
+        for source in merged:
+            candidate.absorb(source)
+        cost = candidate.tokens() - sum(source.tokens() for source in merged)
+
+        if used + cost > budget and sources:
+            skipped += 1
+            continue
+        sources = [source for source in sources if source not in merged] + [candidate]
+        used += cost
+
+    sources.sort(key=lambda source: source.rank)
+    packed = [source.document() for source in sources]
+    if packed and used > budget:
+        first = packed[0]
+        packed[0] = Document(page_content=truncate_to_tokens(first.page_content, budget), metadata=first.metadata)
+
+    logger.info(
+        f"Packed {len(chunks)} chunks into {len(packed)} sources (~{min(used, budget)} tokens, "
+        f"budget {budget}, {skipped} skipped)"
+    )
+    return packed
@@ -2,12 +2,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
-
-from langchain_core.load import dumps
-
-from langchain_core.load import loads
 from load_env import load_env
-from llm.utils import format_docs
+from llm.utils import document_key, format_docs
 from llm.constant import PROMPT_MODEL_NAME, SUB_MODEL_NAME
 load_env()
 
@@ -31,13 +27,13 @@ generate_queries = (
 def get_unique_union(documents: list[list]):
     # print("Documents: ", documents)
     """ Unique union of retrieved docs """
-    # Flatten list of lists, and convert each Document to string
-    flattened_docs = [dumps(doc) for sublist in documents for doc in sublist]
-    # Get unique documents
-    unique_docs = list(set(flattened_docs))
-    # print("Unique Docs: ", unique_docs)
+    # Flatten list of lists, keeping the first copy of each chunk id
+    unique_docs = {}
+    for sublist in documents:
+        for doc in sublist:
+            unique_docs.setdefault(document_key(doc), doc)
     # Return
-    return [loads(doc) for doc in unique_docs]
+    return list(unique_docs.values())
 
 def get_multi_query_chain(retriever):
     """ Multi Query Chain """
@@ -2,11 +2,10 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
+import numpy as np
 
-from langchain_core.load import dumps
-
-from langchain_core.load import loads
-from llm.utils import format_docs
+from llm.utils import document_key, format_docs
+from vector.fusion import reciprocal_rank_fusion_ids
 from llm.constant import PROMPT_MODEL_NAME
 from load_env import load_env
 load_env()
@@ -26,35 +25,33 @@ generate_queries = (
     | (lambda x: x.split("\n"))
 )
 
-def reciprocal_rank_fusion(results: list[list], k=60):
+def reciprocal_rank_fusion(results: list[list], k=60, key=document_key, return_scores=False):
     """ Reciprocal_rank_fusion that takes multiple lists of ranked documents 
-        and an optional parameter k used in the RRF formula """
-
-    # Initialize a dictionary to hold fused scores for each unique document
-    fused_scores = {}
+        and an optional parameter k used in the RRF formula.
+        
+        key maps each item to its identity (by default the document's chunk id);
+        identities are numbered and fused as integer ids, and the first object
+        seen for each is returned. With return_scores, (item, fused_score)
+        tuples are returned. """
 
-    # Iterate through each list of ranked documents
+    # Number each unique document in first-seen order
+    numbers = {}
+    items = []
+    ranked_ids = []
     for docs in results:
-        # Iterate through each document in the list, with its rank (position in the list)
-        for rank, doc in enumerate(docs):
-            # Convert the document to a string format to use as a key (assumes documents can be serialized to JSON)
-            doc_str = dumps(doc)
-            # If the document is not yet in the fused_scores dictionary, add it with an initial score of 0
-            if doc_str not in fused_scores:
-                fused_scores[doc_str] = 0
-            # Retrieve the current score of the document, if any
-            previous_score = fused_scores[doc_str]
-            # Update the score of the document using the RRF formula: 1 / (rank + k)
-            fused_scores[doc_str] += 1 / (rank + k)
-
-    # Sort the documents based on their fused scores in descending order to get the final reranked results
-    reranked_results = [
-        loads(doc)
-        for doc, score in sorted(fused_scores.items(), key=lambda x: x[1], reverse=True)
-    ]
+        row = []
+        for doc in docs:
+            number = numbers.setdefault(key(doc), len(numbers))
+            if number == len(items):
+                items.append(doc)
+            row.append(number)
+        ranked_ids.append(np.array(row, dtype=np.int64))
 
-    # Return the reranked results as a list of tuples, each containing the document and its fused score
-    return reranked_results
+    # Accumulate 1 / (rank + k) per document and sort by fused score, best first
+    ids, scores = reciprocal_rank_fusion_ids([row[None] for row in ranked_ids if len(row)], k=k)
+    if return_scores:
+        return [(items[i], float(score)) for i, score in zip(ids, scores)]
+    return [items[i] for i in ids]
 
 def handle_empty_results(results):
     """Handles empty retrieval results by returning a fallback response."""
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import faiss
+import numpy as np
+from cache.embeddings import normalize_query
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+def history_digest(chat_history: list) -> str:
+    """
+    Hash the conversation so far after normalizing whitespace and unicode.
+
+    Two requests can only share a cached answer when their digests match, so a
+    follow-up question is never answered with a reply written for another thread.
+    """
+    # Non-ASCII text is kept as is, so NFKC can fold variants such as non-breaking spaces
+    serialized = json.dumps(chat_history, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(normalize_query(serialized).encode("utf-8")).hexdigest()
+
+class SemanticAnswerCache:
+    """
+    Small in-process FAISS index of past questions and the answers given to them.
+
+    A lookup embeds nothing itself: callers pass the question vector they already
+    have. An entry is returned when its cosine similarity clears the threshold
+    and its history digest matches. The whole cache is dropped whenever the main
+    vector store publishes a new snapshot (its epoch changes), because answers
+    written against the old corpus may now be stale.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.index = None
+        self.entries = []
+        self.epoch = None
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def _reset(self):
+        self.index = None
+        self.entries = []
+
+    def _check_epoch(self, epoch):
+        if epoch != self.epoch:
+            if self.entries:
+                logger.info(f"Vector store epoch changed ({self.epoch} -> {epoch}), dropping {len(self.entries)} cached answers")
+                self.counters["invalidations"] += 1
+            self._reset()
+            self.epoch = epoch
+
+    @staticmethod
+    def _as_row(vector):
+        row = np.asarray([vector], dtype=np.float32)
+        faiss.normalize_L2(row)
+        return row
+
+    def lookup(self, vector, digest: str, epoch: int):
+        """
+        Find a cached answer for a near-duplicate question.
+
+        Args:
+            vector (list): Embedding of the incoming question
+            digest (str): history_digest of the conversation
+            epoch (int): Current epoch of the main vector store
+
+        Returns:
+            dict: The cached {"question", "answer", "sources", "score"} or None
+        """
+        with self.lock:
+            self._check_epoch(epoch)
+            if self.index is None or self.index.ntotal == 0:
+                self.counters["misses"] += 1
+                return None
+
+            scores, ids = self.index.search(self._as_row(vector), min(8, self.index.ntotal))
+            for score, position in zip(scores[0], ids[0]):
+                if position == -1 or score < self.threshold:
+                    break
+                entry = self.entries[position]
+                if entry["history_digest"] == digest:
+                    self.counters["hits"] += 1
+                    logger.info(f"Semantic cache hit ({score:.3f}) for cached question: {entry['question']}")
+                    return {**entry, "score": float(score)}
+
+            self.counters["misses"] += 1
+            return None
+
+    def store(self, vector, digest: str, epoch: int, question: str, answer: str, sources: list):
+        """Remember the answer given for a question under the current store epoch"""
+        with self.lock:
+            self._check_epoch(epoch)
+            row = self._as_row(vector)
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(row.shape[1])
+
+            # Evict the oldest entry once full; positions shift down by one, like the list
+            if self.index.ntotal >= self.max_entries:
+                self.index.remove_ids(np.array([0], dtype=np.int64))
+                self.entries.pop(0)
+
+            self.index.add(row)
+            self.entries.append({
+                "question": question,
+                "history_digest": digest,
+                "answer": answer,
+                "sources": sources,
+            })
+            self.counters["stores"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+            stats["epoch"] = self.epoch
+            stats["threshold"] = self.threshold
+        return stats
@@ -0,0 +1,17 @@
+import hashlib
+
+def format_docs(docs):
+    """Join retrieved documents' text into one context string"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+def document_key(doc):
+    """
+    Identity of a retrieved document for dedup and fusion.
+    
+    Chunks indexed with a content-derived chunk_id use it; older chunks fall
+    back to a digest of their title and text.
+    """
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id is not None:
+        return chunk_id
+    return hashlib.sha256(f"{doc.metadata.get('title', '')}\0{doc.page_content}".encode("utf-8")).hexdigest()
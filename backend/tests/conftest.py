@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import numpy as np
+import pytest
+
+# Tests import modules the way the app does, relative to backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Modules that build OpenAI clients at import time only need a key to exist
+os.environ.setdefault("OPENAI_API_KEY", "test")
+# Keep the caches and the store out of the working tree, and vectors small
+_scratch = tempfile.mkdtemp(prefix="nefac-tests-")
+os.environ.setdefault("NEFAC_CACHE_DB", os.path.join(_scratch, "cache.sqlite3"))
+os.environ.setdefault("NEFAC_FETCH_CACHE_DB", os.path.join(_scratch, "fetch_cache.sqlite3"))
+os.environ.setdefault("FAISS_STORE_PATH", os.path.join(_scratch, "faiss_store"))
+os.environ.setdefault("EMBEDDING_DIMENSIONS", "16")
+
+def unit_vectors(rows):
+    rows = np.atleast_2d(np.asarray(rows, dtype=np.float32))
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+@pytest.fixture
+def make_snapshot():
+    """Build an unpublished store snapshot from (title, text, vector) rows, without embedding anything"""
+    from vector.load import apply_document_batch, create_empty_faiss_store
+
+    def build(rows, content_hashes=None):
+        snapshot = create_empty_faiss_store()
+        if rows:
+            titles, texts, vectors = zip(*rows)
+            metadatas = [{"title": title} for title in titles]
+            ids = [f"{i:016x}" for i in range(len(rows))]
+            apply_document_batch(snapshot, list(texts), unit_vectors(vectors).tolist(), metadatas, ids, content_hashes)
+        return snapshot
+
+    return build
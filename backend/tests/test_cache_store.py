@@ -0,0 +1,130 @@
+import sqlite3
+from types import SimpleNamespace
+import pytest
+import cache.store as store
+from cache.store import TieredCache, summarize_namespaces
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(store, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+def disk_rows(path, namespace):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute(
+            "SELECT key, accessed FROM cache_entries WHERE namespace = ?", (namespace,)
+        ).fetchall())
+    finally:
+        conn.close()
+
+def test_disk_tier_is_shared_between_instances(db_path, clock):
+    TieredCache("ns", path=db_path).set_many({"a": b"1", "b": b"2"})
+    reader = TieredCache("ns", path=db_path)
+    assert reader.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"2"}
+    assert reader.get("a") == b"1"
+    stats = reader.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (2, 1, 1)
+    assert stats["disk_entries"] == 2
+    assert stats["hit_rate"] == pytest.approx(0.75)
+
+def test_namespaces_are_isolated(db_path, clock):
+    TieredCache("one", path=db_path).set("key", b"first")
+    TieredCache("two", path=db_path).set("key", b"second")
+    assert TieredCache("one", path=db_path).get("key") == b"first"
+    assert TieredCache("two", path=db_path).get("key") == b"second"
+
+    TieredCache("one", path=db_path).clear()
+    assert TieredCache("one", path=db_path).get("key") is None
+    assert TieredCache("two", path=db_path).get("key") == b"second"
+
+def test_ttl_expires_disk_entries(db_path, clock):
+    writer = TieredCache("ns", ttl_seconds=60, path=db_path)
+    writer.set("old", b"x")
+    clock.now += 30
+    writer.set("new", b"y")
+    clock.now += 45
+
+    # Expired entries are never served, even before eviction deletes them
+    assert TieredCache("ns", ttl_seconds=60, path=db_path).get_many(["old", "new"]) == {"new": b"y"}
+    assert set(disk_rows(db_path, "ns")) == {"old", "new"}
+
+    clock.now += store.CACHE_EVICT_INTERVAL_SECONDS
+    writer.set("newest", b"z")
+    assert set(disk_rows(db_path, "ns")) == {"newest"}
+
+def test_eviction_waits_for_the_interval_or_the_write_count(db_path, clock, monkeypatch):
+    monkeypatch.setattr(store, "CACHE_EVICT_WRITES", 4)
+    cache = TieredCache("ns", max_disk_entries=2, path=db_path)
+    # The first write evicts (nothing has yet); the next three only pile up
+    for key in "abcd":
+        cache.set(key, b"1")
+        clock.now += 1
+    assert len(disk_rows(db_path, "ns")) == 4
+
+    # The fourth write since the last eviction trims back to the two most recently used
+    cache.set("e", b"1")
+    assert set(disk_rows(db_path, "ns")) == {"d", "e"}
+
+    clock.now += store.CACHE_EVICT_INTERVAL_SECONDS
+    cache.set("f", b"1")
+    assert set(disk_rows(db_path, "ns")) == {"e", "f"}
+
+def test_max_disk_bytes_keeps_the_most_recently_used(db_path, clock, monkeypatch):
+    monkeypatch.setattr(store, "CACHE_EVICT_WRITES", 1)
+    monkeypatch.setattr(store, "CACHE_TOUCH_BATCH", 1)
+    cache = TieredCache("ns", max_disk_bytes=250, path=db_path)
+    for key in ("a", "b", "c"):
+        cache.set(key, b"x" * 100)
+        clock.now += 1
+    assert set(disk_rows(db_path, "ns")) == {"b", "c"}
+
+    # A disk hit refreshes "b", so "c" is the one pushed out next
+    TieredCache("ns", path=db_path).get("b")
+    clock.now += 1
+    cache.set("d", b"x" * 100)
+    assert set(disk_rows(db_path, "ns")) == {"b", "d"}
+
+def test_access_times_are_written_in_batches(db_path, clock, monkeypatch):
+    monkeypatch.setattr(store, "CACHE_TOUCH_BATCH", 3)
+    TieredCache("ns", path=db_path).set_many({"a": b"1", "b": b"2", "c": b"3"})
+    written = disk_rows(db_path, "ns")
+
+    clock.now += 10
+    reader = TieredCache("ns", max_memory_entries=1, path=db_path)
+    reader.get_many(["a", "b"])
+    assert disk_rows(db_path, "ns") == written
+
+    reader.get("c")
+    assert disk_rows(db_path, "ns") == {"a": clock.now, "b": clock.now, "c": clock.now}
+
+def test_entries_flush_pending_access_times(db_path, clock):
+    TieredCache("ns", path=db_path).set_many({"a": b"1", "b": b"22"})
+    clock.now += 10
+    reader = TieredCache("ns", path=db_path)
+    reader.get("a")
+    entries = reader.entries()
+    assert [(key, size, accessed) for key, size, _, accessed in entries] == [("a", 1, clock.now), ("b", 2, clock.now - 10)]
+    assert len(reader.entries(limit=1)) == 1
+
+def test_summarize_namespaces(db_path, clock):
+    TieredCache("one", path=db_path).set_many({"a": b"12", "b": b"345"})
+    clock.now += 5
+    TieredCache("two", path=db_path).set("c", b"6")
+    assert summarize_namespaces(db_path) == [
+        ("one", 2, 5, 1000.0, 1000.0),
+        ("two", 1, 1, 1005.0, 1005.0),
+    ]
+    assert summarize_namespaces(db_path + ".missing") == []
@@ -0,0 +1,83 @@
+from langchain_core.documents import Document
+from llm.context_packer import CONTEXT_MODEL_NAME, join_windows, pack_context
+from tokens import count_tokens
+
+URL = "https://www.youtube.com/watch?v=abc"
+
+def clip(start, text, index, title="Open meetings 101", url=URL):
+    return Document(page_content=text, metadata={
+        "type": "youtube", "title": title, "source": url, "start_seconds": start, "page": start, "chunk_index": index,
+    })
+
+def page(title, text):
+    return Document(page_content=text, metadata={"type": "pdf", "title": title, "page": 1})
+
+def words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+def tokens(text):
+    return count_tokens(text, CONTEXT_MODEL_NAME)
+
+def test_everything_fits_in_relevance_order():
+    chunks = [page("A", words("a", 20)), page("B", words("b", 20)), page("C", words("c", 20))]
+    packed = pack_context(chunks, budget=10000)
+    assert [doc.metadata["title"] for doc in packed] == ["A", "B", "C"]
+
+def test_budget_skips_chunks_that_would_overflow_but_keeps_smaller_ones():
+    big, small = words("big", 300), words("small", 10)
+    chunks = [page("first", words("first", 50)), page("big", big), page("small", small)]
+    budget = tokens(chunks[0].page_content) + tokens(small) + 5
+    packed = pack_context(chunks, budget=budget)
+    assert [doc.metadata["title"] for doc in packed] == ["first", "small"]
+    assert sum(tokens(doc.page_content) for doc in packed) <= budget
+
+def test_most_relevant_chunk_is_truncated_when_it_alone_exceeds_the_budget():
+    packed = pack_context([page("huge", words("w", 2000)), page("next", words("n", 5))], budget=100)
+    assert [doc.metadata["title"] for doc in packed] == ["huge"]
+    assert tokens(packed[0].page_content) <= 100
+    assert packed[0].page_content.startswith("w0 w1 w2")
+
+def test_adjacent_windows_of_one_video_merge_into_a_time_range():
+    chunks = [clip(120, "the board must post notice", 2), clip(60, "meetings are open to the public", 1)]
+    packed = pack_context(chunks, budget=10000)
+    assert len(packed) == 1
+    merged = packed[0]
+    assert merged.page_content == "meetings are open to the public the board must post notice"
+    assert merged.metadata["start_seconds"] == 60
+    assert merged.metadata["end_seconds"] == 120
+    assert merged.metadata["merged_chunks"] == 2
+
+def test_distant_windows_and_other_videos_stay_separate():
+    chunks = [
+        clip(0, "introduction", 0),
+        clip(900, "closing remarks", 15),
+        clip(60, "another talk", 1, title="Public records", url="https://youtu.be/xyz"),
+    ]
+    packed = pack_context(chunks, budget=10000)
+    assert [doc.page_content for doc in packed] == ["introduction", "closing remarks", "another talk"]
+
+def test_merged_source_sits_at_its_best_chunks_rank():
+    chunks = [page("A", "alpha"), clip(60, "second window", 1), page("B", "beta"), clip(0, "first window", 0)]
+    packed = pack_context(chunks, budget=10000)
+    assert [doc.page_content for doc in packed] == ["alpha", "first window second window", "beta"]
+
+def test_chunks_split_from_one_clip_keep_their_document_order():
+    # All three come from the clip starting at 60s; retrieval ranked the last part first
+    parts = ["The requester files a written request", "and the custodian has ten business days", "to respond or to cite an exemption"]
+    chunks = [clip(60, parts[2], 7), clip(60, parts[0], 5), clip(60, parts[1], 6)]
+    packed = pack_context(chunks, budget=10000)
+    assert packed[0].page_content == " ".join(parts)
+
+def test_merging_costs_only_the_added_tokens():
+    first, second = clip(0, words("x", 40), 0), clip(60, words("y", 40), 1)
+    budget = tokens(join_windows([first.page_content, second.page_content])) + 1
+    packed = pack_context([first, second, page("extra", words("z", 40))], budget=budget)
+    assert len(packed) == 1
+    assert packed[0].metadata["merged_chunks"] == 2
+
+def test_overlap_repeated_by_the_splitter_is_dropped():
+    joined = join_windows(["the custodian must respond within ten days", "respond within ten days of receipt"])
+    assert joined == "the custodian must respond within ten days of receipt"
+
+def test_empty_input():
+    assert pack_context([], budget=100) == []
@@ -0,0 +1,84 @@
+import pytest
+from langchain_core.documents import Document
+from vector.docstore import CompactDocstore
+
+def doc(doc_id, text, **metadata):
+    return Document(id=doc_id, page_content=text, metadata={"title": "Guide", **metadata})
+
+def contents(docstore):
+    return {doc_id: docstore.search(doc_id).page_content for doc_id in docstore.ids()}
+
+def test_round_trip_through_overlay_and_rebase(tmp_path):
+    docstore = CompactDocstore({
+        "a": doc("a", "Open meetings law"),
+        "b": doc("b", "Café records — résumé", page=3),
+    })
+    docstore.write(str(tmp_path), {0: "a", 1: "b"})
+
+    opened, index_to_docstore_id = CompactDocstore.open(str(tmp_path))
+    assert index_to_docstore_id == {0: "a", 1: "b"}
+    assert contents(opened) == {"a": "Open meetings law", "b": "Café records — résumé"}
+    assert opened.search("b").metadata == {"title": "Guide", "page": 3}
+    assert "a" in opened and "missing" not in opened
+    assert opened.search("missing") == "ID missing not found."
+
+    # Changes land in the overlay and leave the mapped file alone
+    opened.add({"c": doc("c", "Court access")})
+    opened.delete(["a"])
+    assert contents(opened) == {"b": "Café records — résumé", "c": "Court access"}
+    assert len(opened) == 2
+    with pytest.raises(ValueError):
+        opened.delete(["a"])
+    with pytest.raises(ValueError):
+        opened.add({"b": doc("b", "duplicate")})
+
+    # Writing and rebasing moves the overlay into the file
+    rewritten = tmp_path / "next"
+    rewritten.mkdir()
+    opened.write(str(rewritten), {0: "b", 1: "c"})
+    opened.rebase(str(rewritten))
+    base, overlay, deleted = opened._state
+    assert overlay == {} and deleted == frozenset()
+    assert contents(opened) == {"b": "Café records — résumé", "c": "Court access"}
+
+    reopened, index_to_docstore_id = CompactDocstore.open(str(rewritten))
+    assert index_to_docstore_id == {0: "b", 1: "c"}
+    assert contents(reopened) == contents(opened)
+
+def test_copy_does_not_share_the_overlay(tmp_path):
+    CompactDocstore({"a": doc("a", "one")}).write(str(tmp_path), {0: "a"})
+    opened, _ = CompactDocstore.open(str(tmp_path))
+    copy = opened.copy()
+    copy.add({"b": doc("b", "two")})
+    copy.delete(["a"])
+    assert contents(opened) == {"a": "one"}
+    assert contents(copy) == {"b": "two"}
+
+def test_deleted_id_can_be_added_again(tmp_path):
+    CompactDocstore({"a": doc("a", "old")}).write(str(tmp_path), {0: "a"})
+    opened, _ = CompactDocstore.open(str(tmp_path))
+    opened.delete(["a"])
+    opened.add({"a": doc("a", "new")})
+    assert contents(opened) == {"a": "new"}
+
+def test_write_keeps_only_indexed_documents_in_index_order(tmp_path):
+    docstore = CompactDocstore({"a": doc("a", "one"), "b": doc("b", "two"), "orphan": doc("orphan", "three")})
+    docstore.write(str(tmp_path), {1: "a", 0: "b"})
+    opened, index_to_docstore_id = CompactDocstore.open(str(tmp_path))
+    assert index_to_docstore_id == {0: "b", 1: "a"}
+    assert list(opened.ids()) == ["b", "a"]
+
+    # The file does not hold everything this docstore does, so rebasing onto it is refused
+    docstore.rebase(str(tmp_path))
+    assert docstore._state[0] is None
+    assert "orphan" in docstore
+
+def test_write_refuses_dangling_index_ids(tmp_path):
+    with pytest.raises(ValueError):
+        CompactDocstore({"a": doc("a", "one")}).write(str(tmp_path), {0: "a", 1: "gone"})
+
+def test_empty_round_trip(tmp_path):
+    CompactDocstore().write(str(tmp_path), {})
+    opened, index_to_docstore_id = CompactDocstore.open(str(tmp_path))
+    assert index_to_docstore_id == {}
+    assert len(opened) == 0
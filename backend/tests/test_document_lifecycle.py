@@ -0,0 +1,97 @@
+import numpy as np
+from langchain_core.documents import Document
+from conftest import unit_vectors
+from vector.load import apply_document_batch, plan_document_changes, remove_from
+
+def pages(title, content_hash):
+    return [Document(page_content=f"{title} text", metadata={"title": title, "content_hash": content_hash})]
+
+def vector(seed):
+    return np.random.default_rng(seed).normal(size=16)
+
+def rows(title, n, first_seed):
+    """(title, text, seed) per chunk; the seed fixes the chunk's vector and a token unique to it"""
+    return [(title, f"{title} chunk{i} token{first_seed + i}", first_seed + i) for i in range(n)]
+
+def build(make_snapshot, chunk_rows, content_hashes=None):
+    return make_snapshot([(title, text, vector(seed)) for title, text, seed in chunk_rows], content_hashes)
+
+def apply(snapshot, chunk_rows, ids, content_hashes=None, removed_titles=()):
+    texts = [text for _, text, _ in chunk_rows]
+    vectors = unit_vectors([vector(seed) for _, _, seed in chunk_rows]).tolist() if chunk_rows else []
+    metadatas = [{"title": title} for title, _, _ in chunk_rows]
+    return apply_document_batch(snapshot, texts, vectors, metadatas, ids, content_hashes, removed_titles)
+
+def assert_consistent(snapshot, expected):
+    """Positions are contiguous and every structure agrees on which chunk sits where"""
+    n = len(expected)
+    assert snapshot.index.ntotal == n
+    assert len(snapshot.lexical) == n
+    assert sorted(snapshot.index_to_docstore_id) == list(range(n))
+    owned = {doc_id for record in snapshot.documents.values() for doc_id in record["ids"]}
+    assert owned == set(snapshot.index_to_docstore_id.values())
+    for position, (title, text, seed) in enumerate(expected):
+        doc = snapshot.docstore.search(snapshot.index_to_docstore_id[position])
+        assert (doc.metadata["title"], doc.page_content) == (title, text)
+        np.testing.assert_allclose(snapshot.index.reconstruct(position), unit_vectors(vector(seed))[0], atol=1e-6)
+        # The lexical row at each position still holds that chunk's text
+        _, ids = snapshot.lexical.search([f"token{seed}"], 1)
+        assert ids[0][0] == position
+
+def test_plan_classifies_every_document(make_snapshot):
+    snapshot = build(
+        make_snapshot,
+        rows("kept", 1, 0) + rows("edited", 1, 1) + rows("withdrawn", 1, 2) + rows("legacy", 1, 3),
+        {"kept": "h-kept", "edited": "h-edited", "withdrawn": "h-withdrawn"},
+    )
+    assert snapshot.documents["legacy"]["content_hash"] is None
+
+    plan = plan_document_changes(snapshot.documents, {
+        "kept": pages("kept", "h-kept"),
+        "edited": pages("edited", "h-edited-2"),
+        "legacy": pages("legacy", "h-legacy"),
+        "new": pages("new", "h-new"),
+    })
+    assert plan == {
+        "added": ["new"],
+        "changed": ["edited"],
+        "removed": ["withdrawn"],
+        "unchanged": 1,
+        "adopted": {"legacy": "h-legacy"},
+    }
+
+def test_empty_corpus_never_purges(make_snapshot):
+    snapshot = build(make_snapshot, rows("kept", 1, 0), {"kept": "h-kept"})
+    assert plan_document_changes(snapshot.documents, {})["removed"] == []
+
+def test_add_change_and_withdraw_renumber_positions(make_snapshot):
+    a, b, c = rows("a", 2, 0), rows("b", 3, 10), rows("c", 2, 20)
+    snapshot = build(make_snapshot, a + b + c, {"a": "h-a", "b": "h-b", "c": "h-c"})
+    assert_consistent(snapshot, a + b + c)
+
+    # Changing "b" drops its three chunks from the middle and appends the new two
+    b2 = rows("b", 2, 30)
+    assert apply(snapshot, b2, ["b2-0", "b2-1"], {"b": "h-b-2"}) == 3
+    assert snapshot.documents["b"] == {"content_hash": "h-b-2", "ids": ["b2-0", "b2-1"]}
+    assert_consistent(snapshot, a + c + b2)
+
+    # Withdrawing "a" shifts everything after it to the front
+    assert apply(snapshot, [], None, removed_titles=["a"]) == 2
+    assert set(snapshot.documents) == {"b", "c"}
+    assert_consistent(snapshot, c + b2)
+
+    # Adding a document appends after the survivors
+    d = rows("d", 1, 40)
+    assert apply(snapshot, d, ["d-0"], {"d": "h-d"}) == 0
+    assert_consistent(snapshot, c + b2 + d)
+
+def test_batch_without_hashes_appends_to_the_title(make_snapshot):
+    snapshot = build(make_snapshot, rows("a", 1, 0), {"a": "h-a"})
+    apply(snapshot, rows("a", 1, 5), ["a-extra"])
+    assert snapshot.documents["a"]["content_hash"] == "h-a"
+    assert len(snapshot.documents["a"]["ids"]) == 2
+
+def test_remove_from_ignores_unknown_ids(make_snapshot):
+    snapshot = build(make_snapshot, rows("a", 2, 0))
+    assert remove_from(snapshot, ["nope"]) == 0
+    assert snapshot.index.ntotal == 2
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import numpy as np
+import pytest
+from cache.embeddings import FULL_EMBEDDING_DIMENSIONS, CachedEmbeddings, normalize_query, truncate_embeddings
+from cache.store import TieredCache
+
+class FakeEmbeddings:
+    """Deterministic 8-d vectors derived from the text; records every batch sent to the API"""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def vector(text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big")
+        return np.random.default_rng(seed).normal(size=8).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+@pytest.fixture
+def api():
+    return FakeEmbeddings()
+
+@pytest.fixture
+def make_model(api, tmp_path):
+    def build(dimensions=FULL_EMBEDDING_DIMENSIONS, model_name="model-a"):
+        path = str(tmp_path / "cache.sqlite3")
+        return CachedEmbeddings(
+            api,
+            model_name,
+            TieredCache("query_embeddings", path=path),
+            TieredCache("document_embeddings", path=path),
+            dimensions=dimensions,
+        )
+    return build
+
+def test_normalize_query_folds_whitespace_and_unicode():
+    assert normalize_query("  public records \n law ") == "public records law"
+    assert normalize_query("ｆｏｉａ") == "foia"
+
+def test_query_variants_share_one_embedding(make_model, api):
+    model = make_model()
+    first = model.embed_query("What is FOIA?")
+    assert model.embed_query("  What   is FOIA? ") == first
+    assert api.calls == [["What is FOIA?"]]
+
+    # A fresh process (new memory tier) reads the vector back from disk
+    assert make_model().embed_query("What is FOIA?") == pytest.approx(first)
+    assert len(api.calls) == 1
+
+def test_embed_queries_calls_the_api_once_for_distinct_misses(make_model, api):
+    model = make_model()
+    model.embed_query("cached")
+    vectors = model.embed_queries(["cached", "new one", "new  one", "another"])
+    assert api.calls[1:] == [["new one", "another"]]
+    assert vectors[1] == vectors[2]
+    assert vectors[0] == pytest.approx(FakeEmbeddings.vector("cached"))
+
+def test_query_keys_depend_on_the_model(make_model, api):
+    make_model(model_name="model-a").embed_query("same text")
+    make_model(model_name="model-b").embed_query("same text")
+    assert len(api.calls) == 2
+
+def test_async_queries_use_the_same_cache(make_model, api):
+    model = make_model()
+    vector = model.embed_query("open meetings")
+    assert asyncio.run(model.aembed_query("open  meetings")) == vector
+    assert len(api.calls) == 1
+
+def test_vectors_are_truncated_after_caching(make_model, api):
+    full = make_model().embed_query("court records")
+    short = make_model(dimensions=4).embed_query("court records")
+    assert len(api.calls) == 1
+    np.testing.assert_allclose(short, truncate_embeddings(full, 4), rtol=1e-6)
+    assert np.linalg.norm(short) == pytest.approx(1.0)
+
+def test_document_vectors_are_content_addressed(make_model, api):
+    model = make_model()
+    vectors, reused, computed = model.embed_documents_counted(["chunk one", "chunk two", "chunk one"])
+    assert (reused, computed) == (1, 2)
+    assert api.calls == [["chunk one", "chunk two"]]
+    assert vectors[0] == vectors[2]
+
+    # A rebuild re-embeds only the text that changed, even from a fresh process
+    vectors, reused, computed = make_model().embed_documents_counted(["chunk one", "chunk two, edited"])
+    assert (reused, computed) == (1, 1)
+    assert api.calls[1] == ["chunk two, edited"]
+
+def test_document_keys_are_exact_text(make_model, api):
+    # Unlike queries, chunk text is not normalized: the vector belongs to exactly that text
+    model = make_model()
+    model.embed_documents(["public records"])
+    model.embed_documents(["public  records"])
+    assert len(api.calls) == 2
+    # Documents and queries are cached apart
+    model.embed_query("public records")
+    assert len(api.calls) == 3
+
+def test_cached_document_vectors_never_call_the_api(make_model, api):
+    model = make_model(dimensions=4)
+    model.embed_documents(["known"])
+    known, unknown = model.cached_document_vectors(["known", "unknown"])
+    assert unknown is None
+    # Cached vectors keep their full size whatever the output dimension
+    np.testing.assert_allclose(known, FakeEmbeddings.vector("known"))
+    assert len(api.calls) == 1
+
+def test_async_documents_share_the_cache(make_model, api):
+    model = make_model()
+    vectors = model.embed_documents(["alpha", "beta"])
+    assert asyncio.run(model.aembed_documents(["beta", "alpha", "gamma"]))[:2] == [vectors[1], vectors[0]]
+    assert api.calls[1] == ["gamma"]
@@ -0,0 +1,78 @@
+import pytest
+from langchain_core.documents import Document
+import document.fetch_cache as fetch_cache
+import document.transcript_cleaning as transcript_cleaning
+from cache.store import TieredCache
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch, tmp_path):
+    """Point every fetch cache at a private database; returns a factory for a fresh process's view of it"""
+    path = str(tmp_path / "fetch_cache.sqlite3")
+
+    def reopen():
+        for name, namespace in (("transcript_cache", "yt_transcripts"), ("metadata_cache", "yt_metadata"), ("cleaned_text_cache", "cleaned_text")):
+            cache = TieredCache(namespace, path=path)
+            monkeypatch.setattr(fetch_cache, name, cache)
+            if name == "cleaned_text_cache":
+                monkeypatch.setattr(transcript_cleaning, name, cache)
+
+    reopen()
+    return reopen
+
+def test_metadata_round_trip(caches):
+    assert fetch_cache.get_cached_metadata("vid") is None
+    metadata = {"title": "Café Sunshine Week — panel", "publish_date": "2024-03-11", "views": 12}
+    fetch_cache.cache_metadata("vid", metadata)
+    caches()
+    assert fetch_cache.get_cached_metadata("vid") == metadata
+    assert fetch_cache.get_cached_metadata("other") is None
+
+def test_transcript_clips_come_back_as_documents(caches):
+    clips = [
+        Document(page_content="First clip", metadata={"title": "Panel", "page": 0}),
+        Document(page_content="Second clip", metadata={"title": "Panel", "page": 30}),
+    ]
+    fetch_cache.cache_transcript_clips("vid", clips, "Fetched with the loader")
+    caches()
+    cached = fetch_cache.get_cached_transcript("vid")
+    assert cached["message"] == "Fetched with the loader"
+    assert all(isinstance(clip, Document) for clip in cached["clips"])
+    assert [(clip.page_content, clip.metadata) for clip in cached["clips"]] == [(clip.page_content, clip.metadata) for clip in clips]
+
+def test_transcript_entries_round_trip(caches):
+    entries = [{"text": "hello", "start": 0.0, "duration": 1.5}, {"text": "world", "start": 1.5, "duration": 2.0}]
+    fetch_cache.cache_transcript_entries("vid", entries, "Fetched raw entries")
+    caches()
+    assert fetch_cache.get_cached_transcript("vid") == {"entries": entries, "message": "Fetched raw entries"}
+
+def test_namespaces_share_one_database_without_colliding(caches):
+    fetch_cache.cache_metadata("vid", {"title": "metadata"})
+    fetch_cache.cache_transcript_entries("vid", [], "transcript")
+    caches()
+    assert fetch_cache.get_cached_metadata("vid") == {"title": "metadata"}
+    assert fetch_cache.get_cached_transcript("vid")["message"] == "transcript"
+
+def test_cleaned_text_key_tracks_the_prompt_version():
+    assert fetch_cache.cleaned_text_key("v1", "text") == fetch_cache.cleaned_text_key("v1", "text")
+    assert fetch_cache.cleaned_text_key("v1", "text") != fetch_cache.cleaned_text_key("v2", "text")
+
+def test_clean_clips_reuses_cleaned_text(caches, monkeypatch):
+    batches = []
+
+    def fake_clean_batch(texts):
+        batches.append(list(texts))
+        # "unchanged" comes back as is, like a clip the model could not be matched to
+        return [text if text == "unchanged" else text.upper() for text in texts], 0
+
+    monkeypatch.setattr(transcript_cleaning, "clean_batch", fake_clean_batch)
+    monkeypatch.setattr(transcript_cleaning, "count_tokens", lambda text: len(text.split()))
+    cleaned, stats = transcript_cleaning.clean_clips(["one", "two", "unchanged"])
+    assert cleaned == ["ONE", "TWO", "unchanged"]
+    assert stats["cached"] == 0
+
+    caches()
+    batches.clear()
+    cleaned, stats = transcript_cleaning.clean_clips(["two", "unchanged", "three"])
+    assert cleaned == ["TWO", "unchanged", "THREE"]
+    assert stats["cached"] == 1
+    assert sorted(text for batch in batches for text in batch) == ["three", "unchanged"]
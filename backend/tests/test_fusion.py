@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from vector.fusion import RRF_K, reciprocal_rank_fusion_ids
+
+def rrf(*ranks):
+    return sum(1.0 / (rank + RRF_K) for rank in ranks)
+
+def test_ids_found_by_both_rankings_come_first():
+    ids, scores = reciprocal_rank_fusion_ids([[[10, 20, 30]], [[30, 40, 10]]])
+    assert ids.tolist() == [10, 30, 20, 40]
+    assert scores == pytest.approx([rrf(0, 2), rrf(2, 0), rrf(1), rrf(1)])
+
+def test_ties_go_to_the_smaller_id():
+    # 7 and 3 both score 1/(0 + k) + 1/(1 + k); 9 and 5 both 1/(2 + k)
+    ids, scores = reciprocal_rank_fusion_ids([[[7, 3, 9]], [[3, 7, 5]]])
+    assert ids.tolist() == [3, 7, 5, 9]
+    assert scores[0] == scores[1]
+    assert scores[2] == scores[3]
+
+def test_large_chunk_ids_keep_their_value():
+    big = (1 << 62) + 12345
+    ids, _ = reciprocal_rank_fusion_ids([[[big, 1]], [[big]]])
+    assert ids.tolist() == [big, 1]
+
+def test_duplicate_within_one_row_counts_once_at_its_best_rank():
+    ids, scores = reciprocal_rank_fusion_ids([[[5, 6, 5, 5]]])
+    assert ids.tolist() == [5, 6]
+    assert scores == pytest.approx([rrf(0), rrf(1)])
+
+def test_each_query_row_of_one_list_adds_its_own_contribution():
+    ids, scores = reciprocal_rank_fusion_ids([np.array([[5, 6], [6, 5], [5, -1]])])
+    assert ids.tolist() == [5, 6]
+    assert scores == pytest.approx([rrf(0, 1, 0), rrf(1, 0)])
+
+def test_padding_is_ignored():
+    ids, _ = reciprocal_rank_fusion_ids([[[4, -1, -1]], [[-1, -1, -1]]])
+    assert ids.tolist() == [4]
+
+@pytest.mark.parametrize("ranked_ids", [[], [[]], [np.zeros((0, 5), dtype=np.int64)], [[[-1, -1]]]])
+def test_empty_input_gives_empty_arrays(ranked_ids):
+    ids, scores = reciprocal_rank_fusion_ids(ranked_ids)
+    assert ids.dtype == np.int64 and len(ids) == 0
+    assert len(scores) == 0
+
+def test_empty_list_next_to_a_ranking_changes_nothing():
+    ids, scores = reciprocal_rank_fusion_ids([[[1, 2]], []])
+    assert ids.tolist() == [1, 2]
+    assert scores == pytest.approx([rrf(0), rrf(1)])
+
+def test_limit_keeps_the_best():
+    # A first and a third place (1 and 3) beat two second places (2)
+    ids, scores = reciprocal_rank_fusion_ids([[[1, 2, 3]], [[3, 2, 1]]], limit=2)
+    assert len(ids) == len(scores) == 2
+    assert ids.tolist() == [1, 3]
@@ -0,0 +1,54 @@
+import faiss
+import numpy as np
+import pytest
+import vector.index_factory as index_factory
+from vector.index_factory import apply_search_params, build_index, read_index, reconstruct_all, reconstruct_rows, remove_positions
+
+def vectors(n, d=16, seed=0):
+    rows = np.random.default_rng(seed).normal(size=(n, d)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def ivf_of(index):
+    return faiss.extract_index_ivf(index)
+
+@pytest.fixture
+def ivf_index(monkeypatch):
+    monkeypatch.setattr(index_factory, "FAISS_TRAIN_MIN_VECTORS", 100)
+    data = vectors(400)
+    index = build_index("ivf_flat", 16, data)
+    index.add(data)
+    return index, data
+
+def test_built_ivf_index_has_a_direct_map(ivf_index):
+    index, data = ivf_index
+    assert ivf_of(index).direct_map.type == faiss.DirectMap.Array
+    np.testing.assert_allclose(reconstruct_rows(index, [5, 399, 0]), data[[5, 399, 0]], rtol=1e-6)
+    np.testing.assert_allclose(reconstruct_all(index), data, rtol=1e-6)
+
+def test_reading_vectors_back_does_not_modify_the_index(ivf_index):
+    index, _ = ivf_index
+    before = faiss.serialize_index(index)
+    reconstruct_rows(index, [1, 2, 3])
+    reconstruct_all(index)
+    assert np.array_equal(faiss.serialize_index(index), before)
+
+def test_index_without_a_direct_map_is_refused_rather_than_modified(ivf_index):
+    index, _ = ivf_index
+    plain = faiss.clone_index(index)
+    ivf_of(plain).make_direct_map(False)
+    with pytest.raises(ValueError, match="direct map"):
+        reconstruct_rows(plain, [0])
+    assert ivf_of(plain).direct_map.type == faiss.DirectMap.NoMap
+    # Snapshots go through apply_search_params before they are published
+    apply_search_params(plain)
+    assert reconstruct_rows(plain, [0]).shape == (1, 16)
+
+def test_direct_map_survives_save_load_and_removal(ivf_index, tmp_path):
+    index, data = ivf_index
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+    for opened in (read_index(path), read_index(path, mmap=False)):
+        np.testing.assert_allclose(reconstruct_rows(apply_search_params(opened), [7]), data[[7]], rtol=1e-6)
+
+    remaining = remove_positions(faiss.clone_index(index), [0, 10], data)
+    np.testing.assert_allclose(reconstruct_all(remaining), np.delete(data, [0, 10], axis=0), rtol=1e-6)
@@ -0,0 +1,99 @@
+import numpy as np
+from conftest import unit_vectors
+from vector.ingest_log import _HEADER, IngestLog
+from vector.load import ThreadSafeVectorStore, create_empty_faiss_store, open_snapshot
+
+def batch(title, n, seed):
+    rng = np.random.default_rng(seed)
+    texts = [f"{title} chunk {i}" for i in range(n)]
+    metadatas = [{"title": title} for _ in range(n)]
+    ids = [f"{title}-{i}" for i in range(n)]
+    return texts, unit_vectors(rng.normal(size=(n, 16))).tolist(), metadatas, ids
+
+def log_two_batches(tmp_path):
+    """Log two documents through a writer store; returns the log and that store"""
+    log = IngestLog(str(tmp_path / "store.ingest.log"))
+    writer = ThreadSafeVectorStore(create_empty_faiss_store())
+    for title, seed in (("alpha", 0), ("beta", 1)):
+        texts, vectors, metadatas, ids = batch(title, 3, seed)
+        writer.append_batch(texts, vectors, metadatas, log=log, ids=ids, content_hashes={title: f"{title}-hash"})
+    return log, writer
+
+def test_replay_rebuilds_what_was_logged(tmp_path):
+    log, writer = log_two_batches(tmp_path)
+    store = ThreadSafeVectorStore(create_empty_faiss_store())
+    assert store.replay_log(log) == 6
+    snapshot = store.vector_store
+    assert snapshot.ingest_log_seq == 2
+    assert snapshot.index.ntotal == 6
+    assert snapshot.index_to_docstore_id == writer.vector_store.index_to_docstore_id
+    assert snapshot.documents == writer.vector_store.documents
+
+def test_torn_trailing_record_is_ignored(tmp_path):
+    log, _ = log_two_batches(tmp_path)
+    # A crash mid-append leaves a header promising more bytes than were written
+    with open(log.path, "ab") as log_file:
+        log_file.write(_HEADER.pack(1000))
+        log_file.write(b"partial")
+    assert [record["seq"] for record in log.replay()] == [1, 2]
+
+    store = ThreadSafeVectorStore(create_empty_faiss_store())
+    assert store.replay_log(log) == 6
+    assert store.vector_store.ingest_log_seq == 2
+
+def test_torn_header_is_ignored(tmp_path):
+    log, _ = log_two_batches(tmp_path)
+    with open(log.path, "ab") as log_file:
+        log_file.write(b"\x01\x02")
+    assert len(list(log.replay())) == 2
+
+def test_replaying_twice_is_idempotent(tmp_path):
+    log, _ = log_two_batches(tmp_path)
+    store = ThreadSafeVectorStore(create_empty_faiss_store())
+    store.replay_log(log)
+    epoch = store.epoch
+    assert store.replay_log(log) == 0
+    assert store.epoch == epoch
+    assert store.vector_store.index.ntotal == 6
+
+def test_replay_applies_removals(tmp_path):
+    log, _ = log_two_batches(tmp_path)
+    writer = ThreadSafeVectorStore(create_empty_faiss_store())
+    writer.replay_log(log)
+    writer.remove_documents(["alpha"], log=log)
+
+    store = ThreadSafeVectorStore(create_empty_faiss_store())
+    assert store.replay_log(log) == 6
+    snapshot = store.vector_store
+    assert snapshot.ingest_log_seq == 3
+    assert snapshot.index.ntotal == 3
+    assert set(snapshot.documents) == {"beta"}
+    assert sorted(snapshot.index_to_docstore_id.values()) == ["beta-0", "beta-1", "beta-2"]
+
+def test_checkpoint_truncates_the_log(tmp_path):
+    log, writer = log_two_batches(tmp_path)
+    path = str(tmp_path / "store")
+    writer.checkpoint(log, path=path)
+    assert list(log.replay()) == []
+
+    snapshot, _ = open_snapshot(path)
+    assert snapshot.ingest_log_seq == 2
+    assert snapshot.index.ntotal == 6
+    assert snapshot.documents == writer.vector_store.documents
+
+    # A reopened store has nothing left to replay, and later batches continue the sequence
+    store = ThreadSafeVectorStore(snapshot)
+    assert store.replay_log(IngestLog(log.path)) == 0
+    texts, vectors, metadatas, ids = batch("gamma", 2, 2)
+    assert store.append_batch(texts, vectors, metadatas, log=log, ids=ids, content_hashes={"gamma": "gamma-hash"}) == 3
+    assert [record["seq"] for record in log.replay()] == [3]
+
+def test_records_covered_by_the_checkpoint_are_skipped(tmp_path):
+    log, writer = log_two_batches(tmp_path)
+    path = str(tmp_path / "store")
+    # Persist without truncating, as if the process died between the save and the truncate
+    writer.save_local(path)
+    snapshot, _ = open_snapshot(path)
+    store = ThreadSafeVectorStore(snapshot)
+    assert store.replay_log(log) == 0
+    assert store.vector_store.index.ntotal == 6
@@ -0,0 +1,130 @@
+import math
+from collections import Counter
+import numpy as np
+import pytest
+import vector.lexical as lexical
+from vector.lexical import BM25_B, BM25_K1, LexicalIndex, tokenize
+
+def corpus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"w{i}" for i in range(60)]
+    texts = []
+    for _ in range(n):
+        words = [vocabulary[i] for i in rng.zipf(1.4, size=rng.integers(5, 40)) % len(vocabulary)]
+        texts.append(" ".join(words))
+    return texts
+
+def brute_force_bm25(texts, query, k):
+    """BM25 scored the slow, obvious way, for comparison"""
+    token_lists = [tokenize(text) for text in texts]
+    average_length = sum(map(len, token_lists)) / len(token_lists) or 1.0
+    scores = {}
+    for term in set(tokenize(query)):
+        frequency = sum(term in tokens for tokens in token_lists)
+        if not frequency:
+            continue
+        idf = math.log(1 + (len(texts) - frequency + 0.5) / (frequency + 0.5))
+        for row, tokens in enumerate(token_lists):
+            tf = Counter(tokens)[term]
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / average_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+def assert_matches_brute_force(index, texts, queries, k=5):
+    scores, ids = index.search(queries, k)
+    for q, query in enumerate(queries):
+        expected = brute_force_bm25(texts, query, k)
+        found = [(int(row), float(score)) for row, score in zip(ids[q], scores[q]) if row != -1]
+        assert len(found) == len(expected)
+        assert [score for _, score in found] == pytest.approx([score for _, score in expected], rel=1e-4)
+        # Rows may only differ where scores tie
+        for (row, score), (expected_row, expected_score) in zip(found, expected):
+            assert row == expected_row or score == pytest.approx(expected_score, rel=1e-4)
+
+QUERIES = ["w1 w2", "w7", "w30 w31 w0", "w59 missing", "nothing here"]
+
+def test_citations_tokenize_the_way_they_are_typed():
+    assert tokenize("M.G.L. c. 66 § 10") == ["mgl", "c", "66", "section", "10"]
+    assert tokenize("MGL ch. 30A") == ["mgl", "ch", "30a"]
+    assert tokenize("The custodian's duty") == ["custodians", "duty"]
+    assert tokenize("What is a FOIA exemption?") == ["foia", "exemption"]
+
+@pytest.mark.parametrize("fraction", [0.0, 1e9])
+def test_search_matches_brute_force_on_dense_and_sparse_paths(monkeypatch, fraction):
+    monkeypatch.setattr(lexical, "SPARSE_SCORING_FRACTION", fraction)
+    texts = corpus(300)
+    assert_matches_brute_force(LexicalIndex.from_texts(texts), texts, QUERIES)
+
+def test_unmatched_queries_are_padded():
+    scores, ids = LexicalIndex.from_texts(["open meeting law"]).search(["zoning", "meeting"], 3)
+    assert ids.tolist() == [[-1, -1, -1], [0, -1, -1]]
+    assert np.isneginf(scores[0]).all()
+
+def test_empty_index_returns_padding():
+    scores, ids = LexicalIndex().search(["anything"], 2)
+    assert ids.tolist() == [[-1, -1]]
+
+def test_appending_in_batches_equals_one_build(monkeypatch):
+    monkeypatch.setattr(lexical, "LEXICAL_MAX_SEGMENTS", 3)
+    texts = corpus(200, seed=1)
+    index = LexicalIndex()
+    for start in range(0, len(texts), 25):
+        index = index.appended(texts[start:start + 25])
+        assert len(index.segments) <= 3
+    assert len(index) == len(texts)
+    assert_matches_brute_force(index, texts, QUERIES)
+
+def test_appended_leaves_the_original_unchanged():
+    index = LexicalIndex.from_texts(["alpha beta"])
+    grown = index.appended(["beta gamma"])
+    assert len(index) == 1 and len(grown) == 2
+    assert index.search(["gamma"], 1)[1].tolist() == [[-1]]
+
+def test_without_renumbers_the_remaining_rows():
+    texts = corpus(120, seed=2)
+    removed = {0, 5, 6, 77, 119}
+    index = LexicalIndex.from_texts(texts[:60]).appended(texts[60:]).without(removed)
+    remaining = [text for row, text in enumerate(texts) if row not in removed]
+    assert len(index) == len(remaining)
+    assert_matches_brute_force(index, remaining, QUERIES)
+
+def test_terms_only_in_removed_rows_disappear():
+    index = LexicalIndex.from_texts(["statute section", "unrelated words"]).without([0])
+    assert index.search(["statute"], 1)[1].tolist() == [[-1]]
+    assert index.search(["unrelated"], 1)[1].tolist() == [[0]]
+
+def test_save_and_open_round_trip(tmp_path):
+    texts = corpus(150, seed=3)
+    index = LexicalIndex.from_texts(texts[:100]).appended(texts[100:])
+    index.save(str(tmp_path))
+    reopened = LexicalIndex.open(str(tmp_path))
+    assert len(reopened.segments) == 1
+    assert isinstance(reopened.segments[0].postings, np.memmap)
+    assert_matches_brute_force(reopened, texts, QUERIES)
+
+def test_remove_after_reopening_then_save_again(tmp_path):
+    texts = corpus(80, seed=4)
+    LexicalIndex.from_texts(texts).save(str(tmp_path))
+    removed = {3, 40}
+    changed = LexicalIndex.open(str(tmp_path)).without(removed).appended(["w1 w1 extra"])
+    expected = [text for row, text in enumerate(texts) if row not in removed] + ["w1 w1 extra"]
+    (tmp_path / "next").mkdir()
+    changed.save(str(tmp_path / "next"))
+    assert_matches_brute_force(LexicalIndex.open(str(tmp_path / "next")), expected, QUERIES + ["extra"])
+
+def test_open_returns_none_without_an_index(tmp_path):
+    assert LexicalIndex.open(str(tmp_path)) is None
+
+def test_hybrid_pool_keeps_every_vector_hit(make_snapshot):
+    from vector.load import ThreadSafeVectorStore
+    rng = np.random.default_rng(5)
+    query = np.zeros(16, dtype=np.float32)
+    query[0] = 1
+    rows = [(f"Near {i}", f"about records {i}", query + rng.normal(scale=0.1, size=16)) for i in range(4)]
+    rows += [(f"Keyword {i}", f"section 10 citation {i}", rng.normal(size=16)) for i in range(4)]
+    store = ThreadSafeVectorStore(make_snapshot(rows))
+    hits = store.retrieve_by_vectors(query[None], ["section 10"], k=4)
+    titles = {doc.metadata["title"] for _, doc, _ in hits}
+    assert {f"Near {i}" for i in range(4)} <= titles
+    assert {f"Keyword {i}" for i in range(4)} <= titles
@@ -0,0 +1,117 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import document.loader as loader
+from document.loader import load_youtube_urls
+
+class FakeLimiter:
+    """Records penalties instead of pacing requests"""
+
+    def __init__(self):
+        self.penalties = []
+
+    def acquire(self, url):
+        pass
+
+    def penalize(self, url, seconds):
+        self.penalties.append((url, seconds))
+
+class FakeProvider:
+    """provider(url, title_to_chunks, url_to_title) that tracks how many calls overlap"""
+
+    def __init__(self, delay=0.02, failing=(), rate_limited=None):
+        self.delay = delay
+        self.failing = set(failing)
+        self.rate_limited = dict(rate_limited or {})
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url, title_to_chunks, url_to_title):
+        with self.lock:
+            self.calls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            refusals = self.rate_limited.get(url, 0)
+            if refusals:
+                self.rate_limited[url] = refusals - 1
+        try:
+            time.sleep(self.delay)
+            if refusals:
+                raise Exception("HTTP Error 429: Too Many Requests")
+            if url in self.failing:
+                raise ValueError(f"no transcript for {url}")
+            title = f"title of {url}"
+            title_to_chunks[title] = [url]
+            url_to_title[url] = title
+            return {title}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff sleeps recorded instead of slept, with a fixed delay per attempt"""
+    slept = []
+    monkeypatch.setattr(loader, "backoff_delay", lambda attempt: 0.5 * 2 ** attempt)
+    monkeypatch.setattr(loader, "time", SimpleNamespace(sleep=slept.append))
+    return slept
+
+def urls(n):
+    return [f"https://www.youtube.com/watch?v=video{i}" for i in range(n)]
+
+def run(tmp_path, url_list, provider, limiter=None, workers=4):
+    finished = tmp_path / "finished.txt"
+    title_to_chunks, url_to_title = {}, {}
+    new_docs, failed = load_youtube_urls(
+        url_list, title_to_chunks, url_to_title, str(finished),
+        provider=provider, workers=workers, limiter=limiter or FakeLimiter(),
+    )
+    return new_docs, failed, finished.read_text().splitlines(), title_to_chunks
+
+def test_concurrency_is_bounded_by_workers(tmp_path):
+    provider = FakeProvider(delay=0.05)
+    new_docs, failed, finished, _ = run(tmp_path, urls(12), provider, workers=3)
+    assert provider.peak == 3
+    assert failed == []
+    assert len(new_docs) == 12
+    assert sorted(finished) == sorted(urls(12))
+
+def test_failed_urls_are_reported_in_input_order(tmp_path, sleeps):
+    url_list = urls(8)
+    # Later URLs fail faster, so completion order differs from input order
+    provider = FakeProvider(delay=0, failing=[url_list[6], url_list[1], url_list[4]])
+    new_docs, failed, finished, _ = run(tmp_path, url_list, provider)
+    assert failed == [url_list[1], url_list[4], url_list[6]]
+    assert set(finished) == set(url_list) - set(failed)
+    assert len(new_docs) == 5
+
+def test_duplicate_urls_are_processed_once(tmp_path):
+    url_list = urls(3)
+    provider = FakeProvider(delay=0)
+    _, failed, finished, _ = run(tmp_path, url_list + url_list[::-1] + ["", "not a url"], provider)
+    assert sorted(provider.calls) == sorted(url_list)
+    assert sorted(finished) == sorted(url_list)
+    assert failed == []
+
+def test_rate_limited_url_is_retried_with_backoff(tmp_path, sleeps):
+    url = urls(1)[0]
+    limiter = FakeLimiter()
+    provider = FakeProvider(delay=0, rate_limited={url: 2})
+    new_docs, failed, finished, _ = run(tmp_path, [url], provider, limiter=limiter)
+    assert provider.calls == [url] * 3
+    assert sleeps == [0.5, 1.0]
+    assert limiter.penalties == [(url, 0.5), (url, 1.0)]
+    assert failed == []
+    assert finished == [url]
+    assert new_docs == {f"title of {url}"}
+
+def test_url_fails_once_attempts_run_out(tmp_path, sleeps):
+    url = urls(1)[0]
+    provider = FakeProvider(delay=0, rate_limited={url: loader.YT_MAX_ATTEMPTS})
+    _, failed, finished, _ = run(tmp_path, [url], provider)
+    assert len(provider.calls) == loader.YT_MAX_ATTEMPTS
+    assert failed == [url]
+    assert finished == []
@@ -0,0 +1,68 @@
+import numpy as np
+from vector.mmr import mmr_select
+
+def unit(*components):
+    vector = np.asarray(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_lambda_one_is_pure_relevance_order():
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=(1, 16))
+    candidates = rng.normal(size=(20, 16))
+    candidates /= np.linalg.norm(candidates, axis=1, keepdims=True)
+    relevance = candidates @ (query[0] / np.linalg.norm(query[0]))
+    selected = mmr_select(query, candidates, 20, lambda_mult=1.0)
+    assert selected.tolist() == np.argsort(-relevance).tolist()
+
+def test_relevance_is_the_best_match_to_any_query():
+    queries = np.array([unit(1, 0, 0), unit(0, 1, 0)])
+    candidates = np.array([unit(1, 1, 1), unit(0, 1, 0.1), unit(0, 0, 1)])
+    assert mmr_select(queries, candidates, 3, lambda_mult=1.0).tolist() == [1, 0, 2]
+
+def test_near_duplicates_are_passed_over():
+    query = unit(1, 1, 0)
+    candidates = np.array([
+        unit(1, 0.9, 0),
+        unit(1, 0.88, 0.03),  # near-duplicate of the first, more relevant than the third
+        unit(0, 1, 0.3),      # less relevant but says something else
+    ])
+    assert mmr_select(query, candidates, 2, lambda_mult=0.5).tolist() == [0, 2]
+    # With relevance alone the duplicate would have been taken
+    assert mmr_select(query, candidates, 2, lambda_mult=1.0).tolist() == [0, 1]
+
+def test_k_larger_than_the_pool_selects_every_candidate_once():
+    rng = np.random.default_rng(1)
+    selected = mmr_select(rng.normal(size=(2, 8)), rng.normal(size=(5, 8)), 50)
+    assert len(selected) == 5
+    assert sorted(selected.tolist()) == [0, 1, 2, 3, 4]
+
+def test_empty_pool_or_zero_size():
+    rng = np.random.default_rng(2)
+    assert len(mmr_select(rng.normal(size=(1, 8)), np.zeros((0, 8)), 5)) == 0
+    assert len(mmr_select(rng.normal(size=(1, 8)), rng.normal(size=(4, 8)), 0)) == 0
+
+def test_zero_vectors_do_not_break_selection():
+    candidates = np.array([np.zeros(3, dtype=np.float32), unit(1, 0, 0)])
+    assert mmr_select(unit(1, 0, 0)[None], candidates, 2).tolist() == [1, 0]
+
+def test_hybrid_search_keeps_a_strong_keyword_only_hit(make_snapshot):
+    from vector.load import ThreadSafeVectorStore
+    rng = np.random.default_rng(3)
+    query = np.zeros(16, dtype=np.float32)
+    query[0] = 1
+    rows = [
+        # Near-duplicate passages close to the query vector
+        (f"Guide {i}", f"records custodians respond promptly part {i}", query + rng.normal(scale=0.05, size=16))
+        for i in range(6)
+    ]
+    # The statute is far from the query in embedding space; only BM25 finds it
+    statute = np.zeros(16, dtype=np.float32)
+    statute[1] = 1
+    rows.append(("Statute", "Under M.G.L. c. 66 § 10 a response is due within ten days", statute))
+    store = ThreadSafeVectorStore(make_snapshot(rows))
+
+    hits = store.retrieve_by_vectors(query[None], ["M.G.L. c. 66 § 10"], k=4, mmr_size=3, mmr_lambda=0.6)
+    titles = [doc.metadata["title"] for _, doc, _ in hits]
+    assert "Statute" in titles
+    # Selected hits stay ranked so a top fused hit is not pushed behind weaker ones
+    assert titles.index("Statute") <= 1
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import pytest
+import llm.chain as chain
+from cache.store import TieredCache
+
+EXPANDED = ["q1", "q2", "q3", "q4", "q5"]
+
+class FakeChain:
+    """Stands in for the prompt -> model chain; counts calls and replies with a fixed string"""
+
+    def __init__(self, reply=json.dumps(EXPANDED), error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, input_data):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.reply
+
+    async def ainvoke(self, input_data):
+        return self.invoke(input_data)
+
+@pytest.fixture
+def expansion_cache(monkeypatch, tmp_path):
+    cache = TieredCache("query_expansions", ttl_seconds=3600, path=str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(chain, "query_expansion_cache", cache)
+    return cache
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(chain, "build_query_generation_chain", lambda: fake)
+    return fake
+
+HISTORY = [{"role": "user", "content": "Tell me about public records"}]
+
+def test_expansion_is_memoized_per_question_and_history(expansion_cache, model):
+    assert chain.generate_vector_queries("What is FOIA?", HISTORY) == EXPANDED
+    assert chain.generate_vector_queries("  What  is FOIA? ", HISTORY) == EXPANDED
+    assert model.calls == 1
+
+    # The same question in another conversation is expanded afresh
+    chain.generate_vector_queries("What is FOIA?", [])
+    assert model.calls == 2
+
+def test_cached_expansion_survives_a_new_process(expansion_cache, model, monkeypatch):
+    chain.generate_vector_queries("What is FOIA?", HISTORY)
+    monkeypatch.setattr(chain, "query_expansion_cache", TieredCache("query_expansions", path=expansion_cache.path))
+    assert chain.get_cached_vector_queries("What is FOIA?", HISTORY) == EXPANDED
+    assert model.calls == 1
+
+def test_fallbacks_are_not_cached(expansion_cache, monkeypatch):
+    malformed = FakeChain(reply=json.dumps(["only one"]))
+    monkeypatch.setattr(chain, "build_query_generation_chain", lambda: malformed)
+    assert chain.generate_vector_queries("q", []) == ["q"] * 5
+    assert chain.get_cached_vector_queries("q", []) is None
+
+    failing = FakeChain(error=RuntimeError("model down"))
+    monkeypatch.setattr(chain, "build_query_generation_chain", lambda: failing)
+    assert chain.generate_vector_queries("q", []) == ["q"] * 5
+    assert chain.get_cached_vector_queries("q", []) is None
+
+def test_async_expansion_shares_the_cache(expansion_cache, model):
+    assert asyncio.run(chain.agenerate_vector_queries("What is FOIA?", HISTORY)) == EXPANDED
+    assert chain.generate_vector_queries("What is FOIA?", HISTORY) == EXPANDED
+    assert model.calls == 1
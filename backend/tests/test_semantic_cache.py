@@ -0,0 +1,75 @@
+import numpy as np
+from llm.semantic_cache import SemanticAnswerCache, history_digest
+
+def vector_at(similarity, dimension=8):
+    """A unit vector whose cosine similarity to e0 is `similarity`"""
+    vector = np.zeros(dimension, dtype=np.float32)
+    vector[0], vector[1] = similarity, np.sqrt(1 - similarity ** 2)
+    return vector
+
+BASE = vector_at(1.0)
+DIGEST = history_digest([])
+
+def store(cache, vector, question="q", epoch=1, digest=DIGEST):
+    cache.store(vector, digest, epoch, question, f"answer to {question}", [{"title": question}])
+
+def test_hit_at_or_above_the_threshold():
+    cache = SemanticAnswerCache(threshold=0.95)
+    store(cache, BASE, "open meeting law")
+    hit = cache.lookup(vector_at(0.96), DIGEST, 1)
+    assert hit["answer"] == "answer to open meeting law"
+    assert hit["sources"] == [{"title": "open meeting law"}]
+    assert hit["score"] >= 0.95
+
+def test_miss_below_the_threshold():
+    cache = SemanticAnswerCache(threshold=0.95)
+    store(cache, BASE)
+    assert cache.lookup(vector_at(0.94), DIGEST, 1) is None
+    assert cache.stats()["misses"] == 1
+
+def test_vectors_are_normalized_before_comparing():
+    cache = SemanticAnswerCache(threshold=0.95)
+    store(cache, BASE * 10)
+    assert cache.lookup(vector_at(0.99) * 0.1, DIGEST, 1) is not None
+
+def test_a_new_epoch_drops_every_entry():
+    cache = SemanticAnswerCache()
+    store(cache, BASE, epoch=1)
+    assert cache.lookup(BASE, DIGEST, 2) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+    # Nothing from epoch 1 comes back if the old epoch is seen again
+    assert cache.lookup(BASE, DIGEST, 1) is None
+
+def test_history_digest_must_match():
+    cache = SemanticAnswerCache()
+    history = [{"role": "user", "content": "Tell me about FOIA"}]
+    store(cache, BASE, digest=history_digest(history))
+    assert cache.lookup(BASE, DIGEST, 1) is None
+    assert cache.lookup(BASE, history_digest(history), 1) is not None
+
+def test_matching_history_is_found_behind_a_closer_question_from_another_thread():
+    cache = SemanticAnswerCache()
+    other = history_digest([{"role": "user", "content": "something else"}])
+    store(cache, BASE, "other thread", digest=other)
+    store(cache, vector_at(0.97), "this thread")
+    assert cache.lookup(BASE, DIGEST, 1)["question"] == "this thread"
+
+def test_history_digest_ignores_whitespace_and_unicode_variants():
+    a = [{"role": "user", "content": "public  records law"}]
+    b = [{"role": "user", "content": "public records law"}]
+    assert history_digest(a) == history_digest(b)
+    assert history_digest(a) != history_digest([])
+
+def test_oldest_entry_is_evicted_once_full():
+    cache = SemanticAnswerCache(max_entries=1000)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1001, 8)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        store(cache, vector, f"q{i}")
+    assert cache.stats()["entries"] == 1000
+    assert cache.index.ntotal == 1000
+    assert cache.lookup(vectors[0], DIGEST, 1) is None or cache.lookup(vectors[0], DIGEST, 1)["question"] != "q0"
+    # Positions stay aligned with the entries after eviction
+    for i in (1, 500, 1000):
+        assert cache.lookup(vectors[i], DIGEST, 1)["question"] == f"q{i}"
@@ -0,0 +1,63 @@
+import pytest
+from llm.chain import SOURCES_USED_MARKER, SourcesUsedStreamParser
+
+def stream(tokens):
+    """Feed tokens through a parser; returns (every piece emitted, the parser)"""
+    parser = SourcesUsedStreamParser()
+    emitted = [parser.feed(token) for token in tokens]
+    emitted.append(parser.finish())
+    return emitted, parser
+
+def emitted_text(emitted):
+    return "".join(emitted)
+
+@pytest.mark.parametrize("split_at", range(1, len(SOURCES_USED_MARKER)))
+def test_marker_split_across_tokens(split_at):
+    emitted, parser = stream([
+        "The law requires a response ", "within ten days.\n\n",
+        SOURCES_USED_MARKER[:split_at], SOURCES_USED_MARKER[split_at:], " 1, 3",
+    ])
+    assert SOURCES_USED_MARKER[:2] not in emitted_text(emitted)
+    assert emitted_text(emitted) == "The law requires a response within ten days."
+    assert parser.answer == "The law requires a response within ten days."
+    assert parser.sources_used == "1, 3"
+
+def test_marker_split_one_character_at_a_time():
+    text = f"Yes. {SOURCES_USED_MARKER} 2"
+    emitted, parser = stream(list(text))
+    assert emitted_text(emitted) == "Yes."
+    assert parser.sources_used == "2"
+
+def test_partial_prefix_is_held_back_until_ruled_out():
+    parser = SourcesUsedStreamParser()
+    assert parser.feed("See SOURCES") == "See"
+    # "SOURCES_" can still become the marker, so nothing more is released yet
+    assert parser.feed("_") == ""
+    # Once it can no longer be the marker the held text comes out unchanged
+    assert parser.feed("X are listed") == " SOURCES_X are listed"
+    assert parser.finish() == ""
+    assert parser.answer == "See SOURCES_X are listed"
+    assert parser.sources_used == "none"
+
+def test_trailing_whitespace_before_marker_is_not_emitted():
+    emitted, parser = stream(["Answer text.", "  \n", "\n", SOURCES_USED_MARKER, " 4\n"])
+    assert emitted_text(emitted) == "Answer text."
+    assert parser.sources_used == "4"
+
+def test_whitespace_inside_the_answer_is_kept():
+    emitted, parser = stream(["First line.", "\n\n", "Second line.", f"\n{SOURCES_USED_MARKER} none"])
+    assert emitted_text(emitted) == "First line.\n\nSecond line."
+    assert parser.sources_used == "none"
+
+def test_stream_without_marker_is_flushed_on_finish():
+    emitted, parser = stream(["No sources here", " at all.  ", "SOURCE"])
+    assert emitted_text(emitted) == "No sources here at all.  SOURCE"
+    assert emitted[-1] == "  SOURCE"
+    assert parser.sources_used_text is None
+    assert parser.sources_used == "none"
+    assert parser.answer == "No sources here at all.  SOURCE"
+
+def test_tokens_after_the_marker_are_never_emitted():
+    emitted, parser = stream(["Done. ", SOURCES_USED_MARKER, " 1", ",", " 2"])
+    assert emitted[2:] == ["", "", "", ""]
+    assert parser.sources_used == "1, 2"
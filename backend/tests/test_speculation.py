@@ -0,0 +1,125 @@
+import asyncio
+import gc
+import time
+import pytest
+from langchain_core.documents import Document
+import llm.chain as chain
+from llm.chain import PipelineContext
+
+DEADLINE = 0.2
+SLOW = 0.6
+EXPANDED = ["q1", "q2", "q3", "q4", "q5"]
+
+def hit(index_id, title):
+    return (index_id, Document(page_content=f"{title} text", metadata={"title": title}), 0.9)
+
+SPECULATIVE_HITS = [hit(1, "speculative")]
+MERGED_CHUNKS = [Document(page_content="merged text", metadata={"title": "merged"})]
+
+class Stubs:
+    """Replaces the model and the store around retrieve_with_speculation and records what was searched"""
+
+    def __init__(self, monkeypatch, score, delay=0.0, error=None):
+        self.searched = []
+        self.delay = delay
+        self.error = error
+        monkeypatch.setattr(chain, "SPECULATIVE_RETRIEVAL", True)
+        monkeypatch.setattr(chain, "QUERY_EXPANSION_DEADLINE_SECONDS", DEADLINE)
+        monkeypatch.setattr(chain, "get_cached_vector_queries", lambda query, chat_history: None)
+        monkeypatch.setattr(chain, "generate_vector_queries", self.expand)
+        monkeypatch.setattr(chain, "agenerate_vector_queries", self.aexpand)
+        monkeypatch.setattr(chain, "speculative_retrieve", lambda query, k: (SPECULATIVE_HITS, score))
+        monkeypatch.setattr(chain, "retrieve_chunks_from_queries", self.retrieve)
+        monkeypatch.setattr(chain, "aretrieve_chunks_from_queries", self.aretrieve)
+
+        async def aspeculative_retrieve(query, k):
+            return SPECULATIVE_HITS, score
+        monkeypatch.setattr(chain, "aspeculative_retrieve", aspeculative_retrieve)
+
+    def expand(self, query, chat_history):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return EXPANDED
+
+    async def aexpand(self, query, chat_history):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return EXPANDED
+
+    def retrieve(self, queries, k_per_query=3, ctx=None):
+        self.searched.append(list(queries))
+        ctx.chunks = MERGED_CHUNKS
+        return MERGED_CHUNKS
+
+    async def aretrieve(self, queries, k_per_query=3, ctx=None):
+        return self.retrieve(queries, k_per_query, ctx)
+
+def run_sync(ctx):
+    return chain.retrieve_with_speculation(ctx)
+
+def run_async(ctx):
+    return asyncio.run(chain.aretrieve_with_speculation(ctx))
+
+both_paths = pytest.mark.parametrize("run", [run_sync, run_async], ids=["sync", "async"])
+
+def test_expansion_wait(monkeypatch):
+    monkeypatch.setattr(chain, "QUERY_EXPANSION_DEADLINE_SECONDS", 1.5)
+    started = time.perf_counter()
+    assert chain.expansion_wait(started, chain.SPECULATIVE_MIN_SCORE - 0.01) is None
+    assert chain.expansion_wait(started, chain.SPECULATIVE_MIN_SCORE) == pytest.approx(1.5, abs=0.05)
+    assert chain.expansion_wait(started - 2.0, 0.99) == 0.0
+
+@both_paths
+def test_weak_speculative_hits_wait_for_expansion(monkeypatch, run):
+    stubs = Stubs(monkeypatch, score=chain.SPECULATIVE_MIN_SCORE - 0.1, delay=SLOW)
+    ctx = PipelineContext("What is FOIA?", [])
+    started = time.perf_counter()
+    assert run(ctx) == MERGED_CHUNKS
+    assert time.perf_counter() - started >= SLOW
+    assert ctx.timings["path"] == "merged"
+    assert stubs.searched == [["What is FOIA?"] + EXPANDED]
+
+@both_paths
+def test_strong_speculative_hits_cut_off_slow_expansion(monkeypatch, run):
+    stubs = Stubs(monkeypatch, score=0.9, delay=SLOW)
+    ctx = PipelineContext("What is FOIA?", [])
+    started = time.perf_counter()
+    chunks = run(ctx)
+    assert time.perf_counter() - started < SLOW
+    assert chunks == [doc for _, doc, _ in SPECULATIVE_HITS]
+    assert ctx.queries == ["What is FOIA?"]
+    assert ctx.timings["path"] == "speculative"
+    assert stubs.searched == []
+
+@both_paths
+def test_fast_expansion_is_merged(monkeypatch, run):
+    stubs = Stubs(monkeypatch, score=0.9)
+    ctx = PipelineContext("What is FOIA?", [])
+    assert run(ctx) == MERGED_CHUNKS
+    assert ctx.timings["path"] == "merged"
+    assert stubs.searched == [["What is FOIA?"] + EXPANDED]
+
+@both_paths
+def test_failed_expansion_falls_back_to_speculative_hits(monkeypatch, run):
+    stubs = Stubs(monkeypatch, score=0.1, error=RuntimeError("model down"))
+    ctx = PipelineContext("What is FOIA?", [])
+    assert run(ctx) == [doc for _, doc, _ in SPECULATIVE_HITS]
+    assert ctx.timings["path"] == "speculative"
+    assert stubs.searched == []
+
+def test_abandoned_async_expansion_failure_is_retrieved(monkeypatch):
+    Stubs(monkeypatch, score=0.9, delay=SLOW, error=RuntimeError("model down"))
+    unhandled = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        chunks = await chain.aretrieve_with_speculation(PipelineContext("What is FOIA?", []))
+        # Let the abandoned task fail and be collected while the loop still reports to the handler
+        await asyncio.sleep(SLOW + 0.1)
+        gc.collect()
+        return chunks
+
+    assert asyncio.run(main()) == [doc for _, doc, _ in SPECULATIVE_HITS]
+    assert unhandled == []
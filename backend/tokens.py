@@ -0,0 +1,27 @@
+import logging
+import threading
+import tiktoken
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+def get_encoding(model="gpt-3.5-turbo"):
+    """tiktoken encoding for a model, or None if it cannot be loaded (e.g. offline)"""
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding for {model}, estimating token counts: {e}")
+                _encodings[model] = None
+        return _encodings[model]
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Number of tokens `text` takes up for `model` (about 4 characters per token if tiktoken is unavailable)"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOCSTORE_DATA_FILE = "docstore.bin"
+DOCSTORE_OFFSETS_FILE = "docstore.offsets.npy"
+DOCSTORE_IDS_FILE = "docstore.ids.npy"
+DOCSTORE_INDEX_IDS_FILE = "docstore.index_ids.npy"
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    Docstore backed by one contiguous file of JSON records plus an offset table.
+
+    A persisted store is opened by memory-mapping docstore.bin and reading the
+    offset and id tables, so opening costs the same however much text there is,
+    and every process serving the same store shares one copy in the page cache.
+    A record is only decoded when search() asks for it.
+
+    Documents added or deleted since the last save live in a small in-memory
+    overlay. copy() shares the mapped file and copies the overlay, which keeps
+    the docstore cheap to copy for copy-on-write snapshots.
+    """
+
+    def __init__(self, documents=None):
+        # (data, offsets, {docstore id: row}), in-memory additions, deleted ids
+        self._state = (None, dict(documents or {}), frozenset())
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open the docstore persisted in a store directory.
+
+        Returns:
+            tuple: (CompactDocstore, index_to_docstore_id mapping)
+        """
+        offsets = np.load(os.path.join(path, DOCSTORE_OFFSETS_FILE), mmap_mode="r")
+        ids = np.load(os.path.join(path, DOCSTORE_IDS_FILE)).tolist()
+        index_ids = np.load(os.path.join(path, DOCSTORE_INDEX_IDS_FILE)).tolist()
+        data_path = os.path.join(path, DOCSTORE_DATA_FILE)
+        # np.memmap refuses empty files
+        data = np.memmap(data_path, dtype=np.uint8, mode="r") if os.path.getsize(data_path) else np.zeros(0, dtype=np.uint8)
+
+        docstore = cls()
+        docstore._state = ((data, offsets, {doc_id: row for row, doc_id in enumerate(ids)}), {}, frozenset())
+        return docstore, dict(zip(index_ids, ids))
+
+    def copy(self):
+        base, overlay, deleted = self._state
+        copy = CompactDocstore()
+        copy._state = (base, dict(overlay), deleted)
+        return copy
+
+    def _read(self, base, row):
+        data, offsets, _ = base
+        record = json.loads(bytes(data[offsets[row]:offsets[row + 1]]).decode("utf-8"))
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, search):
+        base, overlay, deleted = self._state
+        if search in overlay:
+            return overlay[search]
+        if base is not None and search not in deleted:
+            row = base[2].get(search)
+            if row is not None:
+                return self._read(base, row)
+        return f"ID {search} not found."
+
+    def __contains__(self, doc_id):
+        base, overlay, deleted = self._state
+        return doc_id in overlay or (base is not None and doc_id in base[2] and doc_id not in deleted)
+
+    def __len__(self):
+        return sum(1 for _ in self.ids())
+
+    def ids(self):
+        base, overlay, deleted = self._state
+        if base is not None:
+            for doc_id in base[2]:
+                if doc_id not in deleted and doc_id not in overlay:
+                    yield doc_id
+        yield from overlay
+
+    def documents(self):
+        """Yield every document; persisted ones are decoded on the fly"""
+        for doc_id in self.ids():
+            yield self.search(doc_id)
+
+    def add(self, texts):
+        base, overlay, deleted = self._state
+        overlapping = [doc_id for doc_id in texts if doc_id in self]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        overlay.update(texts)
+        self._state = (base, overlay, deleted - set(texts))
+
+    def delete(self, ids):
+        base, overlay, deleted = self._state
+        missing = [doc_id for doc_id in ids if doc_id not in self]
+        if missing:
+            raise ValueError(f"Tried to delete ids that do not exist: {missing}")
+        for doc_id in ids:
+            overlay.pop(doc_id, None)
+        self._state = (base, overlay, deleted | set(ids))
+
+    def write(self, path, index_to_docstore_id):
+        """
+        Persist the documents referenced by index_to_docstore_id, in index id order.
+
+        Args:
+            path (str): Store directory
+            index_to_docstore_id (dict): FAISS id -> docstore id mapping of the snapshot
+        """
+        index_ids = sorted(index_to_docstore_id)
+        ids = [index_to_docstore_id[index_id] for index_id in index_ids]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+
+        with open(os.path.join(path, DOCSTORE_DATA_FILE), "wb") as data_file:
+            for row, doc_id in enumerate(ids):
+                doc = self.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Index id {index_ids[row]} points at missing document {doc_id}")
+                record = json.dumps(
+                    {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                    ensure_ascii=False,
+                    default=str,
+                ).encode("utf-8")
+                data_file.write(record)
+                offsets[row + 1] = offsets[row] + len(record)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+        np.save(os.path.join(path, DOCSTORE_OFFSETS_FILE), offsets)
+        np.save(os.path.join(path, DOCSTORE_IDS_FILE), np.array(ids, dtype=str))
+        np.save(os.path.join(path, DOCSTORE_INDEX_IDS_FILE), np.array(index_ids, dtype=np.int64))
+
+    def rebase(self, path):
+        """Swap the in-memory overlay for the file this docstore was just written to"""
+        reopened, _ = CompactDocstore.open(path)
+        if len(reopened._state[0][2]) == len(self):
+            self._state = reopened._state
@@ -0,0 +1,106 @@
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+
+class FullPrecisionVectors:
+    """
+    Float32 copy of every vector in a quantized store, indexed by FAISS id.
+
+    Persisted vectors are memory-mapped from the store's vectors.npy, so they
+    cost page cache rather than resident memory and only the rows touched by
+    re-ranking are ever read. Vectors added since the last save are held in
+    memory until the next checkpoint rebases onto the new file.
+
+    Appending returns a new object sharing the existing parts, which keeps it
+    safe to use inside copy-on-write snapshots.
+    """
+
+    def __init__(self, dimension, parts=()):
+        self.dimension = dimension
+        self.parts = tuple(parts)
+
+    @classmethod
+    def open(cls, path, dimension):
+        vectors = np.load(path, mmap_mode="r")
+        if vectors.ndim != 2 or vectors.shape[1] != dimension:
+            raise ValueError(f"{path} holds vectors of shape {vectors.shape}, expected (n, {dimension})")
+        return cls(dimension, (vectors,))
+
+    @classmethod
+    def from_array(cls, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        return cls(vectors.shape[1], (vectors,) if len(vectors) else ())
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def appended(self, vectors):
+        """Return a copy with `vectors` added after the existing rows"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        return FullPrecisionVectors(self.dimension, self.parts + (vectors,))
+
+    def without(self, positions):
+        """Return a copy with the rows at `positions` removed and the rest renumbered"""
+        return FullPrecisionVectors.from_array(np.delete(self.all(), np.asarray(list(positions), dtype=np.int64), axis=0))
+
+    def all(self):
+        """Every row as one in-memory array"""
+        if not self.parts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(self.parts), dtype=np.float32)
+
+    def rows(self, ids):
+        """Gather the rows for an array of ids (any shape); -1 gives a zero row"""
+        ids = np.asarray(ids, dtype=np.int64)
+        flat = ids.reshape(-1)
+        out = np.zeros((len(flat), self.dimension), dtype=np.float32)
+        start = 0
+        for part in self.parts:
+            end = start + len(part)
+            mask = (flat >= start) & (flat < end)
+            if mask.any():
+                out[mask] = part[flat[mask] - start]
+            start = end
+        return out.reshape(ids.shape + (self.dimension,))
+
+    def save(self, path):
+        """Write every row to a .npy file that open() can memory-map"""
+        output = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(self), self.dimension))
+        start = 0
+        for part in self.parts:
+            output[start:start + len(part)] = part
+            start += len(part)
+        output.flush()
+        del output
+
+    def rebase(self, path):
+        """Swap the in-memory parts for a memory map of the file they were just saved to"""
+        saved = np.load(path, mmap_mode="r")
+        if len(saved) == len(self):
+            self.parts = (saved,)
+
+def exact_rerank(queries, candidate_ids, full_vectors, k):
+    """
+    Re-score candidates from a quantized search by exact inner product.
+
+    Args:
+        queries (np.ndarray): Query vectors, one row per query
+        candidate_ids (np.ndarray): FAISS ids from the compressed search (-1 for none)
+        full_vectors (FullPrecisionVectors): Full-precision vectors of the store
+        k (int): Number of results to keep per query
+
+    Returns:
+        tuple: (scores, ids) arrays shaped like index.search output
+    """
+    candidates = full_vectors.rows(candidate_ids)
+    scores = np.einsum("qcd,qd->qc", candidates, queries)
+    scores[candidate_ids == -1] = -np.inf
+    order = np.argsort(-scores, axis=1)[:, :k]
+    ids = np.take_along_axis(candidate_ids, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    ids[np.isinf(scores)] = -1
+    return scores, ids
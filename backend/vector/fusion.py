@@ -0,0 +1,47 @@
+import numpy as np
+
+RRF_K = 60
+
+def reciprocal_rank_fusion_ids(ranked_ids, k=RRF_K, limit=None):
+    """
+    Reciprocal rank fusion over integer ids, accumulated with numpy.
+    
+    Every row is a separate ranking, so an id found by several queries gains
+    from each of them; an id repeated within one row only counts at its best rank.
+    
+    Args:
+        ranked_ids (list): 2-D id arrays shaped like index.search output, one
+            ranked row per query, padded with -1
+        k (int): The RRF constant; each appearance adds 1 / (rank + k)
+        limit (int): Keep only the best `limit` ids
+    
+    Returns:
+        tuple: (ids, scores) arrays, best first; ties go to the smaller id
+    """
+    ids, ranks, row_numbers = [], [], []
+    row_count = 0
+    for rows in ranked_ids:
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.int64))
+        if rows.size == 0:
+            continue
+        ids.append(rows.ravel())
+        ranks.append(np.broadcast_to(np.arange(rows.shape[1]), rows.shape).ravel())
+        row_numbers.append(np.repeat(np.arange(row_count, row_count + rows.shape[0]), rows.shape[1]))
+        row_count += rows.shape[0]
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    ids, ranks, row_numbers = np.concatenate(ids), np.concatenate(ranks), np.concatenate(row_numbers)
+    found = ids >= 0
+    ids, ranks, row_numbers = ids[found], ranks[found], row_numbers[found]
+    
+    # Sorted by (row, id, rank), so the first entry of each (row, id) run is its best rank
+    order = np.lexsort((ranks, ids, row_numbers))
+    ids, ranks, row_numbers = ids[order], ranks[order], row_numbers[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = (ids[1:] != ids[:-1]) | (row_numbers[1:] != row_numbers[:-1])
+    ids, ranks = ids[first], ranks[first]
+    
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=1.0 / (ranks + k), minlength=len(unique_ids))
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return unique_ids[order], scores[order]
@@ -0,0 +1,258 @@
+import logging
+import math
+import os
+import faiss
+import numpy as np
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+# flat | hnsw | ivf_flat | ivf_pq
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "128"))
+
+# 0 picks nlist from the corpus size (4 * sqrt(n), bounded by the training set)
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+
+# IVF indexes stay flat until this many vectors exist, and are retrained
+# whenever the corpus grows by FAISS_RETRAIN_GROWTH times the training set
+FAISS_TRAIN_MIN_VECTORS = int(os.getenv("FAISS_TRAIN_MIN_VECTORS", "2000"))
+FAISS_RETRAIN_GROWTH = float(os.getenv("FAISS_RETRAIN_GROWTH", "4"))
+
+# How vectors are stored in the index: none (float32) | fp16 | sq8 | binary (sign bits,
+# Hamming scan). Anything but none keeps a full-precision copy on disk for re-ranking,
+# and each search re-ranks FAISS_RERANK_FACTOR * k candidates exactly
+FAISS_QUANTIZATION = os.getenv("FAISS_QUANTIZATION", "none")
+FAISS_RERANK_FACTOR = int(os.getenv("FAISS_RERANK_FACTOR", "8"))
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+QUANTIZATION_TYPES = ("none", "fp16", "sq8", "binary")
+
+_SQ_ENCODINGS = {"none": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+
+def needs_training(index_type, quantization="none"):
+    return index_type in ("ivf_flat", "ivf_pq") or quantization == "sq8"
+
+def min_training_vectors(index_type, quantization="none"):
+    """Smallest corpus an index type can be trained on"""
+    if index_type == "ivf_pq":
+        # Each PQ sub-quantizer learns 2^nbits centroids; k-means wants ~39 points per centroid
+        return max(FAISS_TRAIN_MIN_VECTORS, 39 * 2 ** FAISS_PQ_NBITS)
+    if index_type == "ivf_flat" or quantization == "sq8":
+        # SQ8 learns a per-dimension range, which a handful of vectors would clip
+        return FAISS_TRAIN_MIN_VECTORS
+    return 0
+
+def choose_nlist(n_vectors):
+    """Number of IVF lists: configured, or 4 * sqrt(n), keeping >= 39 training points per list"""
+    nlist = FAISS_IVF_NLIST or int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // 39))
+
+def check_quantization(index_type, quantization):
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(f"Unknown FAISS quantization: {quantization} (expected one of {', '.join(QUANTIZATION_TYPES)})")
+    if quantization == "binary" and index_type != "flat":
+        raise ValueError("Binary codes are scanned exhaustively by Hamming distance; use FAISS_INDEX_TYPE=flat")
+    if quantization != "none" and index_type == "ivf_pq":
+        raise ValueError("ivf_pq already compresses vectors; use FAISS_QUANTIZATION=none with it")
+
+def index_factory_string(index_type, n_vectors, quantization="none"):
+    """faiss.index_factory description for an index type, corpus size and vector encoding"""
+    check_quantization(index_type, quantization)
+    if quantization == "binary":
+        return "LSH"
+    encoding = _SQ_ENCODINGS[quantization]
+    if index_type == "flat":
+        return encoding
+    if index_type == "hnsw":
+        return f"HNSW{FAISS_HNSW_M},{encoding}"
+    if index_type == "ivf_flat":
+        return f"IVF{choose_nlist(n_vectors)},{encoding}"
+    if index_type == "ivf_pq":
+        return f"IVF{choose_nlist(n_vectors)},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}"
+    raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+def detect_index_type(index):
+    """Work out which of INDEX_TYPES an existing index is"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+def detect_quantization(index):
+    """Work out which of QUANTIZATION_TYPES an existing index stores its vectors as"""
+    if isinstance(index, faiss.IndexLSH):
+        return "binary"
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        index = faiss.downcast_index(ivf)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "none"
+
+def apply_search_params(index, nprobe=FAISS_IVF_NPROBE, ef_search=FAISS_HNSW_EF_SEARCH):
+    """
+    Get an index ready to be published: set the search-time accuracy/latency
+    knobs it has, and give IVF indexes the id -> list map reconstruct needs.
+
+    The map is kept up to date by add() and reset() and saved with the index,
+    so building it here means readers of a published snapshot never modify it.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+def build_index(index_type, dimension, vectors=None, quantization="none"):
+    """
+    Build an inner-product index of the given type, trained on `vectors` when it needs it.
+
+    Args:
+        index_type (str): One of INDEX_TYPES
+        dimension (int): Vector dimension
+        vectors (np.ndarray): Training vectors (also the size hint for nlist)
+        quantization (str): One of QUANTIZATION_TYPES
+
+    Returns:
+        faiss.Index: An empty, trained index with search parameters applied
+    """
+    n_vectors = 0 if vectors is None else len(vectors)
+    description = index_factory_string(index_type, n_vectors, quantization)
+    if quantization == "binary":
+        # One sign bit per dimension, no rotation or learned thresholds; LSH only
+        # supports L2 in the factory, and its Hamming distances are re-ranked anyway
+        index = faiss.IndexLSH(dimension, dimension, False, False)
+    else:
+        index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+
+    if not index.is_trained:
+        minimum = min_training_vectors(index_type, quantization)
+        if n_vectors < minimum:
+            raise ValueError(f"{description} needs at least {minimum} training vectors, got {n_vectors}")
+        logger.info(f"Training {description} index on {n_vectors} vectors")
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    return apply_search_params(index)
+
+def read_index(path, mmap=True):
+    """
+    Open a persisted index with IO_FLAG_MMAP.
+
+    Whatever the installed faiss can map (IVF inverted lists in 1.9) is served
+    from the page cache, shared by every process that opens the same file,
+    instead of being read into private memory.
+    """
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP if mmap else 0)
+
+def is_memory_mapped(index):
+    """True when an index's data lives in a read-only mapping and cannot be cloned or added to"""
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and isinstance(faiss.downcast_InvertedLists(ivf.invlists), faiss.OnDiskInvertedLists)
+
+def reconstruct_all(index):
+    """Return every stored vector in id order (exact for float32 indexes, approximate for PQ/SQ)"""
+    if isinstance(index, faiss.IndexLSH):
+        raise ValueError("Binary codes cannot be decoded; read the full-precision vectors instead")
+    require_direct_map(index)
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+def reconstruct_rows(index, ids):
+    """Return the stored vectors for the given ids, in order (approximate for PQ/SQ)"""
+    if isinstance(index, faiss.IndexLSH):
+        raise ValueError("Binary codes cannot be decoded; read the full-precision vectors instead")
+    require_direct_map(index)
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_batch(ids)
+
+def require_direct_map(index):
+    """Reconstructing from IVF lists reads the direct map apply_search_params built; never build it on a shared index"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        raise ValueError("IVF index has no direct map; pass it through apply_search_params before reading vectors back")
+
+def remove_positions(index, positions, vectors=None):
+    """
+    Remove rows from an index; the remaining rows keep their order and are renumbered 0..n-1.
+
+    Flat-code indexes (flat, SQ, LSH) compact themselves in remove_ids. IVF lists
+    keep the ids they were added with and HNSW cannot remove at all, so those
+    are emptied with reset(), which keeps their training, and refilled with the
+    remaining vectors. Pass the full-precision `vectors` when they are available.
+
+    Returns:
+        faiss.Index: The index without those rows (the same object when compacted in place)
+    """
+    positions = np.asarray(sorted(set(positions)), dtype=np.int64)
+    if not len(positions):
+        return index
+    if isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes):
+        index.remove_ids(faiss.IDSelectorBatch(positions))
+        return index
+    if vectors is None:
+        vectors = reconstruct_all(index)
+    keep = np.ones(index.ntotal, dtype=bool)
+    keep[positions] = False
+    rebuilt = faiss.clone_index(index)
+    rebuilt.reset()
+    if keep.any():
+        rebuilt.add(np.ascontiguousarray(vectors[keep], dtype=np.float32))
+    return rebuilt
+
+def migrate_index(index, index_type, vectors=None, quantization="none"):
+    """
+    Rebuild an index as `index_type`, keeping every vector at the same id.
+
+    Ids are positions, so the store's index_to_docstore_id mapping stays valid.
+    Pass the full-precision `vectors` when they are available; otherwise they
+    are decoded from the index itself.
+    """
+    if vectors is None:
+        if detect_index_type(index) == "ivf_pq" or detect_quantization(index) != "none":
+            logger.warning("Migrating from compressed codes reconstructs approximate vectors; recall may drop")
+        vectors = reconstruct_all(index)
+    migrated = build_index(index_type, index.d, vectors, quantization)
+    if len(vectors):
+        migrated.add(vectors)
+    logger.info(f"Migrated {len(vectors)} vectors to {index_factory_string(index_type, len(vectors), quantization)}")
+    return migrated
+
+def upgrade_target(index, index_type, trained_on, quantization="none"):
+    """
+    Decide whether an index should be rebuilt as the configured type and encoding.
+
+    Returns:
+        bool: True when the type or encoding differs and enough vectors exist to
+        build it, or when a trained index has outgrown the set it was trained on
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+    check_quantization(index_type, quantization)
+    if detect_index_type(index) != index_type or detect_quantization(index) != quantization:
+        return index.ntotal >= min_training_vectors(index_type, quantization)
+    if needs_training(index_type, quantization) and trained_on:
+        return index.ntotal >= FAISS_RETRAIN_GROWTH * trained_on
+    return False
@@ -0,0 +1,22 @@
+"""
+Load and embed new documents into the FAISS store as a process of its own.
+
+This is the store's single writer: it persists migrations, appends to the
+ingestion log and checkpoints. Serving workers (which run without
+VECTOR_INGESTION=1) open the store read-only and reload it whenever this
+process checkpoints. Run it from backend/ alongside any number of workers:
+
+    python -m vector.ingest
+"""
+import sys
+from vector.load import add_documents_sequentially, claim_writer_role, get_loading_status, get_vector_store
+
+def main():
+    claim_writer_role()
+    get_vector_store()
+    add_documents_sequentially()
+    if get_loading_status()["status"] == "error":
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import logging
+import os
+import pickle
+import struct
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<Q")
+
+class IngestLog:
+    """
+    Append-only write-ahead log of embedded ingestion batches.
+
+    Each record is a length-prefixed pickle that is flushed and fsynced before
+    the batch becomes visible in the vector store. After a crash, records newer
+    than the last checkpoint are replayed into the store without calling the
+    embeddings API again. A torn final record (crash mid-write) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, record):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.path, "ab") as log_file:
+            log_file.write(_HEADER.pack(len(payload)))
+            log_file.write(payload)
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    def replay(self):
+        """Yield every complete record in the order it was written"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as log_file:
+            while True:
+                header = log_file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                (size,) = _HEADER.unpack(header)
+                payload = log_file.read(size)
+                if len(payload) < size:
+                    logger.warning(f"Ignoring torn record at the end of {self.path}")
+                    return
+                try:
+                    yield pickle.loads(payload)
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable record in {self.path}: {e}")
+                    return
+
+    def truncate(self):
+        """Drop all records; called once they are covered by a checkpoint"""
+        with open(self.path, "wb") as log_file:
+            log_file.flush()
+            os.fsync(log_file.fileno())
@@ -0,0 +1,275 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from load_env import load_env
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_env()
+
+LEXICAL_TERMS_FILE = "lexical.terms.json"
+LEXICAL_OFFSETS_FILE = "lexical.offsets.npy"
+LEXICAL_POSTINGS_FILE = "lexical.postings.npy"
+LEXICAL_FREQUENCIES_FILE = "lexical.tfs.npy"
+LEXICAL_LENGTHS_FILE = "lexical.lengths.npy"
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Segments appended since the last save are merged once there are more than this many
+LEXICAL_MAX_SEGMENTS = int(os.getenv("LEXICAL_MAX_SEGMENTS", "8"))
+# Queries reading fewer postings than this fraction of all rows are scored per matched row
+# (a sort of the postings); broader ones in one pass over a dense row array, which is faster then
+SPARSE_SCORING_FRACTION = 0.25
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i if in into is it its of on or
+so that the their there these they this to was were what when where which who why
+will with you your we our can do does did not no
+""".split())
+
+TOKEN_PATTERN = re.compile(r"§|[a-z0-9]+(?:[.'’][a-z0-9]+)*")
+
+def tokenize(text):
+    """
+    Lowercased search terms of a text, kept in the forms legal citations are typed in.
+
+    Dotted abbreviations collapse to one term ("M.G.L." and "MGL" both give
+    "mgl"), "§" becomes "section", and numbers and single letters ("c. 66")
+    are kept; only a short list of English stopwords is dropped.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token == "§":
+            terms.append("section")
+            continue
+        token = token.replace(".", "").replace("'", "").replace("’", "")
+        if token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+class Segment:
+    """
+    Immutable posting lists for a range of rows.
+
+    Term i's postings are postings[offsets[i]:offsets[i + 1]] (row ids,
+    ascending) with their term frequencies at the same positions in frequencies.
+    """
+
+    def __init__(self, terms, offsets, postings, frequencies):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+
+    @classmethod
+    def build(cls, token_lists, first_row):
+        lists = {}
+        for row, tokens in enumerate(token_lists, first_row):
+            for term, count in Counter(tokens).items():
+                rows, counts = lists.setdefault(term, ([], []))
+                rows.append(row)
+                counts.append(count)
+        terms = list(lists)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(lists[term][0]) for term in terms], out=offsets[1:])
+        postings = np.fromiter((row for term in terms for row in lists[term][0]), dtype=np.int32, count=offsets[-1])
+        frequencies = np.fromiter(
+            (min(count, 65535) for term in terms for count in lists[term][1]), dtype=np.uint16, count=offsets[-1]
+        )
+        return cls({term: i for i, term in enumerate(terms)}, offsets, postings, frequencies)
+
+    def document_frequency(self, term):
+        i = self.terms.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def postings_for(self, term):
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+def merge_segments(segments, keep=None):
+    """
+    Merge segments into one, optionally dropping rows and renumbering the rest.
+
+    Args:
+        keep (np.ndarray): Boolean mask over row ids; rows that are False are removed
+
+    Returns:
+        Segment: Postings of every term, each list sorted by row id
+    """
+    vocabulary = {}
+    term_ids, rows, counts = [], [], []
+    for segment in segments:
+        local_to_global = np.fromiter(
+            (vocabulary.setdefault(term, len(vocabulary)) for term in segment.terms), dtype=np.int64, count=len(segment.terms)
+        )
+        term_ids.append(np.repeat(local_to_global, np.diff(segment.offsets)))
+        rows.append(np.asarray(segment.postings))
+        counts.append(np.asarray(segment.frequencies))
+    term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.uint16)
+
+    if keep is not None:
+        kept = keep[rows]
+        renumbered = np.cumsum(keep) - 1
+        term_ids, rows, counts = term_ids[kept], renumbered[rows[kept]], counts[kept]
+
+    order = np.lexsort((rows, term_ids))
+    term_ids, rows, counts = term_ids[order], rows[order], counts[order]
+
+    # Terms whose every posting was dropped disappear from the vocabulary
+    terms = list(vocabulary)
+    present = np.bincount(term_ids, minlength=len(terms)) > 0
+    remaining = [term for term, is_present in zip(terms, present) if is_present]
+    renumbered_terms = np.cumsum(present) - 1
+    term_ids = renumbered_terms[term_ids]
+    offsets = np.zeros(len(remaining) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(remaining)), out=offsets[1:])
+    return Segment(
+        {term: i for i, term in enumerate(remaining)},
+        offsets,
+        np.ascontiguousarray(rows, dtype=np.int32),
+        np.ascontiguousarray(counts, dtype=np.uint16),
+    )
+
+class LexicalIndex:
+    """
+    BM25 over an in-process inverted index whose rows line up with FAISS ids.
+
+    Postings are compact numpy arrays (int32 row ids, uint16 term frequencies)
+    held in immutable segments: the saved one, memory-mapped from the store
+    directory, plus one per batch appended since. appended() and without()
+    return new objects, so like FullPrecisionVectors it can be shared between
+    copy-on-write snapshots.
+    """
+
+    def __init__(self, segments=(), lengths=None):
+        self.segments = tuple(segments)
+        self.lengths = np.zeros(0, dtype=np.int32) if lengths is None else lengths
+        self.total_length = int(np.sum(self.lengths, dtype=np.int64))
+        self._norms = None
+
+    @classmethod
+    def from_texts(cls, texts):
+        return cls().appended(texts)
+
+    @classmethod
+    def open(cls, path):
+        """Open a saved index, memory-mapping its arrays; None if `path` has no lexical index"""
+        if not os.path.exists(os.path.join(path, LEXICAL_TERMS_FILE)):
+            return None
+        with open(os.path.join(path, LEXICAL_TERMS_FILE)) as terms_file:
+            terms = json.load(terms_file)
+        segment = Segment(
+            {term: i for i, term in enumerate(terms)},
+            np.load(os.path.join(path, LEXICAL_OFFSETS_FILE)),
+            np.load(os.path.join(path, LEXICAL_POSTINGS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, LEXICAL_FREQUENCIES_FILE), mmap_mode="r"),
+        )
+        return cls((segment,), np.load(os.path.join(path, LEXICAL_LENGTHS_FILE), mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def appended(self, texts):
+        """Return a copy with one row added per text"""
+        if not texts:
+            return self
+        token_lists = [tokenize(text) for text in texts]
+        segment = Segment.build(token_lists, len(self))
+        lengths = np.concatenate([self.lengths, np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int32)])
+        segments = self.segments + (segment,)
+        if len(segments) > LEXICAL_MAX_SEGMENTS:
+            segments = (merge_segments(segments),)
+        return LexicalIndex(segments, lengths)
+
+    def without(self, positions):
+        """Return a copy with the rows at `positions` removed and the rest renumbered"""
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(list(positions), dtype=np.int64)] = False
+        return LexicalIndex((merge_segments(self.segments, keep),), np.asarray(self.lengths)[keep])
+
+    def norms(self):
+        """Per-row BM25 length normalisation k1 * (1 - b + b * length / average length), computed once"""
+        if self._norms is None:
+            average_length = self.total_length / len(self) or 1.0
+            self._norms = (BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.lengths, dtype=np.float32) / average_length)).astype(np.float32)
+        return self._norms
+
+    def search(self, queries, k):
+        """
+        Score every row containing a query term with BM25.
+
+        Scores are summed only over the rows the query's postings name, so a
+        query of rare terms costs little however large the index is.
+
+        Returns:
+            tuple: (scores, ids) arrays of shape (len(queries), k) like index.search
+            output, best first, padded with -1 ids
+        """
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        n_rows = len(self)
+        if not n_rows:
+            return scores, ids
+        norms = self.norms()
+
+        for q, query in enumerate(queries):
+            rows, weights = [], []
+            for term in set(tokenize(query)):
+                frequency = sum(segment.document_frequency(term) for segment in self.segments)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (n_rows - frequency + 0.5) / (frequency + 0.5))
+                for segment in self.segments:
+                    found = segment.postings_for(term)
+                    if found is None:
+                        continue
+                    term_rows, term_frequencies = found
+                    tf = term_frequencies.astype(np.float32)
+                    rows.append(term_rows)
+                    weights.append(tf * (idf * (BM25_K1 + 1)) / (tf + norms[term_rows]))
+            if not rows:
+                continue
+            rows, weights = np.concatenate(rows), np.concatenate(weights)
+            if len(rows) < SPARSE_SCORING_FRACTION * n_rows:
+                matched, inverse = np.unique(rows, return_inverse=True)
+                totals = np.bincount(inverse, weights=weights, minlength=len(matched))
+            else:
+                totals = np.bincount(rows, weights=weights, minlength=n_rows)
+                matched = np.flatnonzero(totals)
+                totals = totals[matched]
+            top = np.arange(len(matched)) if len(matched) <= k else np.argpartition(-totals, k)[:k]
+            top = top[np.argsort(-totals[top], kind="stable")]
+            scores[q, :len(top)] = totals[top]
+            ids[q, :len(top)] = matched[top]
+        return scores, ids
+
+    def save(self, path):
+        """Write the index as one merged segment that open() can memory-map"""
+        segment = merge_segments(self.segments)
+        terms = [None] * len(segment.terms)
+        for term, i in segment.terms.items():
+            terms[i] = term
+        with open(os.path.join(path, LEXICAL_TERMS_FILE), "w") as terms_file:
+            json.dump(terms, terms_file, ensure_ascii=False)
+        np.save(os.path.join(path, LEXICAL_OFFSETS_FILE), segment.offsets)
+        np.save(os.path.join(path, LEXICAL_POSTINGS_FILE), segment.postings)
+        np.save(os.path.join(path, LEXICAL_FREQUENCIES_FILE), segment.frequencies)
+        np.save(os.path.join(path, LEXICAL_LENGTHS_FILE), np.asarray(self.lengths, dtype=np.int32))
+
+    def rebase(self, path):
+        """Swap the in-memory segments for a memory map of the files they were just saved to"""
+        saved = LexicalIndex.open(path)
+        if saved is not None and len(saved) == len(self):
+            self.segments = saved.segments
+            self.lengths = saved.lengths
+            self._norms = None
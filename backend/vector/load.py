@@ -1,91 +1,850 @@
+import asyncio
 import logging
 import faiss
+import json
+import numpy as np
 import os
 import threading
 import time
+import uuid
+from contextlib import contextmanager
+from document.content_hash import content_hash_of, docstore_id, set_chunk_ids
 from document.loader import load_all_documents
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from load_env import load_env
+from cache.embeddings import EMBEDDING_DIMENSIONS, get_embedding_model, truncate_embeddings
+from vector.docstore import DOCSTORE_DATA_FILE, CompactDocstore
+from vector.full_vectors import VECTORS_FILE, FullPrecisionVectors, exact_rerank
+from vector.fusion import reciprocal_rank_fusion_ids
+from vector.mmr import mmr_select, scaled_relevance
+from vector.ingest_log import IngestLog
+from vector.lexical import LexicalIndex
+from vector.index_factory import (
+    FAISS_INDEX_TYPE,
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_IVF_NPROBE,
+    FAISS_QUANTIZATION,
+    FAISS_RERANK_FACTOR,
+    apply_search_params,
+    build_index,
+    detect_index_type,
+    detect_quantization,
+    is_memory_mapped,
+    migrate_index,
+    min_training_vectors,
+    needs_training,
+    read_index,
+    reconstruct_all,
+    reconstruct_rows,
+    remove_positions,
+    upgrade_target,
+)
 import pickle
+import shutil
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows: saves still stage in a private directory, just without the cross-process lock
+    fcntl = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_env()
 
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-large")
+embedding_model = get_embedding_model()
+
+FAISS_STORE_PATH = os.getenv("FAISS_STORE_PATH", "faiss_store")
+INGEST_LOG_PATH = f"{FAISS_STORE_PATH}.ingest.log"
+MANIFEST_FILE = "manifest.json"
+# Per-document record of the content hash each document was ingested with and the chunk ids it owns
+DOCUMENTS_FILE = "documents.json"
+INDEX_FILE = "index.faiss"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+# Open the persisted index with IO_FLAG_MMAP so worker processes share it through the page cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+EMBEDDING_DIMENSION = EMBEDDING_DIMENSIONS  # 3072 for text-embedding-3-large unless truncated
+
+# Batched ingestion: chunks are accumulated across documents up to these budgets
+# before one embeddings pass, and the store is checkpointed on a size or time interval
+INGEST_BATCH_MAX_VECTORS = int(os.getenv("INGEST_BATCH_MAX_VECTORS", "512"))
+INGEST_BATCH_MAX_TOKENS = int(os.getenv("INGEST_BATCH_MAX_TOKENS", "200000"))
+INGEST_CHECKPOINT_VECTORS = int(os.getenv("INGEST_CHECKPOINT_VECTORS", "5000"))
+INGEST_CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "60"))
 
-FAISS_STORE_PATH = "faiss_store"
+# Ingestion is an opt-in role: only a process started with VECTOR_INGESTION=1 loads
+# and embeds new documents; every other worker just opens the store and serves it
+VECTOR_INGESTION = os.getenv("VECTOR_INGESTION", "0") == "1"
+# Only the writer persists the store (including migrations made when opening it);
+# serving workers open it read-only
+_store_writer = VECTOR_INGESTION
+# How often serving workers check whether the writer has checkpointed a newer store (0 disables)
+STORE_RELOAD_SECONDS = float(os.getenv("STORE_RELOAD_SECONDS", "15"))
 
 # Global variables for thread-safe vector store management
 _vector_store = None
 _vector_store_lock = threading.RLock()
+_ingestion_thread = None
+_watcher_thread = None
+_startup_seconds = None
 _is_loading = False
 _loading_progress = {"current": 0, "total": 0, "status": "initializing"}
 
+class StaleSnapshotError(RuntimeError):
+    """The file a memory-mapped snapshot came from has since been replaced by a newer save"""
+
 class ThreadSafeVectorStore:
-    """Wrapper for FAISS vector store to make it thread-safe"""
+    """
+    Copy-on-write wrapper around the FAISS vector store.
+    
+    `vector_store` always points at an immutable snapshot. Readers grab that
+    reference and search it without taking any lock. Writers embed new documents
+    and persist snapshots outside the critical section; the only work done under
+    the write lock is copying the current snapshot, appending the vectors and
+    swapping the reference, so new vectors become visible atomically.
+    """
     
     def __init__(self, vector_store):
         self.vector_store = vector_store
-        self.lock = threading.RLock()
+        self.epoch = 0
+        self.write_lock = threading.Lock()
+        self.persist_lock = threading.Lock()
     
     def similarity_search(self, query, k=4, **kwargs):
-        with self.lock:
+        if self.vector_store.full_vectors is None or kwargs:
             return self.vector_store.similarity_search(query, k=k, **kwargs)
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
     
-    def as_retriever(self, **kwargs):
-        # Create a thread-safe retriever wrapper
-        class ThreadSafeRetriever:
-            def __init__(self, wrapped_store):
-                self.wrapped_store = wrapped_store
-            
-            def invoke(self, query):
-                with self.wrapped_store.lock:
-                    return self.wrapped_store.vector_store.as_retriever(**kwargs).invoke(query)
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        if self.vector_store.full_vectors is None or kwargs:
+            return self.vector_store.similarity_search_with_score(query, k=k, **kwargs)
+        # Scores from compressed codes are approximate, so go through the re-ranking path
+        return [(doc, score) for _, doc, score in self.batch_similarity_search_with_score([query], k=k)[0]]
+    
+    def batch_similarity_search_with_score(self, queries, k=4):
+        """
+        Search the store for several queries at once.
+        
+        All queries are embedded in at most one embeddings round-trip (cached
+        queries are not re-embedded) and then
+        searched with one index.search call (nq = len(queries)) against a single
+        snapshot of the store.
+        
+        Args:
+            queries (list): Query strings
+            k (int): Number of neighbours to return per query
+        
+        Returns:
+            list: One list of (index_id, Document, score) tuples per query, best match first
+        """
+        if not queries:
+            return []
+        
+        vectors = embedding_model.embed_queries(list(queries))
+        return self.search_by_vectors(vectors, k)
+    
+    async def abatch_similarity_search_with_score(self, queries, k=4):
+        """
+        Async version of batch_similarity_search_with_score.
+        
+        The embeddings request is awaited and the FAISS search runs in the default
+        executor, so the event loop stays free while either is in flight.
+        """
+        if not queries:
+            return []
+        
+        vectors = await embedding_model.aembed_queries(list(queries))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.search_by_vectors, vectors, k)
+    
+    def search_by_vectors(self, vectors, k=4):
+        """
+        Run one index.search for a batch of query vectors against the current snapshot.
+        
+        A quantized snapshot is scanned for FAISS_RERANK_FACTOR * k candidates,
+        which are then re-scored against the full-precision vectors.
+        
+        Args:
+            vectors (list): Query embeddings, one row per query
+            k (int): Number of neighbours to return per query
+        
+        Returns:
+            list: One list of (index_id, Document, score) tuples per query, best match first
+        """
+        store = self.vector_store
+        scores, ids = vector_search(store, vectors, k)
+        return hits_from_ids(store, scores, ids)
+    
+    def retrieve(self, queries, lexical_queries=None, k=4, mmr_size=0, mmr_lambda=0.5, best_similarity=False):
+        """
+        Search for several queries and return one ranked, deduplicated list of chunks.
         
-        return ThreadSafeRetriever(self)
+        Embeds the queries in one round-trip, then runs retrieve_by_vectors.
+        """
+        if not queries:
+            return ([], float("-inf")) if best_similarity else []
+        vectors = embedding_model.embed_queries(list(queries))
+        return self.retrieve_by_vectors(vectors, lexical_queries, k, mmr_size, mmr_lambda, best_similarity)
+    
+    async def aretrieve(self, queries, lexical_queries=None, k=4, mmr_size=0, mmr_lambda=0.5, best_similarity=False):
+        """Async version of retrieve; the searches run in the default executor"""
+        if not queries:
+            return ([], float("-inf")) if best_similarity else []
+        vectors = await embedding_model.aembed_queries(list(queries))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.retrieve_by_vectors, vectors, lexical_queries, k, mmr_size, mmr_lambda, best_similarity,
+        )
+    
+    def retrieve_by_vectors(self, vectors, lexical_queries=None, k=4, mmr_size=0, mmr_lambda=0.5, best_similarity=False):
+        """
+        Build the candidate pool for a batch of queries from one snapshot.
+        
+        The pool is every unique vector hit, in query order. With lexical_queries
+        it is instead every vector and BM25 hit (at most k per query each),
+        ordered by reciprocal rank fusion, so keyword hits join the pool rather
+        than displacing vector hits. With mmr_size, maximal marginal relevance then picks
+        that many diverse chunks from the pool, weighing diversity against the
+        fused score (or, without lexical_queries, the query similarity). Everything runs on id arrays;
+        only the chunks finally returned are read from the docstore.
+        
+        Args:
+            vectors (list): Query embeddings, one row per query
+            lexical_queries (list): Query strings for BM25, or None for vector search only
+            k (int): Number of neighbours to fetch per query
+            mmr_size (int): How many chunks MMR keeps; 0 keeps the whole pool
+            mmr_lambda (float): MMR trade-off; 1 ranks by relevance alone, 0 by diversity alone
+            best_similarity (bool): Also return the highest vector similarity of any query
+                to any chunk, which fused scores do not show
+        
+        Returns:
+            list: (index_id, Document, score) tuples, best first; scores are
+            similarities, or fused RRF scores for hybrid search. With
+            best_similarity, a (hits, similarity) tuple.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        store = self.vector_store
+        vector_scores, vector_ids = vector_search(store, vectors, k)
+        
+        found = vector_ids.ravel() >= 0
+        ids, first_seen = np.unique(vector_ids.ravel()[found], return_index=True)
+        order = np.argsort(first_seen)
+        ids, scores = ids[order], vector_scores.ravel()[found][first_seen[order]]
+        best = float(scores.max()) if len(scores) else float("-inf")
+        if lexical_queries:
+            _, lexical_ids = store.lexical.search(list(lexical_queries), k)
+            ids, scores = reciprocal_rank_fusion_ids([vector_ids, lexical_ids])
+        
+        if 0 < mmr_size < len(ids):
+            # Fused scores are the relevance MMR trades off, so keyword-only hits keep their rank
+            relevance = scaled_relevance(scores) if lexical_queries else None
+            selected = mmr_select(vectors, candidate_vectors(store, ids), mmr_size, mmr_lambda, relevance)
+            ids, scores = ids[selected], scores[selected]
+        hits = hits_from_ids(store, scores[None], ids[None])[0]
+        return (hits, best) if best_similarity else hits
+    
+    def append_batch(self, texts, embeddings, metadatas, log=None, ids=None, content_hashes=None, removed_titles=()):
+        """
+        Publish already-embedded chunks without writing the store to disk.
+        
+        When a log is given the batch is first appended (and fsynced) to it, so
+        it survives a crash until the next checkpoint covers it.
+        
+        Args:
+            ids (list): Docstore id for each chunk
+            content_hashes (dict): Title -> content hash of every document whose
+                chunks this batch holds; their previous chunks are replaced
+            removed_titles (list): Documents to purge from the store
+        
+        Returns:
+            int: The log sequence number assigned to the batch
+        """
+        with self.write_lock:
+            seq = self.vector_store.ingest_log_seq + 1
+            if log is not None:
+                log.append({
+                    "seq": seq,
+                    "texts": texts,
+                    "metadatas": metadatas,
+                    "embeddings": np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1 if texts else self.vector_store.index.d),
+                    "ids": ids,
+                    "content_hashes": content_hashes,
+                    "removed_titles": list(removed_titles),
+                })
+            snapshot = copy_vector_store(self.vector_store)
+            apply_document_batch(snapshot, texts, embeddings, metadatas, ids, content_hashes, removed_titles)
+            snapshot.ingest_log_seq = seq
+            upgrade_index(snapshot)
+            self._publish(snapshot)
+        return seq
+    
+    def remove_documents(self, titles, log=None):
+        """Purge every chunk the given documents own; logged like any other batch"""
+        return self.append_batch([], [], [], log=log, removed_titles=list(titles))
+    
+    def adopt_content_hashes(self, content_hashes):
+        """
+        Record content hashes for documents indexed before hashes were kept.
+        
+        Only the document records change, not the index, so the current snapshot's
+        records are swapped for updated copies instead of publishing a new snapshot;
+        the next checkpoint persists them.
+        """
+        with self.write_lock:
+            documents = dict(self.vector_store.documents)
+            for title, content_hash in content_hashes.items():
+                if title in documents:
+                    documents[title] = {**documents[title], "content_hash": content_hash}
+            self.vector_store.documents = documents
+    
+    def checkpoint(self, log, path=FAISS_STORE_PATH):
+        """Persist the current snapshot and drop the log records it now covers"""
+        with self.write_lock:
+            self._persist(self.vector_store, self.epoch, path)
+            log.truncate()
+        logger.info(f"Checkpointed vector store ({self.vector_store.index.ntotal} vectors) to {path}")
+    
+    def replay_log(self, log):
+        """Re-apply logged batches newer than the loaded checkpoint; no embeddings calls are made"""
+        replayed = 0
+        for record in log.replay():
+            if record["seq"] <= self.vector_store.ingest_log_seq:
+                continue
+            embeddings = record["embeddings"]
+            if embeddings.shape[1] != self.vector_store.index.d:
+                embeddings = truncate_embeddings(embeddings, self.vector_store.index.d)
+            with self.write_lock:
+                snapshot = copy_vector_store(self.vector_store)
+                apply_document_batch(
+                    snapshot, record["texts"], embeddings.tolist(), record["metadatas"],
+                    record.get("ids"), record.get("content_hashes"), record.get("removed_titles", ()),
+                )
+                snapshot.ingest_log_seq = record["seq"]
+                upgrade_index(snapshot)
+                self._publish(snapshot)
+            replayed += len(record["texts"])
+        if replayed:
+            logger.info(f"Replayed {replayed} vectors from {log.path}")
+        return replayed
+    
+    def replace(self, vector_store, path=FAISS_STORE_PATH, persist=True):
+        """Atomically swap in a completely rebuilt (or freshly reopened) store, persisting it unless told not to"""
+        with self.write_lock:
+            epoch = self._publish(vector_store)
+        if persist:
+            self._persist(vector_store, epoch, path)
+    
+    def reload(self, path=FAISS_STORE_PATH):
+        """Swap in the store as the writer process last saved it, plus any batches logged since"""
+        snapshot, _ = open_snapshot(path)
+        self.replace(snapshot, persist=False)
+        replay_pending(self)
+        logger.info(f"Reloaded vector store from {path} ({snapshot.index.ntotal} vectors, log seq {snapshot.ingest_log_seq})")
     
-    def add_documents(self, documents):
-        with self.lock:
-            if documents:
-                logger.info(f"Adding {len(documents)} documents to vector store")
-                self.vector_store.add_documents(documents)
-                # Save after each addition to persist progress
-                self.vector_store.save_local(FAISS_STORE_PATH)
-                logger.info(f"Documents added and saved to {FAISS_STORE_PATH}")
+    def _publish(self, snapshot):
+        """Make a snapshot visible to readers; callers must hold write_lock"""
+        self.vector_store = snapshot
+        self.epoch += 1
+        return self.epoch
     
     def save_local(self, path):
-        with self.lock:
-            self.vector_store.save_local(path)
+        self._persist(self.vector_store, self.epoch, path)
+    
+    def _persist(self, snapshot, epoch, path):
+        """Write a published snapshot to disk unless a newer one has been published since"""
+        with self.persist_lock:
+            if epoch != self.epoch:
+                logger.info(f"Skipping save of snapshot {epoch}; snapshot {self.epoch} supersedes it")
+                return
+            # Write to a scratch directory private to this save and move the files into
+            # place, so a crash mid-save never leaves a half-written store behind
+            tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            try:
+                write_store(snapshot, tmp_path)
+                if snapshot.full_vectors is not None:
+                    snapshot.full_vectors.save(os.path.join(tmp_path, VECTORS_FILE))
+                snapshot.lexical.save(tmp_path)
+                with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as manifest_file:
+                    json.dump(build_manifest(snapshot), manifest_file, indent=2)
+                with open(os.path.join(tmp_path, DOCUMENTS_FILE), "w") as documents_file:
+                    json.dump(snapshot.documents, documents_file)
+                
+                # Readers opening the store hold the shared lock, so they never see a mix of files
+                with store_lock(path, exclusive=True):
+                    os.makedirs(path, exist_ok=True)
+                    for name in os.listdir(tmp_path):
+                        os.replace(os.path.join(tmp_path, name), os.path.join(path, name))
+                    
+                    # Earlier versions pickled the whole docstore next to the index
+                    legacy_path = os.path.join(path, LEGACY_DOCSTORE_FILE)
+                    if os.path.exists(legacy_path):
+                        os.remove(legacy_path)
+                    snapshot.docstore.rebase(path)
+                    snapshot.lexical.rebase(path)
+                    
+                    vectors_path = os.path.join(path, VECTORS_FILE)
+                    if snapshot.full_vectors is not None:
+                        # Serve the saved rows from the page cache instead of private memory
+                        snapshot.full_vectors.rebase(vectors_path)
+                    elif os.path.exists(vectors_path):
+                        os.remove(vectors_path)
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
 
-def initialize_empty_vector_store():
-    """Initialize an empty FAISS vector store"""
-    logger.info("Initializing empty vector store...")
+@contextmanager
+def store_lock(path, exclusive=False):
+    """
+    Cross-process lock on a store directory, held in `{path}.lock`.
     
-    if os.path.exists(FAISS_STORE_PATH):
-        logger.info('Existing vector store found, loading...')
+    Saves take it exclusively while they move files into place; opening a store
+    takes it shared. Without fcntl (Windows) it does nothing.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def claim_writer_role():
+    """Make this process the store's writer; must be called before the store is first opened"""
+    global _store_writer
+    _store_writer = True
+
+def vector_search(store, vectors, k):
+    """
+    One index.search for a batch of query vectors against a snapshot.
+    
+    A quantized snapshot is scanned for FAISS_RERANK_FACTOR * k candidates,
+    which are then re-scored against the full-precision vectors.
+    
+    Returns:
+        tuple: (scores, ids) arrays of shape (len(vectors), k), padded with -1 ids
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    if store.full_vectors is None:
+        return store.index.search(vectors, k)
+    _, candidates = store.index.search(vectors, k * FAISS_RERANK_FACTOR)
+    return exact_rerank(vectors, candidates, store.full_vectors, k)
+
+def candidate_vectors(store, ids):
+    """Stored vectors for the given ids; the full-precision copy when the index is quantized"""
+    if store.full_vectors is not None:
+        return store.full_vectors.rows(ids)
+    return reconstruct_rows(store.index, ids)
+
+def hits_from_ids(store, scores, ids):
+    """Turn (scores, ids) search output into (index_id, Document, score) lists, skipping -1 padding"""
+    results = []
+    for row_scores, row_ids in zip(scores, ids):
+        hits = []
+        for score, index_id in zip(row_scores, row_ids):
+            if index_id == -1:
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[int(index_id)])
+            if not isinstance(doc, Document):
+                logger.warning(f"Index id {index_id} has no document in the docstore")
+                continue
+            hits.append((int(index_id), doc, float(score)))
+        results.append(hits)
+    return results
+
+def copy_vector_store(vector_store):
+    """Return an independent copy of a FAISS store that can be modified without affecting readers"""
+    if vector_store.mapped_from is not None:
+        # Mapped data is read-only and cannot be cloned, so read a private copy of the
+        # file; another process may have saved a newer store over it since it was mapped
+        if file_identity(vector_store.mapped_from) != vector_store.mapped_identity:
+            raise StaleSnapshotError(f"{vector_store.mapped_from} was replaced after this snapshot was opened")
+        index = read_index(vector_store.mapped_from, mmap=False)
+        apply_search_params(index)
+    else:
+        index = faiss.clone_index(vector_store.index)
+    copy = FAISS(
+        embedding_function=vector_store.embedding_function,
+        index=index,
+        docstore=vector_store.docstore.copy(),
+        index_to_docstore_id=dict(vector_store.index_to_docstore_id),
+        relevance_score_fn=vector_store.override_relevance_score_fn,
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy,
+    )
+    copy.ingest_log_seq = vector_store.ingest_log_seq
+    copy.trained_on = vector_store.trained_on
+    copy.full_vectors = vector_store.full_vectors
+    copy.documents = dict(vector_store.documents)
+    copy.lexical = vector_store.lexical
+    copy.mapped_from = None
+    return copy
+
+def write_store(vector_store, path):
+    """Write a snapshot's index and compact docstore into a store directory"""
+    os.makedirs(path, exist_ok=True)
+    index_path = os.path.join(path, INDEX_FILE)
+    if vector_store.mapped_from is not None:
+        # A mapped index serializes as a reference to its file, so copy the file itself
+        shutil.copyfile(vector_store.mapped_from, index_path)
+    else:
+        faiss.write_index(vector_store.index, index_path)
+    vector_store.docstore.write(path, vector_store.index_to_docstore_id)
+
+def load_store(path=FAISS_STORE_PATH):
+    """
+    Open a persisted store.
+    
+    The index is opened with IO_FLAG_MMAP (FAISS_MMAP) and the docstore maps its
+    text file, so opening does not read the corpus into memory. Stores written in
+    the old pickled format are loaded once and converted on the next save.
+    """
+    if not os.path.exists(os.path.join(path, DOCSTORE_DATA_FILE)):
+        logger.info(f"Loading pickled store from {path}; it will be converted to the compact format")
         vector_store = FAISS.load_local(
-            FAISS_STORE_PATH,
+            path,
             embeddings=embedding_model,
             allow_dangerous_deserialization=True
         )
+        vector_store.docstore = CompactDocstore(vector_store.docstore._dict)
+        vector_store.mapped_from = None
+        return vector_store
+    
+    index_path = os.path.join(path, INDEX_FILE)
+    index = read_index(index_path, mmap=FAISS_MMAP)
+    docstore, index_to_docstore_id = CompactDocstore.open(path)
+    vector_store = FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+    vector_store.mapped_from = index_path if is_memory_mapped(index) else None
+    vector_store.mapped_identity = file_identity(index_path)
+    return vector_store
+
+def file_identity(path):
+    """(inode, mtime) of a file, which changes when a save replaces it"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+def add_embeddings_to(snapshot, texts, embeddings, metadatas, ids=None):
+    """
+    Add embedded chunks to a (not yet published) snapshot, keeping its full-precision copy in step.
+    
+    Returns:
+        list: Docstore ids of the added chunks
+    """
+    added = snapshot.add_embeddings(list(zip(texts, embeddings)), metadatas=metadatas, ids=ids)
+    if snapshot.full_vectors is not None:
+        snapshot.full_vectors = snapshot.full_vectors.appended(embeddings)
+    snapshot.lexical = snapshot.lexical.appended(texts)
+    return added
+
+def remove_from(snapshot, doc_ids):
+    """
+    Remove chunks by docstore id from a (not yet published) snapshot.
+    
+    Index ids are positions, so the remaining chunks are renumbered in order and
+    the full-precision copy and index_to_docstore_id are compacted to match.
+    
+    Returns:
+        int: Number of chunks removed
+    """
+    doc_ids = set(doc_ids)
+    positions = [position for position, doc_id in snapshot.index_to_docstore_id.items() if doc_id in doc_ids]
+    if not positions:
+        return 0
+    vectors = snapshot.full_vectors.all() if snapshot.full_vectors is not None else None
+    snapshot.index = remove_positions(snapshot.index, positions, vectors)
+    apply_search_params(snapshot.index)
+    if snapshot.full_vectors is not None:
+        snapshot.full_vectors = snapshot.full_vectors.without(positions)
+    snapshot.lexical = snapshot.lexical.without(positions)
+    snapshot.docstore.delete([snapshot.index_to_docstore_id[position] for position in positions])
+    removed = set(positions)
+    remaining = [doc_id for position, doc_id in sorted(snapshot.index_to_docstore_id.items()) if position not in removed]
+    snapshot.index_to_docstore_id = dict(enumerate(remaining))
+    return len(positions)
+
+def apply_document_batch(snapshot, texts, embeddings, metadatas, ids=None, content_hashes=None, removed_titles=()):
+    """
+    Apply one ingestion batch to a (not yet published) snapshot.
+    
+    Documents in `removed_titles`, and every document whose content hash this
+    batch carries, first lose the chunks they owned. The batch's chunks are then
+    added and recorded against their title. Chunks without a content hash
+    (add_documents, log records from before hashes were kept) are appended to
+    whatever their title already owns.
+    
+    Returns:
+        int: Number of chunks removed
+    """
+    content_hashes = content_hashes or {}
+    documents = dict(snapshot.documents)
+    replaced = set(removed_titles) | set(content_hashes)
+    stale = [doc_id for title in replaced if title in documents for doc_id in documents[title]["ids"]]
+    removed = remove_from(snapshot, stale)
+    for title in replaced:
+        documents.pop(title, None)
+    
+    if texts:
+        added = add_embeddings_to(snapshot, texts, embeddings, metadatas, ids)
+        owned = {}
+        for doc_id, metadata in zip(added, metadatas):
+            owned.setdefault(metadata.get("title"), []).append(doc_id)
+        for title, doc_ids in owned.items():
+            previous = documents.get(title, {"content_hash": None, "ids": []})
+            documents[title] = {
+                "content_hash": content_hashes.get(title, previous["content_hash"]),
+                "ids": previous["ids"] + doc_ids,
+            }
+    snapshot.documents = documents
+    return removed
+
+def documents_from_docstore(vector_store):
+    """Document records for a store saved before they were kept; content hashes are unknown"""
+    documents = {}
+    for position in sorted(vector_store.index_to_docstore_id):
+        doc_id = vector_store.index_to_docstore_id[position]
+        doc = vector_store.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            documents.setdefault(doc.metadata.get("title"), {"content_hash": None, "ids": []})["ids"].append(doc_id)
+    return documents
+
+def read_lexical_index(vector_store, path=FAISS_STORE_PATH):
+    """
+    Open the store's BM25 index, or build it from the docstore when it is missing
+    or out of step with the FAISS index (stores saved before it was kept).
+    
+    Returns:
+        tuple: (LexicalIndex, whether it was rebuilt and needs saving)
+    """
+    lexical = LexicalIndex.open(path)
+    if lexical is not None and len(lexical) == vector_store.index.ntotal:
+        return lexical, False
+    logger.info(f"Building the lexical index for {vector_store.index.ntotal} chunks from the docstore")
+    texts = []
+    for position in range(vector_store.index.ntotal):
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        texts.append(doc.page_content if isinstance(doc, Document) else "")
+    return LexicalIndex.from_texts(texts), True
+
+def read_documents(vector_store, path=FAISS_STORE_PATH):
+    documents_path = os.path.join(path, DOCUMENTS_FILE)
+    if not os.path.exists(documents_path):
+        logger.info(f"No {DOCUMENTS_FILE} in {path}; deriving document records from the docstore")
+        return documents_from_docstore(vector_store)
+    with open(documents_path) as documents_file:
+        return json.load(documents_file)
+
+def stored_vectors(vector_store):
+    """Every vector of a snapshot in id order, at full precision when the index is quantized"""
+    if vector_store.full_vectors is not None:
+        return vector_store.full_vectors.all()
+    return reconstruct_all(vector_store.index)
+
+def initial_layout(n_vectors):
+    """
+    (index_type, quantization) to build for a store of n_vectors.
+    
+    The configured layout once it can be trained; before that, index types
+    that need training start out flat and SQ8 starts out unquantized.
+    """
+    if n_vectors >= min_training_vectors(FAISS_INDEX_TYPE, FAISS_QUANTIZATION):
+        return FAISS_INDEX_TYPE, FAISS_QUANTIZATION
+    index_type = "flat" if needs_training(FAISS_INDEX_TYPE) else FAISS_INDEX_TYPE
+    quantization = "none" if needs_training(index_type, FAISS_QUANTIZATION) else FAISS_QUANTIZATION
+    return index_type, quantization
+
+def build_manifest(vector_store):
+    """Describe a snapshot's on-disk layout so it can be reopened with the same settings"""
+    index = vector_store.index
+    return {
+        "index_type": detect_index_type(index),
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "trained_on": vector_store.trained_on,
+        "quantization": detect_quantization(index),
+        "rerank_factor": FAISS_RERANK_FACTOR,
+        "nprobe": FAISS_IVF_NPROBE,
+        "ef_search": FAISS_HNSW_EF_SEARCH,
+        "log_seq": vector_store.ingest_log_seq,
+    }
+
+def read_manifest(path=FAISS_STORE_PATH):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def upgrade_index(vector_store):
+    """
+    Rebuild a (not yet published) snapshot's index as FAISS_INDEX_TYPE and
+    FAISS_QUANTIZATION once it can be.
+    
+    Layouts that need training start out flat and unquantized and are trained as
+    soon as enough vectors exist, then retrained as the corpus grows. Returns
+    True if the index was rebuilt.
+    """
+    if not upgrade_target(vector_store.index, FAISS_INDEX_TYPE, vector_store.trained_on, FAISS_QUANTIZATION):
+        return False
+    vectors = stored_vectors(vector_store)
+    vector_store.index = migrate_index(vector_store.index, FAISS_INDEX_TYPE, vectors, FAISS_QUANTIZATION)
+    vector_store.trained_on = len(vectors) if needs_training(FAISS_INDEX_TYPE, FAISS_QUANTIZATION) else 0
+    if FAISS_QUANTIZATION == "none":
+        vector_store.full_vectors = None
+    elif vector_store.full_vectors is None:
+        vector_store.full_vectors = FullPrecisionVectors.from_array(vectors)
+    return True
+
+def open_snapshot(path=FAISS_STORE_PATH):
+    """
+    Open the persisted store as a snapshot, bringing it in line with the current settings in memory.
+    
+    Files are read under the store's shared lock, so a concurrent save is seen
+    either entirely or not at all. Nothing is written.
+    
+    Returns:
+        tuple: (snapshot, whether it differs from what is on disk and should be saved)
+    """
+    if os.path.exists(path):
+        logger.info('Existing vector store found, loading...')
+        started = time.perf_counter()
+        with store_lock(path):
+            vector_store = load_store(path)
+            manifest = read_manifest(path)
+            vector_store.ingest_log_seq = manifest.get("log_seq", 0)
+            vector_store.trained_on = manifest.get("trained_on", 0)
+            vector_store.documents = read_documents(vector_store, path)
+            vector_store.lexical, lexical_built = read_lexical_index(vector_store, path)
+            vector_store.full_vectors = None
+            if manifest.get("quantization", "none") != "none":
+                vector_store.full_vectors = FullPrecisionVectors.open(
+                    os.path.join(path, VECTORS_FILE), vector_store.index.d
+                )
+                if len(vector_store.full_vectors) != vector_store.index.ntotal:
+                    raise ValueError(f"{VECTORS_FILE} has {len(vector_store.full_vectors)} rows but the index has {vector_store.index.ntotal}; run rebuild_vector_store")
+        apply_search_params(vector_store.index)
+        logger.info(f"Opened {vector_store.index.ntotal} vectors in {time.perf_counter() - started:.3f}s (memory-mapped: {vector_store.mapped_from is not None})")
     else:
         logger.info('Creating new empty vector store...')
-        vector_store = FAISS(
-            embedding_function=embedding_model, 
-            index=faiss.IndexFlatIP(3072),  # text-embedding-3-large -> 3072 dimensions
-            docstore=InMemoryDocstore({}), 
-            index_to_docstore_id={}
-        )
+        vector_store = create_empty_faiss_store()
+        lexical_built = False
+    
+    # Re-derive vectors locally if the store was built at a different embedding dimension
+    migrated = lexical_built
+    if vector_store.index.d != EMBEDDING_DIMENSION:
+        logger.info(f"Store has {vector_store.index.d}-d vectors, EMBEDDING_DIMENSIONS is {EMBEDDING_DIMENSION}; re-indexing")
+        vector_store = derive_dimension_store(vector_store, EMBEDDING_DIMENSION)
+        migrated = True
+    
+    # Migrate an existing store (e.g. the original flat index) to the configured index type
+    migrated = upgrade_index(vector_store) or migrated
+    return vector_store, migrated
+
+def initialize_empty_vector_store():
+    """Initialize an empty FAISS vector store"""
+    logger.info("Initializing empty vector store...")
+    vector_store, migrated = open_snapshot(FAISS_STORE_PATH)
+    
+    wrapped = ThreadSafeVectorStore(vector_store)
+    if migrated and _store_writer:
+        wrapped.save_local(FAISS_STORE_PATH)
+    elif migrated:
+        logger.info("Store migrated in memory only; the ingestion process saves it")
+    
+    # Recover batches that were committed to the log after the last checkpoint
+    replay_pending(wrapped)
     
     logger.info("Vector store initialized successfully")
-    return ThreadSafeVectorStore(vector_store)
+    return wrapped
+
+def create_empty_faiss_store():
+    """Create an empty in-memory FAISS store"""
+    # Layouts that need training start out flat; upgrade_index converts them later
+    index_type, quantization = initial_layout(0)
+    vector_store = FAISS(
+        embedding_function=embedding_model, 
+        index=build_index(index_type, EMBEDDING_DIMENSION, quantization=quantization),
+        docstore=CompactDocstore(), 
+        index_to_docstore_id={}
+    )
+    vector_store.ingest_log_seq = 0
+    vector_store.trained_on = 0
+    vector_store.full_vectors = FullPrecisionVectors(EMBEDDING_DIMENSION) if quantization != "none" else None
+    vector_store.documents = {}
+    vector_store.lexical = LexicalIndex()
+    vector_store.mapped_from = None
+    return vector_store
+
+def derive_dimension_store(vector_store, dimensions):
+    """
+    Build a copy of a store with every vector re-derived at `dimensions`, without the API.
+    
+    Full-size vectors come from the content-addressed document embedding cache
+    when possible, otherwise from the index itself (which only works when
+    shrinking). They are truncated and re-normalized, and keep their ids, so the
+    docstore mapping is shared unchanged.
+    """
+    stored = stored_vectors(vector_store)
+    texts = []
+    for position in range(len(stored)):
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        texts.append(doc.page_content if isinstance(doc, Document) else "")
+    
+    cached = embedding_model.cached_document_vectors(texts)
+    full = []
+    for position, vector in enumerate(cached):
+        if vector is None or len(vector) < dimensions:
+            vector = stored[position]
+        if len(vector) < dimensions:
+            raise ValueError(f"Vector {position} is only {len(vector)}-d and not cached at full size; run rebuild_vector_store instead")
+        full.append(vector[:dimensions])
+    vectors = truncate_embeddings(np.vstack(full), dimensions) if full else np.zeros((0, dimensions), dtype=np.float32)
+    
+    index_type, quantization = initial_layout(len(vectors))
+    index = build_index(index_type, dimensions, vectors, quantization)
+    if len(vectors):
+        index.add(vectors)
+    
+    derived = FAISS(
+        embedding_function=vector_store.embedding_function,
+        index=index,
+        docstore=vector_store.docstore.copy(),
+        index_to_docstore_id=dict(vector_store.index_to_docstore_id),
+        relevance_score_fn=vector_store.override_relevance_score_fn,
+        normalize_L2=vector_store._normalize_L2,
+        distance_strategy=vector_store.distance_strategy,
+    )
+    derived.mapped_from = None
+    derived.ingest_log_seq = vector_store.ingest_log_seq
+    derived.trained_on = len(vectors) if needs_training(index_type, quantization) else 0
+    derived.full_vectors = FullPrecisionVectors.from_array(vectors) if quantization != "none" else None
+    derived.documents = dict(vector_store.documents)
+    derived.lexical = vector_store.lexical
+    logger.info(f"Derived {len(vectors)} vectors at {dimensions} dimensions")
+    return derived
+
+def reindex_to_dimension(dimensions, path=None):
+    """
+    Write a copy of the live store at another embedding dimension to `path`.
+    
+    Runs entirely locally, so it can be used to prepare a smaller store next to
+    the live one and switch to it by setting EMBEDDING_DIMENSIONS and FAISS_STORE_PATH.
+    """
+    path = path or f"{FAISS_STORE_PATH}_{dimensions}"
+    derived = derive_dimension_store(get_vector_store().vector_store, dimensions)
+    ThreadSafeVectorStore(derived).save_local(path)
+    logger.info(f"Re-indexed store at {dimensions} dimensions saved to {path}")
+    return path
 
 def chunk_documents(docs):
     """Split documents into chunks"""
@@ -101,7 +860,7 @@ def process_single_document(doc_name, title_to_chunks, doc_type="unknown"):
             return []
         
         doc_chunks = title_to_chunks[doc_name]
-        chunked_docs = chunk_documents(doc_chunks)
+        chunked_docs = set_chunk_ids(chunk_documents(doc_chunks))
         
         logger.info(f"Processed {doc_name}: {len(doc_chunks)} original chunks -> {len(chunked_docs)} processed chunks")
         return chunked_docs
@@ -110,13 +869,126 @@ def process_single_document(doc_name, title_to_chunks, doc_type="unknown"):
         logger.error(f"Error processing document {doc_name}: {e}")
         return []
 
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for batch budgeting"""
+    return len(text) // 4 + 1
+
+def plan_document_changes(documents, title_to_chunks):
+    """
+    Compare the store's document records with title_to_chunks.
+    
+    Each known document costs one dict lookup and a comparison of the content
+    hash its loader stamped on it, so unchanged documents are skipped without
+    re-chunking or re-embedding anything.
+    
+    Args:
+        documents (dict): Title -> {"content_hash", "ids"} records of the store
+        title_to_chunks (dict): Title -> loaded pages or clips
+    
+    Returns:
+        dict: "added", "changed" and "removed" title lists, the number of
+        "unchanged" documents, and "adopted" title -> hash for documents
+        indexed before content hashes were kept
+    """
+    plan = {"added": [], "changed": [], "removed": [], "unchanged": 0, "adopted": {}}
+    for title, pages in title_to_chunks.items():
+        record = documents.get(title)
+        content_hash = content_hash_of(pages)
+        if record is None:
+            plan["added"].append(title)
+        elif record["content_hash"] is None:
+            # Indexed from exactly these pages before hashes were recorded
+            plan["adopted"][title] = content_hash
+        elif record["content_hash"] != content_hash:
+            plan["changed"].append(title)
+        else:
+            plan["unchanged"] += 1
+    
+    removed = [title for title in documents if title not in title_to_chunks]
+    if removed and not title_to_chunks:
+        # An empty corpus means title_to_chunks.pkl was lost, not that everything was withdrawn
+        logger.warning(f"title_to_chunks is empty; not purging {len(removed)} documents from the store")
+    else:
+        plan["removed"] = removed
+    return plan
+
+def ingest_documents_batched(store, doc_names, title_to_chunks):
+    """
+    Embed and index documents in large batches with group commit.
+    
+    Chunks are accumulated across documents until INGEST_BATCH_MAX_VECTORS or
+    INGEST_BATCH_MAX_TOKENS would be exceeded, then embedded in one pass,
+    logged and published. A document's chunks are never split across batches,
+    and a document already in the store has its old chunks replaced in the same
+    batch that adds the new ones.
+    The store is checkpointed every INGEST_CHECKPOINT_VECTORS vectors or
+    INGEST_CHECKPOINT_SECONDS seconds, so a crash loses at most the batch in flight.
+    """
+    log = IngestLog(INGEST_LOG_PATH)
+    batch_docs, batch_chunks, batch_tokens = {}, [], 0
+    since_checkpoint = 0
+    last_checkpoint = time.monotonic()
+    totals = {"reused": 0, "computed": 0}
+    
+    def commit_batch():
+        texts = [doc.page_content for doc in batch_chunks]
+        metadatas = [doc.metadata for doc in batch_chunks]
+        embeddings, reused, computed = embedding_model.embed_documents_counted(texts)
+        ids = [docstore_id(doc) for doc in batch_chunks]
+        seq = store.append_batch(texts, embeddings, metadatas, log=log, ids=ids, content_hashes=batch_docs)
+        totals["reused"] += reused
+        totals["computed"] += computed
+        logger.info(f"Committed batch {seq}: {len(batch_docs)} documents, {len(texts)} chunks ({reused} reused, {computed} computed)")
+        return len(texts)
+    
+    for i, doc_name in enumerate(doc_names, 1):
+        _loading_progress["current"] = i
+        chunked_docs = process_single_document(doc_name, title_to_chunks)
+        if not chunked_docs:
+            logger.warning(f"No chunks generated for document: {doc_name}")
+            continue
+        
+        doc_tokens = sum(estimate_tokens(doc.page_content) for doc in chunked_docs)
+        over_budget = (
+            len(batch_chunks) + len(chunked_docs) > INGEST_BATCH_MAX_VECTORS
+            or batch_tokens + doc_tokens > INGEST_BATCH_MAX_TOKENS
+        )
+        if batch_chunks and over_budget:
+            try:
+                since_checkpoint += commit_batch()
+            except Exception as e:
+                logger.error(f"Error committing batch of {len(batch_docs)} documents: {e}")
+            batch_docs, batch_chunks, batch_tokens = {}, [], 0
+        
+        batch_docs[doc_name] = content_hash_of(title_to_chunks[doc_name])
+        batch_chunks.extend(chunked_docs)
+        batch_tokens += doc_tokens
+        
+        if since_checkpoint >= INGEST_CHECKPOINT_VECTORS or (
+            since_checkpoint and time.monotonic() - last_checkpoint >= INGEST_CHECKPOINT_SECONDS
+        ):
+            store.checkpoint(log)
+            since_checkpoint = 0
+            last_checkpoint = time.monotonic()
+    
+    if batch_chunks:
+        try:
+            since_checkpoint += commit_batch()
+        except Exception as e:
+            logger.error(f"Error committing batch of {len(batch_docs)} documents: {e}")
+    if since_checkpoint:
+        store.checkpoint(log)
+    
+    logger.info(f"Batched ingestion complete: {totals['reused']} vectors reused, {totals['computed']} computed")
+    return totals
+
 def add_documents_sequentially():
-    """Add documents to vector store one by one in background"""
+    """Load new documents and bring the vector store in line with them in the background"""
     global _is_loading, _loading_progress
     
     try:
         _is_loading = True
-        logger.info("Starting sequential document addition...")
+        logger.info("Starting batched document addition...")
         
         # Load all documents and metadata
         all_documents, url_to_title, title_to_chunks, new_docs = load_all_documents()
@@ -129,70 +1001,175 @@ def add_documents_sequentially():
         with open('title_to_chunks.pkl', 'wb') as t2c:
             pickle.dump(title_to_chunks, t2c)
         
-        if not new_docs:
-            logger.info("No new documents to add to vector store")
-            _loading_progress["status"] = "complete"
-            return
+        store = get_vector_store()
+        log = IngestLog(INGEST_LOG_PATH)
         
-        new_docs_list = list(new_docs)
-        _loading_progress["total"] = len(new_docs_list)
-        _loading_progress["status"] = "adding_documents"
+        plan = plan_document_changes(store.vector_store.documents, title_to_chunks)
+        logger.info(
+            f"Documents: {len(plan['added'])} new, {len(plan['changed'])} changed, "
+            f"{len(plan['removed'])} removed, {plan['unchanged']} unchanged"
+        )
+        if plan["adopted"]:
+            store.adopt_content_hashes(plan["adopted"])
         
-        logger.info(f"Found {len(new_docs_list)} new documents to add sequentially")
+        pending_docs = plan["added"] + plan["changed"]
+        if pending_docs:
+            _loading_progress["total"] = len(pending_docs)
+            _loading_progress["status"] = "adding_documents"
+            logger.info(f"Found {len(pending_docs)} documents to add or replace")
+            ingest_documents_batched(store, pending_docs, title_to_chunks)
+        else:
+            logger.info("No new documents to add to vector store")
         
-        # Process each document individually
-        for i, doc_name in enumerate(new_docs_list, 1):
-            try:
-                _loading_progress["current"] = i
-                logger.info(f"Processing document {i}/{len(new_docs_list)}: {doc_name}")
-                
-                # Determine document type
-                doc_type = "pdf" if doc_name.endswith('.pdf') else "youtube"
-                
-                # Process single document
-                chunked_docs = process_single_document(doc_name, title_to_chunks, doc_type)
-                
-                if chunked_docs:
-                    # Add to vector store
-                    with _vector_store_lock:
-                        if _vector_store:
-                            _vector_store.add_documents(chunked_docs)
-                    
-                    logger.info(f"Successfully added document {i}/{len(new_docs_list)}: {doc_name} ({len(chunked_docs)} chunks)")
-                else:
-                    logger.warning(f"No chunks generated for document: {doc_name}")
-                
-                # Small delay to prevent overwhelming the system
-                time.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"Error processing document {doc_name}: {e}")
-                continue
+        if plan["removed"]:
+            store.remove_documents(plan["removed"], log=log)
+            logger.info(f"Purged {len(plan['removed'])} withdrawn documents: {', '.join(plan['removed'])}")
+        if plan["removed"] or plan["adopted"]:
+            store.checkpoint(log)
         
         _loading_progress["status"] = "complete"
-        logger.info(f"Sequential document addition complete. Processed {len(new_docs_list)} documents.")
+        logger.info(f"Batched document addition complete. Processed {len(pending_docs)} documents.")
         
     except Exception as e:
-        logger.error(f"Error in sequential document addition: {e}")
+        logger.error(f"Error in batched document addition: {e}")
         _loading_progress["status"] = "error"
     finally:
         _is_loading = False
 
+def rebuild_vector_store(target=None, path=FAISS_STORE_PATH):
+    """
+    Rebuild the FAISS store from scratch out of title_to_chunks.pkl.
+    
+    Every document is re-chunked with the current chunk_documents settings, but
+    only chunks whose text changed are sent to the embeddings API; the rest are
+    served from the content-addressed document embedding cache.
+    
+    Args:
+        target (ThreadSafeVectorStore): Live store to swap the rebuilt index into, if any
+        path (str): Where to persist the rebuilt store
+    
+    Returns:
+        dict: Counts of documents, chunks, reused vectors and computed vectors
+    """
+    with open('title_to_chunks.pkl', 'rb') as t2c:
+        title_to_chunks = pickle.load(t2c)
+    
+    chunked_docs = []
+    content_hashes = {}
+    for doc_name in title_to_chunks:
+        chunks = process_single_document(doc_name, title_to_chunks)
+        if chunks:
+            chunked_docs.extend(chunks)
+            content_hashes[doc_name] = content_hash_of(title_to_chunks[doc_name])
+    
+    logger.info(f"Rebuilding vector store from {len(title_to_chunks)} documents ({len(chunked_docs)} chunks)")
+    texts = [doc.page_content for doc in chunked_docs]
+    metadatas = [doc.metadata for doc in chunked_docs]
+    embeddings, reused, computed = embedding_model.embed_documents_counted(texts)
+    
+    rebuilt = create_empty_faiss_store()
+    if texts:
+        ids = [docstore_id(doc) for doc in chunked_docs]
+        apply_document_batch(rebuilt, texts, embeddings, metadatas, ids=ids, content_hashes=content_hashes)
+        upgrade_index(rebuilt)
+    
+    # The rebuilt store already covers everything in the ingestion log
+    if target is None:
+        target = ThreadSafeVectorStore(rebuilt)
+        target.save_local(path)
+    else:
+        rebuilt.ingest_log_seq = target.vector_store.ingest_log_seq
+        target.replace(rebuilt, path)
+    IngestLog(INGEST_LOG_PATH).truncate()
+    
+    logger.info(f"Rebuild complete: {reused} vectors reused, {computed} computed")
+    return {
+        "documents": len(title_to_chunks),
+        "chunks": len(chunked_docs),
+        "reused": reused,
+        "computed": computed,
+    }
+
+def replay_pending(store):
+    """Replay the ingestion log into a store; a snapshot made stale by a concurrent save is left for the watcher to reopen"""
+    try:
+        store.replay_log(IngestLog(INGEST_LOG_PATH))
+    except StaleSnapshotError as e:
+        logger.info(f"Not replaying the ingestion log: {e}; the store will be reopened")
+
+def manifest_stamp(path=FAISS_STORE_PATH):
+    """(mtime, log_seq) of the store's manifest, which every save rewrites; None if there is none yet"""
+    try:
+        mtime = os.stat(os.path.join(path, MANIFEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return mtime, read_manifest(path).get("log_seq", 0)
+
+def watch_store(store, stamp, interval=STORE_RELOAD_SECONDS):
+    """
+    Reload a serving worker's store whenever the writer process saves a new one.
+    
+    Polls the manifest every `interval` seconds. A reload publishes a new
+    snapshot, so the epoch moves and answers cached against the old one expire.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            current = manifest_stamp()
+            if current is not None and current != stamp:
+                logger.info(f"Vector store checkpointed by another process (log seq {current[1]}); reloading")
+                store.reload()
+                stamp = current
+        except Exception as e:
+            logger.error(f"Error reloading vector store: {e}")
+
 def get_vector_store():
-    """Get the vector store, initializing if needed"""
-    global _vector_store
+    """Get the vector store, opening it on first use"""
+    global _vector_store, _startup_seconds, _watcher_thread
     
     with _vector_store_lock:
         if _vector_store is None:
+            started = time.perf_counter()
+            # Taken before opening, so a save that lands while the store opens is still picked up
+            stamp = manifest_stamp()
             _vector_store = initialize_empty_vector_store()
+            _startup_seconds = time.perf_counter() - started
+            logger.info(f"Vector store servable after {_startup_seconds:.2f}s ({_vector_store.vector_store.index.ntotal} vectors)")
             
-            # Start background document loading
-            logger.info("Starting background document loading...")
-            thread = threading.Thread(target=add_documents_sequentially, daemon=True)
-            thread.start()
+            # Serving workers follow the writer's checkpoints instead of keeping their first snapshot
+            if not _store_writer and STORE_RELOAD_SECONDS > 0:
+                _watcher_thread = threading.Thread(target=watch_store, args=(_vector_store, stamp), daemon=True)
+                _watcher_thread.start()
         
         return _vector_store
 
+async def aget_vector_store():
+    """Async version of get_vector_store; opening the store runs in the default executor"""
+    if _vector_store is not None:
+        return _vector_store
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_vector_store)
+
+def start_ingestion():
+    """Start loading and embedding new documents in a background thread, once per process"""
+    global _ingestion_thread
+    
+    with _vector_store_lock:
+        if _ingestion_thread is None:
+            get_vector_store()
+            logger.info("Starting background document loading...")
+            _ingestion_thread = threading.Thread(target=add_documents_sequentially, daemon=True)
+            _ingestion_thread.start()
+        return _ingestion_thread
+
+def is_ready():
+    """Check if the store is open and can serve searches"""
+    return _vector_store is not None
+
+def get_startup_seconds():
+    """Seconds it took to open the store, or None if it is not open yet"""
+    return _startup_seconds
+
 def get_loading_status():
     """Get current loading status"""
     return _loading_progress.copy()
@@ -200,6 +1177,3 @@ def get_loading_status():
 def is_loading():
     """Check if documents are currently being loaded"""
     return _is_loading
-
-# Initialize the vector store immediately when module is imported
-vector_store = get_vector_store()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import numpy as np
+
+def mmr_select(query_vectors, candidate_vectors, size, lambda_mult=0.5, relevance=None):
+    """
+    Maximal marginal relevance selection over a candidate pool.
+    
+    Relevance is a candidate's best cosine similarity to any of the queries,
+    unless the caller already ranked the pool (e.g. by fusing vector and
+    keyword rankings) and passes its own relevance instead. The pairwise similarity matrix is computed once; each of the `size` greedy
+    steps then updates every candidate's similarity to the selected set with a
+    single vector operation.
+    
+    Args:
+        query_vectors (np.ndarray): One row per query
+        candidate_vectors (np.ndarray): One row per candidate
+        size (int): How many candidates to select
+        lambda_mult (float): 1 ranks by relevance alone, 0 by diversity alone
+        relevance (np.ndarray): Optional relevance per candidate, on the same 0-1
+            scale as cosine similarity; replaces the query similarity
+    
+    Returns:
+        np.ndarray: Positions in candidate_vectors, in selection order
+    """
+    candidates = normalized(candidate_vectors)
+    n = len(candidates)
+    size = min(size, n)
+    if size <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if relevance is None:
+        relevance = (candidates @ normalized(query_vectors).T).max(axis=1)
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+    
+    selected = np.empty(size, dtype=np.int64)
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for step in range(size):
+        # Nothing is selected on the first step, so it takes the most relevant candidate
+        scores = relevance if step == 0 else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        best = int(np.argmax(np.where(available, scores, -np.inf)))
+        selected[step] = best
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+def normalized(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def scaled_relevance(scores):
+    """Min-max scale ranking scores (e.g. fused RRF scores) to 0-1, so the best candidate has relevance 1"""
+    scores = np.asarray(scores, dtype=np.float32)
+    spread = scores.max() - scores.min() if len(scores) else 0
+    if spread <= 0:
+        return np.ones(len(scores), dtype=np.float32)
+    return (scores - scores.min()) / spread
@@ -0,0 +1,24 @@
+"""
+Rebuild the FAISS store from title_to_chunks.pkl.
+
+Re-chunks every document with the current settings and only embeds chunks whose
+text changed; everything else comes from the document embedding cache. Run it
+from backend/ while no process with VECTOR_INGESTION=1 is writing to the store:
+
+    python -m vector.rebuild
+    python -m vector.rebuild --path faiss_store_new
+"""
+import argparse
+import json
+from vector.load import FAISS_STORE_PATH, rebuild_vector_store
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS vector store from title_to_chunks.pkl")
+    parser.add_argument("--path", default=FAISS_STORE_PATH, help="Directory to write the rebuilt store to")
+    args = parser.parse_args()
+
+    counts = rebuild_vector_store(path=args.path)
+    print(json.dumps(counts, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Write a copy of the FAISS store at another embedding dimension.
+
+Every vector is re-derived from the document embedding cache (or, when
+shrinking, from the index itself), so no embeddings are requested. The live
+store is left alone; switch to the copy by pointing EMBEDDING_DIMENSIONS and
+FAISS_STORE_PATH at it. Run it from backend/:
+
+    python -m vector.reindex --dimensions 1024
+    python -m vector.reindex --dimensions 512 --path faiss_store_512
+"""
+import argparse
+from vector.load import reindex_to_dimension
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the FAISS vector store at another embedding dimension")
+    parser.add_argument("--dimensions", type=int, required=True, help="Embedding dimension of the copy")
+    parser.add_argument("--path", default=None, help="Directory to write the copy to (default faiss_store_<dimensions>)")
+    args = parser.parse_args()
+
+    print(reindex_to_dimension(args.dimensions, args.path))
+
+if __name__ == "__main__":
+    main()
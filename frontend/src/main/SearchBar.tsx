@@ -118,6 +118,17 @@ const SearchBar = () => {
               }
               contextOrderStream.current.add(parsedData.order);
             }
+            if (parsedData.sources) {
+              // Final event: keep only the sources the answer actually cited
+              contextResultsStream.current = parsedData.sources.map((result: any) => ({
+                title: result.title,
+                link: result.link.replace("/waiting_room", ""),
+                type: result.type || 'unknown',
+                timestamp_seconds: result.timestamp_seconds,
+                summary: result.summary,
+                content: result.content
+              }));
+            }
             if (parsedData.reformulated) {
               
             }